@@ -1,5 +1,6 @@
 from fastapi import APIRouter
 from app.api.v1.endpoints import spatial, network, tasks
+from app.services.cache import get_cache_stats
 
 api_router = APIRouter()
 
@@ -13,4 +14,8 @@ async def root():
 
 @api_router.get("/health")
 async def health_check():
-    return {"status": "healthy", "service": "OCTA API"} 
\ No newline at end of file
+    return {"status": "healthy", "service": "OCTA API"} 
+
+@api_router.get("/cache/stats")
+async def cache_stats():
+    return get_cache_stats()
\ No newline at end of file
@@ -1,19 +1,80 @@
-from fastapi import APIRouter, Depends
-from app.services.network_analysis import NetworkAnalysisService
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from typing import Optional
+import json
+from app.core.concurrency import run_sync
+from app.core.config import settings
+from app.schemas.network import DistanceMatrixRequest
+from app.services.network_analysis import CENTRALITY_METRICS, AsyncNetworkAnalysisService
+from app.tasks.geospatial_tasks import distance_matrix_task
 
 router = APIRouter()
 
+PATH_ALGORITHMS = ("auto", "bfs", "dijkstra", "astar")
+
 @router.post("/network/shortest-path/")
-def find_shortest_path(
+async def find_shortest_path(
     start_node: str,
     end_node: str,
-    network_service: NetworkAnalysisService = Depends()
+    network_id: Optional[str] = Query(None, description="Restrict to nodes with this network_id; all nodes when omitted"),
+    algorithm: str = Query("auto", description="auto, bfs, dijkstra or astar"),
+    network_service: AsyncNetworkAnalysisService = Depends()
+):
+    if algorithm not in PATH_ALGORITHMS:
+        raise HTTPException(status_code=400, detail=f"algorithm must be one of {', '.join(PATH_ALGORITHMS)}")
+    return await network_service.find_shortest_path(start_node, end_node, network_id, algorithm)
+
+@router.post("/network/distance-matrix/")
+async def distance_matrix(
+    request: DistanceMatrixRequest,
+    run_async: Optional[bool] = Query(None, description="Force Celery (true) or streaming (false); defaults by matrix size"),
+    network_service: AsyncNetworkAnalysisService = Depends()
 ):
-    return network_service.find_shortest_path(start_node, end_node)
+    """Path costs for every source/target pair.
+
+    Streams NDJSON: a header line with the targets, then one line per source
+    (in completion order) whose ``distances`` follow the target order. Large
+    matrices run as a Celery task instead.
+    """
+    targets = request.targets or request.sources
+    pairs = len(request.sources) * len(targets)
+    if pairs > settings.network_matrix_max_pairs:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Matrix has {pairs} pairs, the limit is {settings.network_matrix_max_pairs}",
+        )
+
+    if run_async is None:
+        run_async = pairs > settings.network_matrix_inline_max_pairs
+    if run_async:
+        try:
+            task = await run_sync(distance_matrix_task.delay, request.sources, targets, request.network_id)
+            return {
+                "task_id": task.id,
+                "status": "started",
+                "message": f"Distance matrix of {pairs} pairs started"
+            }
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Failed to start distance matrix: {str(e)}")
+
+    async def lines():
+        yield json.dumps({"network_id": request.network_id, "targets": targets}, separators=(",", ":")) + "\n"
+        try:
+            async for row in network_service.stream_distance_matrix(request.sources, targets, request.network_id):
+                yield json.dumps(row, separators=(",", ":")) + "\n"
+        except Exception as e:
+            # Headers are already sent; report the failure in-band
+            yield json.dumps({"error": str(e)}) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
 
 @router.get("/network/centrality/")
-def calculate_centrality(
+async def calculate_centrality(
     network_id: str,
-    network_service: NetworkAnalysisService = Depends()
+    limit: int = Query(100, ge=1, le=settings.page_max_limit),
+    sort_by: str = Query("degree", description="degree, pagerank, betweenness or closeness"),
+    network_service: AsyncNetworkAnalysisService = Depends()
 ):
-    return network_service.calculate_centrality(network_id)
\ No newline at end of file
+    if sort_by not in CENTRALITY_METRICS:
+        raise HTTPException(status_code=400, detail=f"sort_by must be one of {', '.join(CENTRALITY_METRICS)}")
+    return await network_service.calculate_centrality(network_id, limit, sort_by)
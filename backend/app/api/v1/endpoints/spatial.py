@@ -1,8 +1,27 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from app.db.session import get_db
-from app.crud import spatial
+from typing import List, Optional
+from app.core.concurrency import run_sync
+from app.core.config import settings
+from app.db.session import get_db, get_async_db, get_async_read_db
+from app.crud import spatial, async_spatial, statistics
+from app.crud.statistics import StatisticsNotReady
 from app.schemas import spatial as spatial_schema
+from app.services.ingest import BulkIngestor, SUPPORTED_FORMATS, detect_format
+from app.services.cache import CacheService
+from app.services.cells import tile_xy
+from app.services.encoding import cacheable_columns, negotiate_format, rows_to_columns, spatial_response
+from app.services.export import EXPORT_MEDIA_TYPES, decode_cursor, encode_cursor, spatial_row_to_dict, stream_spatial_export
+from app.services.neighbours import neighbour_index
+from app.services.property_filters import FILTER_OPERATORS, parse_property_filters
+from app.services import regions
+from app.services.spatial_index import refresh_spatial_index, spatial_index
+from app.services.vector_tiles import MVT_MEDIA_TYPE, TileCache, get_vector_tile
+import logging
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
@@ -11,25 +30,311 @@ def create_spatial_data(
     data: spatial_schema.SpatialDataCreate,
     db: Session = Depends(get_db),
 ):
-    return spatial.create_spatial_data(db, data)
+    db_spatial = spatial.create_spatial_data(db, data)
+    spatial_index.add(db_spatial.id, db_spatial.latitude, db_spatial.longitude)
+    return db_spatial
 
-@router.get("/spatial-data/")
-def get_all_spatial_data(
-    skip: int = 0, limit: int = 100,
+@router.post("/spatial-data/bulk/", response_model=spatial_schema.BulkIngestResult)
+async def bulk_ingest_spatial_data(
+    request: Request,
+    format: Optional[str] = Query(None, description="ndjson, csv or geojson; defaults to the Content-Type"),
+    chunk_size: Optional[int] = Query(None, ge=1, le=settings.ingest_max_chunk_size),
     db: Session = Depends(get_db),
 ):
-    return spatial.get_all_spatial_data(db, skip=skip, limit=limit)
+    """Stream NDJSON, CSV or GeoJSON records into spatial_data in batches."""
+    fmt = format or detect_format(request.headers.get("content-type"))
+    if fmt not in SUPPORTED_FORMATS:
+        raise HTTPException(
+            status_code=415,
+            detail=f"Unsupported ingest format, expected one of {', '.join(SUPPORTED_FORMATS)}",
+        )
+
+    ingestor = BulkIngestor(db, chunk_size=chunk_size)
+    result = await ingestor.ingest(request.stream(), fmt)
+    if result.inserted:
+        # Counts are maintained on ingest; distinct-value cardinality needs a recount
+        await run_sync(statistics.schedule_statistics_refresh, settings.statistics_refresh_delay)
+    if spatial_index.warm:
+        await run_sync(spatial_index.refresh, db)
+    return result
+
+def _response_format(request: Request, requested: Optional[str]) -> str:
+    try:
+        return negotiate_format(request.headers.get("accept"), requested)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+WHERE_DESCRIPTION = f"Property filter key:op[:value], repeatable; op is one of {', '.join(FILTER_OPERATORS)}"
+
+def _property_filters(where: List[str]) -> list:
+    try:
+        return parse_property_filters(where)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/spatial-data/")
+async def get_all_spatial_data(
+    request: Request,
+    skip: int = 0,
+    limit: int = Query(100, ge=1, le=settings.page_max_limit),
+    cursor: Optional[str] = Query(None, description="Continuation token from the X-Next-Cursor header"),
+    format: Optional[str] = Query(None, description="json, columnar or arrow; overrides the Accept header"),
+    where: List[str] = Query([], description=WHERE_DESCRIPTION),
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    """List spatial data in ID order.
+
+    Pages are keyset-paginated: when more rows exist the response carries an
+    ``X-Next-Cursor`` header (and a ``Link: rel="next"``) to pass back as
+    ``cursor``. ``skip`` is still honoured for offset paging when no cursor is given.
+    ``where`` filters on properties, e.g. ``where=population:gte:10000``.
+    """
+    fmt = _response_format(request, format)
+    accept_encoding = request.headers.get("accept-encoding")
+    filters = _property_filters(where)
+    if cursor is None and skip:
+        rows = await async_spatial.get_all_spatial_data(db, skip=skip, limit=limit, filters=filters)
+        return spatial_response(rows_to_columns(rows), fmt, accept_encoding)
+
+    try:
+        after_id = decode_cursor(cursor) if cursor else 0
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    headers = {}
+    rows = await async_spatial.get_spatial_data_page(db, after_id=after_id, limit=limit + 1, filters=filters)
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].id)
+        next_url = request.url.remove_query_params("skip").include_query_params(cursor=next_cursor)
+        headers["X-Next-Cursor"] = next_cursor
+        headers["Link"] = f'<{next_url}>; rel="next"'
+    return spatial_response(rows_to_columns(rows), fmt, accept_encoding, headers)
+
+@router.get("/spatial-data/export/")
+def export_spatial_data(
+    format: str = Query("ndjson", description="ndjson, geojson or csv"),
+):
+    """Stream the full spatial_data table from a server-side cursor."""
+    if format not in EXPORT_MEDIA_TYPES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported export format, expected one of {', '.join(EXPORT_MEDIA_TYPES)}",
+        )
+    extension = "json" if format == "geojson" else format
+    return StreamingResponse(
+        stream_spatial_export(format),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="spatial_data.{extension}"'},
+    )
+
+@router.get("/spatial-index/stats/")
+def get_spatial_index_stats():
+    """In-memory spatial index size and hit ratio."""
+    return {**spatial_index.stats(), "neighbour_tree": neighbour_index.stats()}
+
+def _check_batch_size(points: list):
+    if len(points) > settings.neighbour_batch_max_points:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch has {len(points)} points, the limit is {settings.neighbour_batch_max_points}",
+        )
+
+@router.get("/nearest/")
+async def get_nearest_points(
+    latitude: float = Query(..., ge=-90, le=90),
+    longitude: float = Query(..., ge=-180, le=180),
+    k: int = Query(10, ge=1, le=settings.neighbour_max_k),
+):
+    """The k points nearest to a location by great-circle distance, nearest first."""
+    results = await run_sync(neighbour_index.nearest, [latitude], [longitude], k)
+    return {"latitude": latitude, "longitude": longitude, "k": k, "results": results[0]}
+
+@router.get("/radius/")
+async def get_points_within_radius(
+    latitude: float = Query(..., ge=-90, le=90),
+    longitude: float = Query(..., ge=-180, le=180),
+    radius_km: float = Query(..., gt=0, le=settings.neighbour_max_radius_km),
+    limit: int = Query(1000, ge=1, le=settings.neighbour_max_results),
+):
+    """Points within ``radius_km`` of a location by great-circle distance, nearest first."""
+    results = await run_sync(neighbour_index.within_radius, [latitude], [longitude], radius_km, limit)
+    return {"latitude": latitude, "longitude": longitude, "radius_km": radius_km, "results": results[0]}
+
+@router.post("/nearest/batch/")
+async def get_nearest_points_batch(request: spatial_schema.NearestBatchRequest):
+    """k nearest points for many locations at once; one result list per query point, in order."""
+    _check_batch_size(request.points)
+    if request.k > settings.neighbour_max_k:
+        raise HTTPException(status_code=400, detail=f"k must be at most {settings.neighbour_max_k}")
+    lats = [point.latitude for point in request.points]
+    lons = [point.longitude for point in request.points]
+    results = await run_sync(neighbour_index.nearest, lats, lons, request.k)
+    return {
+        "k": request.k,
+        "results": [
+            {"latitude": lat, "longitude": lon, "results": points}
+            for lat, lon, points in zip(lats, lons, results)
+        ],
+    }
+
+@router.post("/radius/batch/")
+async def get_points_within_radius_batch(request: spatial_schema.RadiusBatchRequest):
+    """Radius search for many locations at once; one result list per query point, in order."""
+    _check_batch_size(request.points)
+    if request.limit > settings.neighbour_max_results:
+        raise HTTPException(status_code=400, detail=f"limit must be at most {settings.neighbour_max_results}")
+    if request.radius_km > settings.neighbour_max_radius_km:
+        raise HTTPException(status_code=400, detail=f"radius_km must be at most {settings.neighbour_max_radius_km}")
+    lats = [point.latitude for point in request.points]
+    lons = [point.longitude for point in request.points]
+    results = await run_sync(neighbour_index.within_radius, lats, lons, request.radius_km, request.limit)
+    return {
+        "radius_km": request.radius_km,
+        "results": [
+            {"latitude": lat, "longitude": lon, "results": points}
+            for lat, lon, points in zip(lats, lons, results)
+        ],
+    }
+
+@router.get("/regions/")
+async def list_region_layers():
+    """Polygon layers available for region tagging."""
+    return await run_sync(regions.list_region_layers)
+
+@router.put("/regions/{layer}")
+async def upload_region_layer(
+    layer: str,
+    collection: spatial_schema.RegionLayerUpload,
+    id_property: Optional[str] = Query(None, description="Feature property holding the region id; the feature id when omitted"),
+):
+    """Replace a polygon layer with a GeoJSON FeatureCollection."""
+    try:
+        return await run_sync(regions.save_region_layer, layer, collection.features, id_property)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.delete("/regions/{layer}")
+async def delete_region_layer(layer: str):
+    deleted = await run_sync(regions.delete_region_layer, layer)
+    if not deleted:
+        raise HTTPException(status_code=404, detail=f"Region layer {layer!r} not found")
+    return {"layer": layer, "deleted": deleted}
+
+@router.post("/regions/{layer}/lookup/")
+async def lookup_regions(layer: str, request: spatial_schema.RegionLookupRequest):
+    """Region id of each point (None outside every polygon), in request order."""
+    if request.predicate not in regions.REGION_PREDICATES:
+        raise HTTPException(status_code=400, detail=f"predicate must be one of {', '.join(regions.REGION_PREDICATES)}")
+    if len(request.points) > settings.region_lookup_max_points:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Lookup has {len(request.points)} points, the limit is {settings.region_lookup_max_points}",
+        )
+    region_layer = await run_sync(regions.region_layers.get, layer)
+    if region_layer is None:
+        raise HTTPException(status_code=404, detail=f"Region layer {layer!r} not found")
+    lats = [point.latitude for point in request.points]
+    lons = [point.longitude for point in request.points]
+    return {
+        "layer": layer,
+        "regions": await run_sync(region_layer.lookup, lats, lons, request.predicate),
+    }
 
 @router.get("/spatial-data/{spatial_id}")
-def get_spatial_data_by_id(
+async def get_spatial_data_by_id(
     spatial_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    return spatial.get_spatial_data_by_id(db, spatial_id)
+    cache = CacheService()
+    cached = await run_sync(cache.get_cached_spatial_data, spatial_id)
+    if cached is not None:
+        return cached
+
+    db_spatial = await async_spatial.get_spatial_data_by_id(db, spatial_id)
+    if db_spatial is not None:
+        await run_sync(cache.cache_spatial_data, spatial_id, spatial_row_to_dict(db_spatial))
+    return db_spatial
 
 @router.get("/spatial-data/within/")
-def get_spatial_data_within_bounds(
+async def get_spatial_data_within_bounds(
+    request: Request,
     minx: float, miny: float, maxx: float, maxy: float,
-    db: Session = Depends(get_db),
+    format: Optional[str] = Query(None, description="json, columnar or arrow; overrides the Accept header"),
+    where: List[str] = Query([], description=WHERE_DESCRIPTION),
+    db: AsyncSession = Depends(get_async_db),
+):
+    fmt = _response_format(request, format)
+    accept_encoding = request.headers.get("accept-encoding")
+    filters = _property_filters(where)
+    cache = CacheService()
+    cached = await run_sync(cache.get_cached_bbox, minx, miny, maxx, maxy, filters)
+    if cached is not None:
+        return await run_sync(spatial_response, cached, fmt, accept_encoding)
+
+    rows = None
+    if settings.spatial_index_enabled:
+        if spatial_index.refresh_due():
+            await run_sync(refresh_spatial_index)
+        spatial_ids = await run_sync(spatial_index.query_bbox, minx, miny, maxx, maxy)
+        if spatial_ids is not None:
+            rows = await async_spatial.get_spatial_data_by_ids(db, spatial_ids, filters)
+    if rows is None:
+        rows = await async_spatial.get_spatial_data_within_bounds(db, minx, miny, maxx, maxy, filters)
+
+    columns = await run_sync(rows_to_columns, rows)
+    if columns["count"] <= settings.bbox_cache_max_rows:
+        await run_sync(cache.cache_bbox, minx, miny, maxx, maxy, cacheable_columns(columns), filters)
+    # Encoding and compressing large results is CPU-bound, keep it off the event loop
+    return await run_sync(spatial_response, columns, fmt, accept_encoding)
+
+@router.get("/spatial-data/density/")
+async def get_spatial_density(
+    zoom: int = Query(..., ge=0, le=30),
+    minx: float = Query(-180.0), miny: float = Query(-90.0),
+    maxx: float = Query(180.0), maxy: float = Query(90.0),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    return spatial.get_spatial_data_within_bounds(db, minx, miny, maxx, maxy)
\ No newline at end of file
+    """Point counts per Web Mercator tile, read from the precomputed tile rollups."""
+    limit = settings.density_max_tiles
+    try:
+        rows = await async_spatial.get_tile_rollups(db, zoom, (minx, miny, maxx, maxy), limit + 1)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except StatisticsNotReady as e:
+        raise HTTPException(
+            status_code=503, detail=str(e), headers={"Retry-After": str(settings.statistics_refresh_delay)}
+        )
+
+    tiles = []
+    for row in rows[:limit]:
+        x, y = tile_xy(row.tile_key)
+        tiles.append({
+            "x": x,
+            "y": y,
+            "point_count": row.point_count,
+            "center": (row.sum_latitude / row.point_count, row.sum_longitude / row.point_count),
+        })
+    return {
+        "zoom": zoom,
+        "tiles": tiles,
+        "total_points": sum(tile["point_count"] for tile in tiles),
+        "truncated": len(rows) > limit,
+    }
+
+@router.get("/tiles/{z}/{x}/{y}")
+async def get_vector_tile_endpoint(z: int, x: int, y: int, request: Request):
+    """Mapbox Vector Tile for z/x/y: a "points" layer at high zoom, a "clusters" layer below it."""
+    if not 0 <= z <= settings.tile_max_zoom:
+        raise HTTPException(status_code=400, detail=f"z must be between 0 and {settings.tile_max_zoom}")
+    if not (0 <= x < (1 << z) and 0 <= y < (1 << z)):
+        raise HTTPException(status_code=404, detail="Tile out of range")
+
+    version = await run_sync(TileCache().version, z, x, y)
+    etag = f'"{version}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+
+    data, _ = await run_sync(get_vector_tile, z, x, y, version)
+    return Response(content=data, media_type=MVT_MEDIA_TYPE, headers=headers)
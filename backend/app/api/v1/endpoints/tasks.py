@@ -1,8 +1,16 @@
-from fastapi import APIRouter, HTTPException, BackgroundTasks
-from app.tasks.geospatial_tasks import process_large_dataset, calculate_network_metrics, cache_spatial_data
+from fastapi import APIRouter, HTTPException, BackgroundTasks, Query, WebSocket, WebSocketDisconnect
+from fastapi.responses import Response, StreamingResponse
+from app.tasks.geospatial_tasks import process_large_dataset, calculate_network_metrics, cache_spatial_data, detect_hotspots_task, tag_points_with_regions_task
+from app.services.regions import REGION_PREDICATES
 from app.services.analysis import GeospatialAnalyzer
-from celery.result import AsyncResult
-from typing import Dict, Any
+from app.core.concurrency import run_sync
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal
+from app.crud import async_spatial
+from app.crud.statistics import StatisticsNotReady
+from app.services.task_events import backend_task_status, get_result_page, task_events
+from typing import Dict, Any, Optional
+import json
 
 router = APIRouter()
 
@@ -10,7 +18,7 @@ router = APIRouter()
 async def start_dataset_processing(dataset_id: str) -> Dict[str, Any]:
     """Start processing a large geospatial dataset asynchronously."""
     try:
-        task = process_large_dataset.delay(dataset_id)
+        task = await run_sync(process_large_dataset.delay, dataset_id)
         return {
             "task_id": task.id,
             "status": "started",
@@ -20,10 +28,13 @@ async def start_dataset_processing(dataset_id: str) -> Dict[str, Any]:
         raise HTTPException(status_code=500, detail=f"Failed to start processing: {str(e)}")
 
 @router.post("/calculate-network-metrics/")
-async def start_network_analysis(network_id: str) -> Dict[str, Any]:
+async def start_network_analysis(
+    network_id: str,
+    incremental: bool = Query(True, description="Reuse stored metrics when only a small part of the graph changed"),
+) -> Dict[str, Any]:
     """Start network metrics calculation asynchronously."""
     try:
-        task = calculate_network_metrics.delay(network_id)
+        task = await run_sync(calculate_network_metrics.delay, network_id, incremental)
         return {
             "task_id": task.id,
             "status": "started",
@@ -32,48 +43,84 @@ async def start_network_analysis(network_id: str) -> Dict[str, Any]:
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to start analysis: {str(e)}")
 
+@router.post("/tag-regions/")
+async def start_region_tagging(
+    layer: str,
+    property_key: Optional[str] = Query(None, description="Property that receives the region id; defaults to the layer name"),
+    predicate: str = Query("intersects", description="intersects (boundary points count) or contains"),
+) -> Dict[str, Any]:
+    """Tag every spatial data point with the region of ``layer`` it falls in."""
+    if predicate not in REGION_PREDICATES:
+        raise HTTPException(status_code=400, detail=f"predicate must be one of {', '.join(REGION_PREDICATES)}")
+    try:
+        task = await run_sync(tag_points_with_regions_task.delay, layer, property_key, predicate)
+        return {
+            "task_id": task.id,
+            "status": "started",
+            "message": f"Region tagging started for layer {layer}"
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to start region tagging: {str(e)}")
+
 @router.get("/task-status/{task_id}")
 async def get_task_status(task_id: str) -> Dict[str, Any]:
     """Get the status of a background task."""
     try:
-        task_result = AsyncResult(task_id)
-        
-        if task_result.state == 'PENDING':
-            response = {
-                'task_id': task_id,
-                'state': task_result.state,
-                'status': 'Task is pending...'
-            }
-        elif task_result.state == 'PROGRESS':
-            response = {
-                'task_id': task_id,
-                'state': task_result.state,
-                'status': task_result.info.get('step', 'Processing...'),
-                'progress': task_result.info.get('current', 0),
-                'total': task_result.info.get('total', 100)
-            }
-        elif task_result.state == 'SUCCESS':
-            response = {
-                'task_id': task_id,
-                'state': task_result.state,
-                'result': task_result.result
-            }
-        else:
-            response = {
-                'task_id': task_id,
-                'state': task_result.state,
-                'error': str(task_result.info)
-            }
-        
-        return response
+        return await run_sync(backend_task_status, task_id)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get task status: {str(e)}")
 
+@router.get("/task-events/{task_id}")
+async def stream_task_events(task_id: str) -> StreamingResponse:
+    """Server-sent events with the task status, pushed on every state change until it finishes."""
+    async def events():
+        try:
+            async for event in task_events(task_id):
+                if event is None:
+                    yield ": keep-alive\n\n"
+                else:
+                    yield f"event: {event['state'].lower()}\ndata: {json.dumps(event, default=str)}\n\n"
+        except Exception as e:
+            yield f"event: error\ndata: {json.dumps({'error': str(e)})}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@router.websocket("/ws/task-events/{task_id}")
+async def task_events_websocket(websocket: WebSocket, task_id: str):
+    """WebSocket counterpart of /task-events/: one JSON message per state change."""
+    await websocket.accept()
+    try:
+        async for event in task_events(task_id):
+            if event is not None:
+                await websocket.send_json(event)
+    except WebSocketDisconnect:
+        return
+    except Exception as e:
+        await websocket.send_json({"task_id": task_id, "error": str(e)})
+    await websocket.close()
+
+@router.get("/task-result/{task_id}")
+async def get_task_result_page(task_id: str, page: int = Query(0, ge=0)) -> Response:
+    """One page of a large task result; the task status carries a ``result_ref`` with the page count."""
+    try:
+        data, pages = await run_sync(get_result_page, task_id, page)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to get task result: {str(e)}")
+    if data is None:
+        raise HTTPException(status_code=404, detail=f"No result page {page} for task {task_id}")
+    # Pages are stored as JSON; splice them in without decoding
+    body = b'{"task_id":%s,"page":%d,"pages":%d,"items":%s}' % (json.dumps(task_id).encode(), page, pages, data)
+    return Response(content=body, media_type="application/json")
+
 @router.post("/cache-spatial-data/{spatial_id}")
 async def cache_spatial_data_endpoint(spatial_id: int) -> Dict[str, Any]:
     """Cache spatial data for faster retrieval."""
     try:
-        task = cache_spatial_data.delay(spatial_id)
+        task = await run_sync(cache_spatial_data.delay, spatial_id)
         return {
             "task_id": task.id,
             "status": "started",
@@ -86,10 +133,35 @@ async def cache_spatial_data_endpoint(spatial_id: int) -> Dict[str, Any]:
 async def get_spatial_statistics() -> Dict[str, Any]:
     """Get spatial data statistics."""
     analyzer = GeospatialAnalyzer()
-    return analyzer.get_spatial_statistics()
+    try:
+        return await run_sync(analyzer.get_spatial_statistics)
+    except StatisticsNotReady as e:
+        raise HTTPException(
+            status_code=503, detail=str(e), headers={"Retry-After": str(settings.statistics_refresh_delay)}
+        )
 
 @router.get("/detect-hotspots/")
-async def detect_hotspots(radius_km: float = 1.0) -> Dict[str, Any]:
-    """Detect spatial hotspots."""
+async def detect_hotspots(
+    radius_km: float = Query(1.0, gt=0),
+    min_points: Optional[int] = Query(None, ge=1),
+    max_hotspots: Optional[int] = Query(None, ge=1),
+    run_async: Optional[bool] = Query(None, description="Force Celery (true) or inline (false); defaults by dataset size"),
+) -> Dict[str, Any]:
+    """Detect spatial hotspots, inline for small tables or as a Celery task for large ones."""
+    if run_async is None:
+        async with AsyncSessionLocal() as db:
+            run_async = await async_spatial.estimate_spatial_data_count(db) > settings.hotspot_inline_max_points
+
+    if run_async:
+        try:
+            task = await run_sync(detect_hotspots_task.delay, radius_km, min_points, max_hotspots)
+            return {
+                "task_id": task.id,
+                "status": "started",
+                "message": "Hotspot detection started"
+            }
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Failed to start hotspot detection: {str(e)}")
+
     analyzer = GeospatialAnalyzer()
-    return analyzer.detect_hotspots(radius_km) 
\ No newline at end of file
+    return await run_sync(analyzer.detect_hotspots, radius_km, min_points=min_points, max_hotspots=max_hotspots)
\ No newline at end of file
@@ -1,7 +1,11 @@
+import time
+from datetime import datetime
 from celery import Celery
+from celery.signals import before_task_publish, task_postrun, task_prerun, worker_init, worker_process_init
 from app.core.config import settings
+from app.core.metrics import celery_task_duration, celery_task_queue_wait
 
-celery_app = Celery("octa")
+celery_app = Celery("octa", task_cls="app.tasks.base:EventTask")
 
 celery_app.conf.update(
     broker_url=settings.redis_url,
@@ -12,4 +16,39 @@ celery_app.conf.update(
     timezone="UTC",
     enable_utc=True,
     include=["app.tasks.geospatial_tasks"]
-) 
\ No newline at end of file
+)
+
+@worker_init.connect
+@worker_process_init.connect
+def init_worker_process(**kwargs):
+    # Worker processes (and each forked child) get their own database pools, sized by WORKER_DB_POOL_SIZE
+    from app.db.session import configure_worker_engines
+    configure_worker_engines()
+
+# Task timings: publish time travels in a message header, run time is kept per task id
+_task_started = {}
+
+@before_task_publish.connect
+def stamp_published_at(headers=None, **kwargs):
+    if settings.metrics_enabled and headers is not None:
+        headers.setdefault("published_at", time.time())
+
+@task_prerun.connect
+def record_task_start(task_id=None, task=None, **kwargs):
+    if not settings.metrics_enabled:
+        return
+    _task_started[task_id] = time.perf_counter()
+    published_at = getattr(task.request, "published_at", None)
+    if published_at:
+        # Delayed tasks (countdown, retry backoff) only start waiting at their ETA
+        ready_at = float(published_at)
+        eta = task.request.eta
+        if eta:
+            ready_at = max(ready_at, (eta if isinstance(eta, datetime) else datetime.fromisoformat(eta)).timestamp())
+        celery_task_queue_wait.observe(max(time.time() - ready_at, 0.0), task.name)
+
+@task_postrun.connect
+def record_task_duration(task_id=None, task=None, state=None, **kwargs):
+    started = _task_started.pop(task_id, None)
+    if started is not None:
+        celery_task_duration.observe(time.perf_counter() - started, task.name, state or "UNKNOWN")
@@ -0,0 +1,52 @@
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Optional
+import functools
+import multiprocessing
+import threading
+import anyio
+from app.core.config import settings
+
+_limiter: Optional[anyio.CapacityLimiter] = None
+_process_pool: Optional[ProcessPoolExecutor] = None
+_process_pool_lock = threading.Lock()
+
+
+def get_thread_limiter() -> anyio.CapacityLimiter:
+    """Process-wide cap on threads running blocking work for the event loop."""
+    global _limiter
+    if _limiter is None:
+        _limiter = anyio.CapacityLimiter(settings.sync_worker_threads)
+    return _limiter
+
+
+async def run_sync(func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """Run blocking or CPU-heavy work in the bounded thread pool."""
+    return await anyio.to_thread.run_sync(
+        functools.partial(func, *args, **kwargs),
+        limiter=get_thread_limiter(),
+    )
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """Process-wide pool for CPU-bound work that would hold the GIL.
+
+    Workers are spawned rather than forked so they never inherit the parent's
+    open database, Redis or Neo4j connections.
+    """
+    global _process_pool
+    if _process_pool is None:
+        with _process_pool_lock:
+            if _process_pool is None:
+                _process_pool = ProcessPoolExecutor(
+                    max_workers=settings.process_pool_workers or None,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+    return _process_pool
+
+
+def shutdown_process_pool():
+    global _process_pool
+    with _process_pool_lock:
+        pool, _process_pool = _process_pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,324 @@
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+from bisect import bisect_left
+import json
+import logging
+import threading
+import time
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Prometheus text exposition of in-process counters and histograms. Recording is
+# a dict lookup and a few additions under a lock, cheap enough for every request,
+# query and cache call. Each API process serves its own numbers; Celery task
+# metrics are recorded by the workers into Redis and served by whichever API
+# process is scraped.
+
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+TASK_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0, 3600.0)
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[Any], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic counter per label set."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            values = list(self._values.items())
+        for labels, value in values:
+            yield f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}"
+
+
+class Histogram:
+    """Cumulative-bucket histogram per label set, in seconds."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # Per label set: [count per bucket (last is +Inf), sum]
+        self._values: Dict[Tuple[str, ...], List[Any]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            values = [(labels, list(counts), total) for labels, (counts, total) in self._values.items()]
+        yield from histogram_samples(self.name, self.labelnames, self.buckets, values)
+
+
+class Gauge:
+    """Values read from a callback at scrape time: ``{label values: value}``."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str], collect: Callable[[], Dict[Tuple[str, ...], float]]):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.collect = collect
+
+    def samples(self) -> Iterable[str]:
+        for labels, value in self.collect().items():
+            yield f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}"
+
+
+def histogram_samples(
+    name: str,
+    labelnames: Sequence[str],
+    buckets: Sequence[float],
+    values: Iterable[Tuple[Sequence[str], Sequence[int], float]],
+) -> Iterable[str]:
+    """Exposition lines for (labels, per-bucket counts, sum) entries."""
+    for labels, counts, total in values:
+        cumulative = 0
+        for bound, count in zip((*buckets, float("inf")), counts):
+            cumulative += count
+            le = f'le="{_number(bound)}"'
+            yield f"{name}_bucket{_labels(labelnames, labels, le)} {cumulative}"
+        yield f"{name}_sum{_labels(labelnames, labels)} {_number(float(total))}"
+        yield f"{name}_count{_labels(labelnames, labels)} {cumulative}"
+
+
+class SharedHistogram:
+    """Histogram kept in a Redis hash so every worker process adds to the same series.
+
+    One pipelined round trip per observation; meant for events that take far
+    longer than that, such as Celery tasks.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = TASK_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self.key = f"metrics:{name}"
+
+    def observe(self, value: float, *labels: str):
+        from app.services.cache import get_redis_client
+
+        series = json.dumps(labels, separators=(",", ":"))
+        try:
+            pipeline = get_redis_client().pipeline(transaction=False)
+            pipeline.hincrby(self.key, f"{series}|{bisect_left(self.buckets, value)}", 1)
+            pipeline.hincrbyfloat(self.key, f"{series}|sum", value)
+            pipeline.execute()
+        except Exception as e:
+            logger.error(f"Error recording metric {self.name}: {e}")
+
+    def samples(self) -> Iterable[str]:
+        from app.services.cache import get_redis_client
+
+        try:
+            fields = get_redis_client().hgetall(self.key)
+        except Exception as e:
+            logger.error(f"Error reading metric {self.name}: {e}")
+            return
+        values: Dict[str, List[Any]] = {}
+        for field, value in fields.items():
+            series, _, slot = (field.decode() if isinstance(field, bytes) else field).rpartition("|")
+            entry = values.setdefault(series, [[0] * (len(self.buckets) + 1), 0.0])
+            if slot == "sum":
+                entry[1] = float(value)
+            elif slot.isdigit() and int(slot) <= len(self.buckets):
+                entry[0][int(slot)] = int(value)
+        yield from histogram_samples(
+            self.name,
+            self.labelnames,
+            self.buckets,
+            ((json.loads(series), counts, total) for series, (counts, total) in sorted(values.items())),
+        )
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[Any] = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            try:
+                samples = list(metric.samples())
+            except Exception as e:
+                logger.error(f"Error collecting metric {metric.name}: {e}")
+                continue
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(samples)
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_request_duration = registry.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template", ("method", "route", "status"),
+))
+db_query_duration = registry.register(Histogram(
+    "db_query_duration_seconds", "SQL statement latency by engine and statement type", ("engine", "operation"),
+))
+db_query_errors = registry.register(Counter(
+    "db_query_errors_total", "SQL statements that raised", ("engine",),
+))
+cache_operations = registry.register(Counter(
+    "cache_operations_total", "Cache calls by tier and outcome", ("tier", "result"),
+))
+cache_duration = registry.register(Histogram(
+    "cache_operation_duration_seconds", "Cache call latency by tier", ("tier",),
+))
+neo4j_query_duration = registry.register(Histogram(
+    "neo4j_query_duration_seconds", "Neo4j query latency by access mode and outcome", ("mode", "status"),
+))
+celery_task_duration = registry.register(SharedHistogram(
+    "celery_task_duration_seconds", "Celery task run time by task and final state", ("task", "state"),
+))
+celery_task_queue_wait = registry.register(SharedHistogram(
+    "celery_task_queue_wait_seconds", "Time from publishing a Celery task to a worker starting it", ("task",),
+))
+
+
+def render_metrics() -> str:
+    return registry.render()
+
+
+class Timer:
+    """``with Timer(histogram, *labels):`` observes the block's duration; ``status`` is set on error."""
+
+    __slots__ = ("histogram", "labels", "started")
+
+    def __init__(self, histogram: Histogram, *labels: str):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if settings.metrics_enabled:
+            status = "error" if exc_type is not None else "ok"
+            self.histogram.observe(time.perf_counter() - self.started, *self.labels, status)
+
+
+_OPERATIONS = ("select", "insert", "update", "delete", "with", "copy")
+
+
+def _statement_operation(statement: str) -> str:
+    words = statement.split(None, 1)
+    operation = words[0].lower() if words else ""
+    return operation if operation in _OPERATIONS else "other"
+
+
+def instrument_engine(engine, name: str):
+    """Time every statement of a (sync) SQLAlchemy engine with cursor events."""
+    from sqlalchemy import event
+
+    if not settings.metrics_enabled:
+        return
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._metrics_started = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, "_metrics_started", None)
+        if started is not None:
+            db_query_duration.observe(time.perf_counter() - started, name, _statement_operation(statement))
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(exception_context):
+        db_query_errors.inc(name)
+
+
+class MetricsMiddleware:
+    """ASGI middleware observing the latency of every HTTP request.
+
+    Requests are labelled with the route template (``/spatial-data/{spatial_id}``)
+    so the series stay bounded; unmatched paths share one label. Streaming
+    responses are timed until their last chunk is sent.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._routes: Dict[Any, str] = {}
+
+    def _route(self, scope) -> str:
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "unmatched"
+        route = self._routes.get(endpoint)
+        if route is None:
+            for candidate in getattr(scope.get("app"), "routes", ()):
+                if getattr(candidate, "endpoint", None) is endpoint:
+                    route = candidate.path
+                    break
+            route = self._routes[endpoint] = route or "unknown"
+        return route
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.metrics_enabled:
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = "500"
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            http_request_duration.observe(time.perf_counter() - started, scope["method"], self._route(scope), status)
@@ -0,0 +1,100 @@
+from sqlalchemy import Integer, any_, bindparam, func, select, text
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.spatial import SpatialData
+from app.crud import statistics
+from app.crud.spatial import SPATIAL_ROW_COLUMNS, spatial_bbox_select
+from app.services.property_filters import compile_property_filters
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+# Async counterparts of the read paths in app.crud.spatial, for use on the event loop.
+# Listing queries return plain column rows (SPATIAL_ROW_COLUMNS) rather than ORM
+# objects, which is what app.services.encoding serializes. ``filters`` are parsed
+# property filter terms (see app.services.property_filters).
+
+
+async def get_spatial_data_by_id(db: AsyncSession, spatial_id: int) -> Optional[SpatialData]:
+    """Get spatial data by ID."""
+    return await db.get(SpatialData, spatial_id)
+
+
+async def get_spatial_data_by_ids(db: AsyncSession, spatial_ids: Sequence[int], filters: Optional[Sequence[Any]] = None) -> List[Any]:
+    """Get spatial data rows for a set of IDs, ordered by ID."""
+    if len(spatial_ids) == 0:
+        return []
+    spatial_ids = [int(spatial_id) for spatial_id in spatial_ids]
+    if db.get_bind().dialect.name == "postgresql":
+        # One array parameter keeps a single prepared statement for every list length
+        in_ids = SpatialData.id == any_(bindparam("spatial_ids", spatial_ids, type_=ARRAY(Integer)))
+    else:
+        in_ids = SpatialData.id.in_(spatial_ids)
+    result = await db.execute(
+        select(*SPATIAL_ROW_COLUMNS)
+        .where(in_ids, *compile_property_filters(filters))
+        .order_by(SpatialData.id)
+    )
+    return list(result.all())
+
+
+async def get_all_spatial_data(db: AsyncSession, skip: int = 0, limit: int = 100, filters: Optional[Sequence[Any]] = None) -> List[Any]:
+    """Get all spatial data rows with pagination."""
+    result = await db.execute(
+        select(*SPATIAL_ROW_COLUMNS)
+        .where(*compile_property_filters(filters))
+        .order_by(SpatialData.id)
+        .offset(skip)
+        .limit(limit)
+    )
+    return list(result.all())
+
+
+async def get_spatial_data_page(db: AsyncSession, after_id: int = 0, limit: int = 100, filters: Optional[Sequence[Any]] = None) -> List[Any]:
+    """Get the next page of spatial data rows after an ID (keyset pagination on the primary key)."""
+    result = await db.execute(
+        select(*SPATIAL_ROW_COLUMNS)
+        .where(SpatialData.id > after_id, *compile_property_filters(filters))
+        .order_by(SpatialData.id)
+        .limit(limit)
+    )
+    return list(result.all())
+
+
+async def get_spatial_data_within_bounds(
+    db: AsyncSession,
+    minx: float,
+    miny: float,
+    maxx: float,
+    maxy: float,
+    filters: Optional[Sequence[Any]] = None,
+) -> List[Any]:
+    """Get spatial data rows within specified bounds."""
+    result = await db.execute(
+        spatial_bbox_select(minx, miny, maxx, maxy, *SPATIAL_ROW_COLUMNS).where(*compile_property_filters(filters))
+    )
+    return list(result.all())
+
+
+async def estimate_spatial_data_count(db: AsyncSession) -> int:
+    """Cheap row count: planner statistics on PostgreSQL, COUNT(*) elsewhere."""
+    if db.get_bind().dialect.name == "postgresql":
+        estimate = (await db.execute(
+            text("SELECT reltuples::bigint FROM pg_class WHERE relname = 'spatial_data'")
+        )).scalar()
+        if estimate is not None and estimate >= 0:
+            return int(estimate)
+    return (await db.execute(select(func.count()).select_from(SpatialData))).scalar() or 0
+
+
+async def get_spatial_statistics(db: AsyncSession) -> Dict[str, Any]:
+    """Whole-table statistics from the summary tables (see app.crud.statistics)."""
+    return await db.run_sync(statistics.get_spatial_statistics)
+
+
+async def get_tile_rollups(
+    db: AsyncSession,
+    zoom: int,
+    bbox: Optional[Tuple[float, float, float, float]] = None,
+    limit: Optional[int] = None,
+) -> List[Any]:
+    """Per-tile rollup rows at a zoom level (see app.crud.statistics)."""
+    return await db.run_sync(statistics.get_tile_rollups, zoom, bbox, limit)
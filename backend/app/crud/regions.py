@@ -0,0 +1,88 @@
+from typing import Any, Dict, List, Optional, Sequence
+from sqlalchemy import bindparam, delete, func, insert, select, text, update
+from sqlalchemy.orm import Session
+from app.models.spatial import SpatialData, SpatialRegion
+
+
+def replace_region_layer(db: Session, layer: str, regions: List[Dict[str, Any]]) -> int:
+    """Swap a layer's polygons for ``regions`` (region_id, name, properties, geometry WKB) in one transaction."""
+    db.execute(delete(SpatialRegion).where(SpatialRegion.layer == layer))
+    if regions:
+        db.execute(insert(SpatialRegion), [{"layer": layer, **region} for region in regions])
+    db.commit()
+    return len(regions)
+
+def delete_region_layer(db: Session, layer: str) -> int:
+    deleted = db.execute(delete(SpatialRegion).where(SpatialRegion.layer == layer)).rowcount
+    db.commit()
+    return deleted
+
+def get_region_layer(db: Session, layer: str) -> List[Any]:
+    """(region_id, geometry) rows of a layer."""
+    return db.execute(
+        select(SpatialRegion.region_id, SpatialRegion.geometry)
+        .where(SpatialRegion.layer == layer)
+        .order_by(SpatialRegion.id)
+    ).all()
+
+def list_region_layers(db: Session) -> List[Dict[str, Any]]:
+    rows = db.execute(
+        select(SpatialRegion.layer, func.count(), func.max(SpatialRegion.created_at))
+        .group_by(SpatialRegion.layer)
+        .order_by(SpatialRegion.layer)
+    ).all()
+    return [{"layer": layer, "regions": count, "updated_at": updated_at} for layer, count, updated_at in rows]
+
+def write_point_regions(db: Session, key: str, ids: Sequence[int], region_ids: Sequence[Optional[str]]) -> List[int]:
+    """Set ``properties[key]`` to each point's region id, removing the key where it is None.
+
+    One UPDATE per call on PostgreSQL, joined against unnested arrays, that
+    skips rows whose value is already right so re-runs rewrite only what
+    moved. Other databases merge the properties in Python. Commits; returns
+    the ids of the rows changed.
+    """
+    if len(ids) == 0:
+        return []
+    ids = [int(spatial_id) for spatial_id in ids]
+    region_ids = list(region_ids)
+    if db.get_bind().dialect.name == "postgresql":
+        changed = db.execute(
+            text(
+                """
+                UPDATE spatial_data AS s
+                SET properties = CASE
+                    WHEN v.region_id IS NULL THEN COALESCE(s.properties, '{}'::jsonb) - CAST(:key AS text)
+                    ELSE COALESCE(s.properties, '{}'::jsonb) || jsonb_build_object(CAST(:key AS text), v.region_id)
+                END
+                FROM (SELECT unnest(CAST(:ids AS integer[])) AS id, unnest(CAST(:region_ids AS text[])) AS region_id) AS v
+                WHERE s.id = v.id AND (s.properties ->> CAST(:key AS text)) IS DISTINCT FROM v.region_id
+                RETURNING s.id
+                """
+            ),
+            {"key": key, "ids": ids, "region_ids": region_ids},
+        ).scalars().all()
+        db.commit()
+        return changed
+
+    current = dict(db.execute(
+        select(SpatialData.id, SpatialData.properties).where(SpatialData.id.in_(ids))
+    ).all())
+    updates = []
+    for spatial_id, region_id in zip(ids, region_ids):
+        properties = dict(current.get(spatial_id) or {})
+        if properties.get(key) == region_id:
+            continue
+        if region_id is None:
+            properties.pop(key, None)
+        else:
+            properties[key] = region_id
+        updates.append({"row_id": spatial_id, "properties": properties})
+    if updates:
+        db.execute(
+            update(SpatialData.__table__)
+            .where(SpatialData.__table__.c.id == bindparam("row_id"))
+            .values(properties=bindparam("properties")),
+            updates,
+        )
+    db.commit()
+    return [row["row_id"] for row in updates]
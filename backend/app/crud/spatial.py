@@ -1,20 +1,118 @@
+import numpy as np
+from sqlalchemy import Select, and_, func, insert, or_, select, text, update
 from sqlalchemy.orm import Session
+from app.core.config import settings
 from app.models.spatial import SpatialData
+from app.crud import statistics
+from app.crud.statistics import apply_statistics_delta
+from app.services.cache import CacheService
+from app.services.cells import CELL_KEY_ZOOM, cell_key, cell_keys, cover_bbox, tile_key, tile_key_range
 from app.schemas.spatial import SpatialDataCreate
-from typing import List, Optional
+from typing import Any, Iterator, List, Optional, Sequence, Tuple
+import csv
+import io
+import json
 
 def create_spatial_data(db: Session, data: SpatialDataCreate) -> SpatialData:
     """Create a new spatial data record."""
     db_spatial = SpatialData(
         name=data.name,
-        geom=data.geom,
+        latitude=data.latitude,
+        longitude=data.longitude,
+        cell_key=cell_key(data.latitude, data.longitude),
         properties=data.properties or {}
     )
     db.add(db_spatial)
+    apply_statistics_delta(db, [data])
     db.commit()
     db.refresh(db_spatial)
+    CacheService().invalidate_spatial_write([db_spatial.id], [(data.latitude, data.longitude)])
     return db_spatial
 
+def bulk_create_spatial_data(db: Session, rows: List[SpatialDataCreate]) -> int:
+    """Insert a batch of spatial data records in a single round trip.
+
+    Uses PostgreSQL COPY when the session is bound to psycopg2 and falls back
+    to a multi-row INSERT for other drivers. Commits once per batch.
+    """
+    if not rows:
+        return 0
+
+    keys = cell_keys([row.latitude for row in rows], [row.longitude for row in rows]).tolist()
+    if db.get_bind().dialect.name == "postgresql":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row, key in zip(rows, keys):
+            writer.writerow([
+                row.name,
+                row.latitude,
+                row.longitude,
+                key,
+                json.dumps(row.properties or {}, allow_nan=False),
+            ])
+        buffer.seek(0)
+
+        raw_connection = db.connection().connection
+        with raw_connection.cursor() as cursor:
+            cursor.copy_expert(
+                "COPY spatial_data (name, latitude, longitude, cell_key, properties) "
+                "FROM STDIN WITH (FORMAT csv)",
+                buffer,
+            )
+    else:
+        db.execute(
+            insert(SpatialData),
+            [
+                {
+                    "name": row.name,
+                    "latitude": row.latitude,
+                    "longitude": row.longitude,
+                    "cell_key": key,
+                    "properties": row.properties or {},
+                }
+                for row, key in zip(rows, keys)
+            ],
+        )
+
+    apply_statistics_delta(db, rows)
+    db.commit()
+    # COPY returns no IDs; new rows cannot have cached records, so only tags are bumped
+    CacheService().invalidate_spatial_write(points=[(row.latitude, row.longitude) for row in rows])
+    return len(rows)
+
+# Plain column select of a row, in the order app.services.encoding expects
+SPATIAL_ROW_COLUMNS = (
+    SpatialData.id,
+    SpatialData.name,
+    SpatialData.latitude,
+    SpatialData.longitude,
+    SpatialData.properties,
+    SpatialData.created_at,
+)
+
+def spatial_bbox_select(minx: float, miny: float, maxx: float, maxy: float, *entities: Any) -> Select:
+    """SELECT for rows inside a bbox (minx > maxx crosses the antimeridian).
+
+    Selects SpatialData objects unless other ``entities`` (e.g.
+    SPATIAL_ROW_COLUMNS) are given.
+
+    Cell key ranges from the quadtree cover drive B-tree range scans; the
+    latitude/longitude predicate trims the cover to the exact bbox.
+    """
+    ranges = cover_bbox(minx, miny, maxx, maxy, settings.cell_cover_max_tiles)
+    # Pad with repeats to a power of two so covers share a few statement shapes in the statement caches
+    ranges += ranges[-1:] * ((1 << (len(ranges) - 1).bit_length()) - len(ranges))
+    key_ranges = or_(*[SpatialData.cell_key.between(low, high) for low, high in ranges])
+    if minx <= maxx:
+        in_longitude = SpatialData.longitude.between(minx, maxx)
+    else:
+        in_longitude = or_(SpatialData.longitude >= minx, SpatialData.longitude <= maxx)
+    return (
+        select(*(entities or (SpatialData,)))
+        .where(and_(key_ranges, SpatialData.latitude.between(miny, maxy), in_longitude))
+        .order_by(SpatialData.id)
+    )
+
 def get_spatial_data_within_bounds(
     db: Session, 
     minx: float, 
@@ -23,15 +121,210 @@ def get_spatial_data_within_bounds(
     maxy: float
 ) -> List[SpatialData]:
     """Get spatial data within specified bounds."""
-    from sqlalchemy import text
-    
-    query = text("""
-        SELECT * FROM spatial_data 
-        WHERE ST_Within(geom, ST_MakeEnvelope(:minx, :miny, :maxx, :maxy, 4326))
-    """)
-    
-    result = db.execute(query, {"minx": minx, "miny": miny, "maxx": maxx, "maxy": maxy})
-    return result.fetchall()
+    return list(db.execute(spatial_bbox_select(minx, miny, maxx, maxy)).scalars().all())
+
+def get_tile_points(db: Session, z: int, x: int, y: int, limit: int = 20000) -> List[Any]:
+    """Rows (id, name, latitude, longitude, properties) inside a z/x/y tile, in ID order."""
+    low, high = tile_key_range(tile_key(x, y), z)
+    return db.execute(
+        select(
+            SpatialData.id,
+            SpatialData.name,
+            SpatialData.latitude,
+            SpatialData.longitude,
+            SpatialData.properties,
+        )
+        .where(SpatialData.cell_key.between(low, high))
+        .order_by(SpatialData.id)
+        .limit(limit)
+    ).all()
+
+def get_tile_clusters(db: Session, z: int, x: int, y: int, depth: int) -> List[Any]:
+    """Rows (tile_key, point_count, sum_latitude, sum_longitude) on a 2**depth grid inside a z/x/y tile.
+
+    Read from the tile rollups when they cover zoom ``z + depth`` and are
+    built, otherwise grouped from the tile's cell key range.
+    """
+    sub_zoom = z + depth
+    key = tile_key(x, y)
+    if (
+        db.get_bind().dialect.name == "postgresql"
+        and settings.tile_rollup_min_zoom <= sub_zoom <= settings.tile_rollup_max_zoom
+    ):
+        try:
+            return statistics.get_tile_rollups(
+                db, sub_zoom, key_range=(key << (2 * depth), ((key + 1) << (2 * depth)) - 1)
+            )
+        except statistics.StatisticsNotReady:
+            # Rollups are being built; group the tile's own rows meanwhile
+            pass
+
+    low, high = tile_key_range(key, z)
+    sub_key = SpatialData.cell_key.op(">>")(2 * (CELL_KEY_ZOOM - sub_zoom)).label("tile_key")
+    return db.execute(
+        select(
+            sub_key,
+            func.count().label("point_count"),
+            func.sum(SpatialData.latitude).label("sum_latitude"),
+            func.sum(SpatialData.longitude).label("sum_longitude"),
+        )
+        .where(SpatialData.cell_key.between(low, high))
+        .group_by(sub_key)
+    ).all()
+
+def backfill_cell_keys(db: Session, chunk_size: int = 50000) -> int:
+    """Compute cell keys for rows written before the column existed; commits per chunk."""
+    updated = 0
+    while True:
+        rows = db.execute(
+            select(SpatialData.id, SpatialData.latitude, SpatialData.longitude)
+            .where(SpatialData.cell_key.is_(None))
+            .order_by(SpatialData.id)
+            .limit(chunk_size)
+        ).all()
+        if not rows:
+            return updated
+
+        ids, lats, lons = zip(*rows)
+        db.execute(
+            update(SpatialData),
+            [
+                {"id": spatial_id, "cell_key": key}
+                for spatial_id, key in zip(ids, cell_keys(lats, lons).tolist())
+            ],
+        )
+        db.commit()
+        updated += len(rows)
+        if len(rows) < chunk_size:
+            return updated
+
+def get_spatial_data_by_ids(db: Session, spatial_ids: Sequence[int]) -> List[SpatialData]:
+    """Get spatial data for a set of IDs, ordered by ID."""
+    if len(spatial_ids) == 0:
+        return []
+    return (
+        db.query(SpatialData)
+        .filter(SpatialData.id.in_([int(spatial_id) for spatial_id in spatial_ids]))
+        .order_by(SpatialData.id)
+        .all()
+    )
+
+def iter_spatial_coordinates(
+    db: Session,
+    chunk_size: int = 100000,
+    after_id: int = 0,
+) -> Iterator[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """Stream (ids, latitudes, longitudes) arrays in ID order without building ORM objects."""
+    last_id = after_id
+    while True:
+        rows = db.execute(
+            select(SpatialData.id, SpatialData.latitude, SpatialData.longitude)
+            .where(SpatialData.id > last_id)
+            .order_by(SpatialData.id)
+            .limit(chunk_size)
+        ).all()
+        if not rows:
+            return
+
+        ids, lats, lons = zip(*rows)
+        yield (
+            np.asarray(ids, dtype=np.int64),
+            np.asarray(lats, dtype=np.float64),
+            np.asarray(lons, dtype=np.float64),
+        )
+
+        last_id = ids[-1]
+        if len(rows) < chunk_size:
+            return
+
+def get_spatial_ids_after(db: Session, after_id: int) -> np.ndarray:
+    """IDs above ``after_id``, read from the primary key index alone."""
+    ids = db.execute(select(SpatialData.id).where(SpatialData.id > after_id)).scalars().all()
+    return np.asarray(ids, dtype=np.int64)
+
+def get_spatial_coordinates_in_range(
+    db: Session, first_id: int, last_id: int
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """(ids, latitudes, longitudes) arrays for the inclusive ID range."""
+    rows = db.execute(
+        select(SpatialData.id, SpatialData.latitude, SpatialData.longitude)
+        .where(SpatialData.id >= first_id, SpatialData.id <= last_id)
+    ).all()
+    if not rows:
+        return np.empty(0, dtype=np.int64), np.empty(0), np.empty(0)
+    ids, lats, lons = zip(*rows)
+    return (
+        np.asarray(ids, dtype=np.int64),
+        np.asarray(lats, dtype=np.float64),
+        np.asarray(lons, dtype=np.float64),
+    )
+
+def _dataset_filters(dataset_id: Optional[str]) -> List[Any]:
+    # Rows belong to a dataset through properties.dataset_id; None selects the whole table
+    if dataset_id is None:
+        return []
+    return [SpatialData.properties.contains({"dataset_id": dataset_id})]
+
+def get_id_chunk_bounds(db: Session, chunk_rows: int, dataset_id: Optional[str] = None) -> List[Tuple[int, int]]:
+    """Split a dataset into inclusive (first_id, last_id) ranges of about ``chunk_rows`` rows.
+
+    One pass numbers the matching rows in id order and keeps only the first
+    and last id of each chunk. Without a dataset filter the pass can read ids
+    off the primary key index; with one it scans the dataset's rows once.
+    """
+    numbered = (
+        select(
+            SpatialData.id.label("id"),
+            func.row_number().over(order_by=SpatialData.id).label("position"),
+            func.count().over().label("total"),
+        )
+        .where(*_dataset_filters(dataset_id))
+        .subquery()
+    )
+    edges = db.execute(
+        select(numbered.c.id, numbered.c.position)
+        .where(or_(
+            (numbered.c.position - 1) % chunk_rows == 0,
+            numbered.c.position % chunk_rows == 0,
+            numbered.c.position == numbered.c.total,
+        ))
+        .order_by(numbered.c.id)
+    ).all()
+
+    bounds = []
+    for spatial_id, position in edges:
+        if (position - 1) % chunk_rows == 0:
+            bounds.append([spatial_id, spatial_id])
+        else:
+            bounds[-1][1] = spatial_id
+    return [(first_id, last_id) for first_id, last_id in bounds]
+
+
+def get_coordinates_in_id_range(
+    db: Session,
+    first_id: int,
+    last_id: int,
+    dataset_id: Optional[str] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """(latitudes, longitudes) arrays of the rows with first_id <= id <= last_id."""
+    rows = db.execute(
+        select(SpatialData.latitude, SpatialData.longitude)
+        .where(SpatialData.id.between(first_id, last_id), *_dataset_filters(dataset_id))
+    ).all()
+    if not rows:
+        return np.empty(0, dtype=np.float64), np.empty(0, dtype=np.float64)
+    lats, lons = zip(*rows)
+    return np.asarray(lats, dtype=np.float64), np.asarray(lons, dtype=np.float64)
+
+def estimate_spatial_data_count(db: Session) -> int:
+    """Cheap row count: planner statistics on PostgreSQL, COUNT(*) elsewhere."""
+    if db.get_bind().dialect.name == "postgresql":
+        estimate = db.execute(
+            text("SELECT reltuples::bigint FROM pg_class WHERE relname = 'spatial_data'")
+        ).scalar()
+        if estimate is not None and estimate >= 0:
+            return int(estimate)
+    return db.execute(select(func.count()).select_from(SpatialData)).scalar() or 0
 
 def get_spatial_data_by_id(db: Session, spatial_id: int) -> Optional[SpatialData]:
     """Get spatial data by ID."""
@@ -39,4 +332,25 @@ def get_spatial_data_by_id(db: Session, spatial_id: int) -> Optional[SpatialData
 
 def get_all_spatial_data(db: Session, skip: int = 0, limit: int = 100) -> List[SpatialData]:
     """Get all spatial data with pagination."""
-    return db.query(SpatialData).offset(skip).limit(limit).all() 
\ No newline at end of file
+    return db.query(SpatialData).offset(skip).limit(limit).all()
+
+def get_spatial_data_page(db: Session, after_id: int = 0, limit: int = 100) -> List[SpatialData]:
+    """Get the next page of spatial data after an ID (keyset pagination on the primary key)."""
+    return (
+        db.query(SpatialData)
+        .filter(SpatialData.id > after_id)
+        .order_by(SpatialData.id)
+        .limit(limit)
+        .all()
+    )
+
+def stream_spatial_data_rows(db: Session, batch_size: int = 10000) -> Iterator[List[Any]]:
+    """Yield batches of plain rows from a server-side cursor, in ID order."""
+    result = db.execute(
+        select(*SPATIAL_ROW_COLUMNS)
+        .order_by(SpatialData.id)
+        .execution_options(yield_per=batch_size)
+    )
+    for partition in result.partitions():
+        yield partition
+ 
\ No newline at end of file
@@ -0,0 +1,402 @@
+from collections import Counter
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+import logging
+import numpy as np
+from sqlalchemy import func, or_, select, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.models.spatial import SpatialData, SpatialDataSummary, SpatialPropertyKeyStats, SpatialTileRollup
+from app.services.cells import CELL_KEY_ZOOM, cell_keys, cover_tiles
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_ID = 1
+
+# Ingest deltas take this advisory lock shared, full rebuilds take it exclusively,
+# so a rebuild never double counts or drops rows from an in-flight ingest.
+STATISTICS_LOCK_ID = 0x5350_5354
+# Held for the whole cell key backfill, so only one API process runs it
+BACKFILL_LOCK_ID = 0x5350_424B
+
+
+def _is_postgres(db: Session) -> bool:
+    return db.get_bind().dialect.name == "postgresql"
+
+
+def apply_statistics_delta(db: Session, rows: Iterable[Any]) -> None:
+    """Fold a batch of new rows into the summary tables inside the caller's transaction.
+
+    ``rows`` are SpatialDataCreate payloads or SpatialData objects; the caller
+    commits. A no-op on databases other than PostgreSQL.
+    """
+    if not _is_postgres(db):
+        return
+
+    count = 0
+    min_lat = max_lat = min_lon = max_lon = None
+    sum_lat = sum_lon = 0.0
+    lats: List[float] = []
+    lons: List[float] = []
+    key_counts: Counter = Counter()
+    for row in rows:
+        count += 1
+        lat, lon = row.latitude, row.longitude
+        lats.append(lat)
+        lons.append(lon)
+        min_lat = lat if min_lat is None else min(min_lat, lat)
+        max_lat = lat if max_lat is None else max(max_lat, lat)
+        min_lon = lon if min_lon is None else min(min_lon, lon)
+        max_lon = lon if max_lon is None else max(max_lon, lon)
+        sum_lat += lat
+        sum_lon += lon
+        key_counts.update((row.properties or {}).keys())
+
+    if count == 0:
+        return
+
+    db.execute(text("SELECT pg_advisory_xact_lock_shared(:lock_id)"), {"lock_id": STATISTICS_LOCK_ID})
+
+    summary = SpatialDataSummary.__table__
+    updated = db.execute(
+        summary.update()
+        .where(summary.c.id == SUMMARY_ID)
+        .values(
+            total_points=summary.c.total_points + count,
+            min_latitude=func.least(summary.c.min_latitude, min_lat),
+            max_latitude=func.greatest(summary.c.max_latitude, max_lat),
+            min_longitude=func.least(summary.c.min_longitude, min_lon),
+            max_longitude=func.greatest(summary.c.max_longitude, max_lon),
+            sum_latitude=summary.c.sum_latitude + sum_lat,
+            sum_longitude=summary.c.sum_longitude + sum_lon,
+            updated_at=func.now(),
+        )
+    )
+    if updated.rowcount == 0:
+        # Not built yet; the first read queues a rebuild from spatial_data
+        return
+
+    if key_counts:
+        key_stats = SpatialPropertyKeyStats.__table__
+        insert_keys = pg_insert(key_stats).values([
+            {"key": key, "point_count": key_count}
+            for key, key_count in sorted(key_counts.items())
+        ])
+        db.execute(insert_keys.on_conflict_do_update(
+            index_elements=[key_stats.c.key],
+            set_={
+                "point_count": key_stats.c.point_count + insert_keys.excluded.point_count,
+                "updated_at": func.now(),
+            },
+        ))
+
+    _apply_tile_rollup_delta(db, lats, lons)
+
+
+def _apply_tile_rollup_delta(db: Session, lats: List[float], lons: List[float]) -> None:
+    # Aggregate the batch per (zoom, tile) in SQL and add it onto the rollup rows
+    db.execute(text("""
+        INSERT INTO spatial_tile_rollup (zoom, tile_key, point_count, sum_latitude, sum_longitude, updated_at)
+        SELECT zoom, cell.cell_key >> (2 * (:cell_zoom - zoom)), count(*), sum(cell.latitude), sum(cell.longitude), now()
+        FROM unnest(CAST(:cell_keys AS bigint[]), CAST(:lats AS double precision[]), CAST(:lons AS double precision[]))
+                AS cell(cell_key, latitude, longitude),
+             generate_series(:min_zoom, :max_zoom) AS zoom
+        GROUP BY 1, 2
+        ORDER BY 1, 2
+        ON CONFLICT (zoom, tile_key) DO UPDATE SET
+            point_count = spatial_tile_rollup.point_count + excluded.point_count,
+            sum_latitude = spatial_tile_rollup.sum_latitude + excluded.sum_latitude,
+            sum_longitude = spatial_tile_rollup.sum_longitude + excluded.sum_longitude,
+            updated_at = excluded.updated_at
+    """), {
+        "cell_zoom": CELL_KEY_ZOOM,
+        "cell_keys": cell_keys(lats, lons).tolist(),
+        "lats": lats,
+        "lons": lons,
+        "min_zoom": settings.tile_rollup_min_zoom,
+        "max_zoom": settings.tile_rollup_max_zoom,
+    })
+
+
+def _rebuild_tile_rollups(db: Session) -> None:
+    # Group raw rows once at the finest zoom, then derive each coarser zoom from the one below
+    db.execute(text("DELETE FROM spatial_tile_rollup"))
+    db.execute(text("""
+        INSERT INTO spatial_tile_rollup (zoom, tile_key, point_count, sum_latitude, sum_longitude, updated_at)
+        SELECT :zoom, cell_key >> (2 * (:cell_zoom - :zoom)), count(*), sum(latitude), sum(longitude), now()
+        FROM spatial_data
+        WHERE cell_key IS NOT NULL
+        GROUP BY 2
+    """), {"zoom": settings.tile_rollup_max_zoom, "cell_zoom": CELL_KEY_ZOOM})
+    for zoom in range(settings.tile_rollup_max_zoom - 1, settings.tile_rollup_min_zoom - 1, -1):
+        db.execute(text("""
+            INSERT INTO spatial_tile_rollup (zoom, tile_key, point_count, sum_latitude, sum_longitude, updated_at)
+            SELECT :zoom, tile_key >> 2, sum(point_count), sum(sum_latitude), sum(sum_longitude), now()
+            FROM spatial_tile_rollup
+            WHERE zoom = :zoom + 1
+            GROUP BY 2
+        """), {"zoom": zoom})
+
+
+def rebuild_spatial_statistics(db: Session) -> None:
+    """Recompute the summary tables from spatial_data with set-based SQL and commit."""
+    if not _is_postgres(db):
+        return
+
+    db.execute(text("SELECT pg_advisory_xact_lock(:lock_id)"), {"lock_id": STATISTICS_LOCK_ID})
+    db.execute(text("""
+        INSERT INTO spatial_data_summary (
+            id, total_points, min_latitude, max_latitude, min_longitude, max_longitude,
+            sum_latitude, sum_longitude, rebuilt_at, updated_at
+        )
+        SELECT :summary_id, count(*), min(latitude), max(latitude), min(longitude), max(longitude),
+               coalesce(sum(latitude), 0), coalesce(sum(longitude), 0), now(), now()
+        FROM spatial_data
+        ON CONFLICT (id) DO UPDATE SET
+            total_points = excluded.total_points,
+            min_latitude = excluded.min_latitude,
+            max_latitude = excluded.max_latitude,
+            min_longitude = excluded.min_longitude,
+            max_longitude = excluded.max_longitude,
+            sum_latitude = excluded.sum_latitude,
+            sum_longitude = excluded.sum_longitude,
+            rebuilt_at = excluded.rebuilt_at,
+            updated_at = excluded.updated_at
+    """), {"summary_id": SUMMARY_ID})
+    # Point counts only; distinct values are recounted below without the lock
+    db.execute(text("""
+        INSERT INTO spatial_property_key_stats (key, point_count, updated_at)
+        SELECT entry.key, count(*), now()
+        FROM spatial_data, jsonb_each(spatial_data.properties) AS entry
+        WHERE jsonb_typeof(spatial_data.properties) = 'object'
+        GROUP BY entry.key
+        ORDER BY entry.key
+        ON CONFLICT (key) DO UPDATE SET
+            point_count = excluded.point_count,
+            updated_at = excluded.updated_at
+    """))
+    # Every key still in use was just stamped with this transaction's now()
+    db.execute(text("DELETE FROM spatial_property_key_stats WHERE updated_at IS DISTINCT FROM now()"))
+    _rebuild_tile_rollups(db)
+    db.commit()
+    refresh_distinct_values(db)
+
+
+def refresh_distinct_values(db: Session) -> None:
+    """Recount distinct values per property key from a snapshot read and commit.
+
+    Point counts are kept current by the ingest deltas, so this takes no
+    advisory lock: writers carry on during the scan and only the short
+    write-back touches the key stats rows.
+    """
+    if not _is_postgres(db):
+        return
+
+    counted = db.execute(text("""
+        SELECT entry.key, count(DISTINCT entry.value)
+        FROM spatial_data, jsonb_each(spatial_data.properties) AS entry
+        WHERE jsonb_typeof(spatial_data.properties) = 'object'
+        GROUP BY entry.key
+        ORDER BY entry.key
+    """)).all()
+    if counted:
+        # Key order matches the ingest upserts, so the two cannot deadlock
+        db.execute(
+            text("""
+                UPDATE spatial_property_key_stats
+                SET distinct_values = :distinct_values, updated_at = now()
+                WHERE key = :key
+            """),
+            [{"key": key, "distinct_values": distinct_values} for key, distinct_values in counted],
+        )
+    db.commit()
+
+
+def refresh_spatial_statistics(db: Session) -> bool:
+    """Build the summary tables if they are missing, otherwise only recount distinct values.
+
+    Returns whether a full rebuild ran.
+    """
+    if not _is_postgres(db):
+        return False
+    if db.get(SpatialDataSummary, SUMMARY_ID) is None:
+        rebuild_spatial_statistics(db)
+        return True
+    refresh_distinct_values(db)
+    return False
+
+
+class StatisticsNotReady(Exception):
+    """The summary tables have not been built yet; a rebuild has been queued."""
+
+
+STATISTICS_SCHEDULE_KEY = "statistics_rebuild_scheduled"
+
+
+def schedule_statistics_refresh(countdown: int = 0) -> None:
+    """Queue one refresh_spatial_statistics task; calls while one is pending are dropped.
+
+    The task clears the key when it starts, so writes that land during a
+    refresh queue the next one.
+    """
+    from app.services.cache import get_redis_client
+    from app.tasks.geospatial_tasks import refresh_spatial_statistics
+
+    try:
+        if get_redis_client().set(STATISTICS_SCHEDULE_KEY, 1, nx=True, ex=settings.statistics_rebuild_retry_seconds):
+            refresh_spatial_statistics.apply_async(countdown=countdown)
+    except Exception as e:
+        logger.error(f"Failed to schedule statistics refresh: {e}")
+
+
+def clear_statistics_schedule() -> None:
+    from app.services.cache import get_redis_client
+
+    try:
+        get_redis_client().delete(STATISTICS_SCHEDULE_KEY)
+    except Exception as e:
+        logger.error(f"Failed to clear the statistics refresh schedule: {e}")
+
+
+def _get_summary(db: Session) -> SpatialDataSummary:
+    summary = db.get(SpatialDataSummary, SUMMARY_ID)
+    if summary is None:
+        # A full-table aggregation; never run it inside a request
+        schedule_statistics_refresh()
+        raise StatisticsNotReady("Spatial statistics are being built, retry shortly")
+    return summary
+
+
+def _check_rollup_zoom(zoom: int) -> None:
+    if not settings.tile_rollup_min_zoom <= zoom <= settings.tile_rollup_max_zoom:
+        raise ValueError(
+            f"Rollups cover zoom {settings.tile_rollup_min_zoom}-{settings.tile_rollup_max_zoom}, got {zoom}"
+        )
+
+
+def get_tile_rollups(
+    db: Session,
+    zoom: int,
+    bbox: Optional[Tuple[float, float, float, float]] = None,
+    limit: Optional[int] = None,
+    key_range: Optional[Tuple[int, int]] = None,
+) -> List[Any]:
+    """Rollup rows (tile_key, point_count, sum_latitude, sum_longitude) at a zoom.
+
+    Optionally restricted to a bbox or an inclusive tile key range.
+    """
+    if not _is_postgres(db):
+        return []
+    _check_rollup_zoom(zoom)
+    _get_summary(db)
+
+    query = (
+        select(
+            SpatialTileRollup.tile_key,
+            SpatialTileRollup.point_count,
+            SpatialTileRollup.sum_latitude,
+            SpatialTileRollup.sum_longitude,
+        )
+        .where(SpatialTileRollup.zoom == zoom)
+        .order_by(SpatialTileRollup.tile_key)
+    )
+    if bbox is not None:
+        query = query.where(or_(*[
+            SpatialTileRollup.tile_key.between(low, high)
+            for low, high in cover_tiles(*bbox, zoom)
+        ]))
+    if key_range is not None:
+        query = query.where(SpatialTileRollup.tile_key.between(*key_range))
+    if limit is not None:
+        query = query.limit(limit)
+    return db.execute(query).all()
+
+
+def iter_tile_rollups(
+    db: Session,
+    zoom: int,
+    chunk_size: int = 100000,
+) -> Iterator[Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]]:
+    """Stream (tile_keys, counts, sum_lats, sum_lons) arrays for one zoom in tile key order."""
+    if not _is_postgres(db):
+        return
+    _check_rollup_zoom(zoom)
+    _get_summary(db)
+
+    last_key = -1
+    while True:
+        rows = db.execute(
+            select(
+                SpatialTileRollup.tile_key,
+                SpatialTileRollup.point_count,
+                SpatialTileRollup.sum_latitude,
+                SpatialTileRollup.sum_longitude,
+            )
+            .where(SpatialTileRollup.zoom == zoom, SpatialTileRollup.tile_key > last_key)
+            .order_by(SpatialTileRollup.tile_key)
+            .limit(chunk_size)
+        ).all()
+        if not rows:
+            return
+
+        keys, counts, sum_lats, sum_lons = zip(*rows)
+        yield (
+            np.asarray(keys, dtype=np.int64),
+            np.asarray(counts, dtype=np.int64),
+            np.asarray(sum_lats, dtype=np.float64),
+            np.asarray(sum_lons, dtype=np.float64),
+        )
+
+        last_key = keys[-1]
+        if len(rows) < chunk_size:
+            return
+
+
+def get_spatial_statistics(db: Session) -> Dict[str, Any]:
+    """Read whole-table statistics from the summary tables; raises StatisticsNotReady until they are built."""
+    if not _is_postgres(db):
+        total, min_lat, max_lat, min_lon, max_lon = db.execute(
+            select(
+                func.count(),
+                func.min(SpatialData.latitude),
+                func.max(SpatialData.latitude),
+                func.min(SpatialData.longitude),
+                func.max(SpatialData.longitude),
+            ).select_from(SpatialData)
+        ).one()
+        return {
+            "total_points": total,
+            "extent": {"min_lat": min_lat, "max_lat": max_lat, "min_lon": min_lon, "max_lon": max_lon},
+        }
+
+    summary = _get_summary(db)
+
+    key_stats = db.execute(
+        select(
+            SpatialPropertyKeyStats.key,
+            SpatialPropertyKeyStats.point_count,
+            SpatialPropertyKeyStats.distinct_values,
+        ).order_by(SpatialPropertyKeyStats.point_count.desc(), SpatialPropertyKeyStats.key)
+    ).all()
+
+    total = summary.total_points or 0
+    return {
+        "total_points": total,
+        "extent": {
+            "min_lat": summary.min_latitude,
+            "max_lat": summary.max_latitude,
+            "min_lon": summary.min_longitude,
+            "max_lon": summary.max_longitude,
+        },
+        "mean_center": (
+            (summary.sum_latitude / total, summary.sum_longitude / total) if total else None
+        ),
+        "unique_property_keys": len(key_stats),
+        "property_keys": [row.key for row in key_stats],
+        "property_key_stats": [
+            {"key": row.key, "point_count": row.point_count, "distinct_values": row.distinct_values}
+            for row in key_stats
+        ],
+        "rebuilt_at": summary.rebuilt_at.isoformat() if summary.rebuilt_at else None,
+        "updated_at": summary.updated_at.isoformat() if summary.updated_at else None,
+    }
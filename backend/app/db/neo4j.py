@@ -1,17 +1,155 @@
-from neo4j import GraphDatabase
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+import threading
+from neo4j import READ_ACCESS, WRITE_ACCESS, AsyncDriver, AsyncGraphDatabase, Driver, GraphDatabase
 from app.core.config import settings
+from app.core.metrics import Timer, neo4j_query_duration
+
+# One driver per process: each holds a bolt connection pool, so building one per
+# request paid the TCP/TLS/bolt handshake on every call. The API creates both in
+# its lifespan; Celery workers and scripts create the sync driver on first use.
+_driver: Optional[Driver] = None
+_async_driver: Optional[AsyncDriver] = None
+_driver_lock = threading.Lock()
+
+
+def _driver_options() -> Dict[str, Any]:
+    return {
+        "auth": (settings.neo4j_user, settings.neo4j_password),
+        "max_connection_pool_size": settings.neo4j_max_connection_pool_size,
+        "connection_acquisition_timeout": settings.neo4j_connection_acquisition_timeout,
+        "max_connection_lifetime": settings.neo4j_max_connection_lifetime,
+    }
+
+
+def get_driver() -> Driver:
+    """Process-wide sync driver."""
+    global _driver
+    if _driver is None:
+        with _driver_lock:
+            if _driver is None:
+                _driver = GraphDatabase.driver(settings.neo4j_uri, **_driver_options())
+    return _driver
+
+
+def get_async_driver() -> AsyncDriver:
+    """Process-wide asyncio driver; use it from a single event loop."""
+    global _async_driver
+    if _async_driver is None:
+        with _driver_lock:
+            if _async_driver is None:
+                _async_driver = AsyncGraphDatabase.driver(settings.neo4j_uri, **_driver_options())
+    return _async_driver
+
+
+def close_driver():
+    global _driver
+    with _driver_lock:
+        driver, _driver = _driver, None
+    if driver is not None:
+        driver.close()
+
+
+async def close_async_driver():
+    global _async_driver
+    with _driver_lock:
+        driver, _async_driver = _async_driver, None
+    if driver is not None:
+        await driver.close()
+
+
+def serialize_value(value: Any) -> Any:
+    """JSON-safe form of a record value: temporal types become ISO strings."""
+    if isinstance(value, dict):
+        return {key: serialize_value(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [serialize_value(item) for item in value]
+    if hasattr(value, "iso_format"):
+        # neo4j.time Date, Time, DateTime and Duration
+        return value.iso_format()
+    return value
+
+
+def serialize_record(record: Any) -> Dict[str, Any]:
+    """Record as a plain dict; nodes and relationships become property dicts, paths lists."""
+    return {key: serialize_value(value) for key, value in record.data().items()}
+
 
 class Neo4jConnection:
-    def __init__(self):
-        self.driver = GraphDatabase.driver(
-            settings.NEO4J_URI,
-            auth=(settings.NEO4J_USER, settings.NEO4J_PASSWORD),
-        )
-    
+    """Sync queries over the shared driver.
+
+    ``query`` runs in a managed transaction (retried on transient errors and
+    routed to readers or the writer); ``stream`` yields records as they arrive.
+    """
+
+    def __init__(self, driver: Optional[Driver] = None):
+        self.driver = driver or get_driver()
+
     def close(self):
-        self.driver.close()
-    
-    def query(self, query, parameters=None):
-        with self.driver.session() as session:
-            result = session.run(query, parameters)
-            return [record for record in result] 
\ No newline at end of file
+        """No-op: the shared driver is closed at process shutdown."""
+
+    def _session(self, access_mode: str, fetch_size: Optional[int] = None):
+        options = {"default_access_mode": access_mode, "fetch_size": fetch_size or settings.neo4j_fetch_size}
+        if settings.neo4j_database:
+            options["database"] = settings.neo4j_database
+        return self.driver.session(**options)
+
+    def query(self, query: str, parameters: Optional[Dict[str, Any]] = None, write: bool = False) -> List[Dict[str, Any]]:
+        """All records of a query as dicts."""
+        def work(tx):
+            return [serialize_record(record) for record in tx.run(query, parameters or {})]
+
+        with Timer(neo4j_query_duration, "write" if write else "read"):
+            with self._session(WRITE_ACCESS if write else READ_ACCESS) as session:
+                return session.execute_write(work) if write else session.execute_read(work)
+
+    def write(self, query: str, parameters: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        return self.query(query, parameters, write=True)
+
+    def stream(
+        self,
+        query: str,
+        parameters: Optional[Dict[str, Any]] = None,
+        fetch_size: Optional[int] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """Records from a read query, pulled from the server in ``fetch_size`` batches."""
+        with self._session(READ_ACCESS, fetch_size) as session:
+            for record in session.run(query, parameters or {}):
+                yield serialize_record(record)
+
+
+class AsyncNeo4jConnection:
+    """Asyncio counterpart of Neo4jConnection over the shared AsyncDriver."""
+
+    def __init__(self, driver: Optional[AsyncDriver] = None):
+        self.driver = driver or get_async_driver()
+
+    def _session(self, access_mode: str, fetch_size: Optional[int] = None):
+        options = {"default_access_mode": access_mode, "fetch_size": fetch_size or settings.neo4j_fetch_size}
+        if settings.neo4j_database:
+            options["database"] = settings.neo4j_database
+        return self.driver.session(**options)
+
+    async def query(self, query: str, parameters: Optional[Dict[str, Any]] = None, write: bool = False) -> List[Dict[str, Any]]:
+        async def work(tx):
+            result = await tx.run(query, parameters or {})
+            return [serialize_record(record) async for record in result]
+
+        with Timer(neo4j_query_duration, "write" if write else "read"):
+            async with self._session(WRITE_ACCESS if write else READ_ACCESS) as session:
+                if write:
+                    return await session.execute_write(work)
+                return await session.execute_read(work)
+
+    async def write(self, query: str, parameters: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        return await self.query(query, parameters, write=True)
+
+    async def stream(
+        self,
+        query: str,
+        parameters: Optional[Dict[str, Any]] = None,
+        fetch_size: Optional[int] = None,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        async with self._session(READ_ACCESS, fetch_size) as session:
+            result = await session.run(query, parameters or {})
+            async for record in result:
+                yield serialize_record(record)
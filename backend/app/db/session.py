@@ -1,16 +1,164 @@
+from itertools import count
+from typing import Any, Dict, List, Optional
 from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker
 from app.core.config import settings
+from app.core.metrics import Gauge, instrument_engine, registry
 
-engine = create_engine(
-    settings.database_url, 
-    connect_args={"check_same_thread": False} if "sqlite" in settings.database_url else {}
-)
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+# JSONB columns are decoded for every row of large listings; orjson is several times faster
+json_options = {}
+if orjson is not None:
+    json_options = {
+        "json_serializer": lambda value: orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS).decode(),
+        "json_deserializer": orjson.loads,
+    }
+
+
+def to_async_database_url(url: str) -> str:
+    """Swap a sync driver URL for its asyncio counterpart (asyncpg / aiosqlite)."""
+    scheme, _, rest = url.partition("://")
+    driver = scheme.split("+", 1)[0]
+    if driver in ("postgresql", "postgres"):
+        return f"postgresql+asyncpg://{rest}"
+    if driver == "sqlite":
+        return f"sqlite+aiosqlite://{rest}"
+    return url
+
+
+def replica_urls() -> List[str]:
+    return [url.strip() for url in settings.database_replica_urls.split(",") if url.strip()]
+
+
+def engine_options(url: str, pool_size: Optional[int] = None, max_overflow: Optional[int] = None) -> Dict[str, Any]:
+    """create_engine keyword arguments for ``url`` from the pool and statement cache settings."""
+    options: Dict[str, Any] = {"query_cache_size": settings.db_query_cache_size, **json_options}
+    if "sqlite" in url:
+        # SQLite pools are per-thread or static and take no sizing
+        if "aiosqlite" not in url:
+            options["connect_args"] = {"check_same_thread": False}
+        return options
+    options.update(
+        pool_size=settings.db_pool_size if pool_size is None else pool_size,
+        max_overflow=settings.db_max_overflow if max_overflow is None else max_overflow,
+        pool_timeout=settings.db_pool_timeout,
+        pool_recycle=settings.db_pool_recycle,
+        pool_pre_ping=settings.db_pool_pre_ping,
+    )
+    if url.startswith("postgresql+asyncpg"):
+        # Server-side prepared statements, reused per connection for the hot queries
+        options["connect_args"] = {"prepared_statement_cache_size": settings.db_statement_cache_size}
+    return options
+
+
+def _create_sync_engines(pool_size: Optional[int] = None, max_overflow: Optional[int] = None):
+    primary = create_engine(settings.database_url, **engine_options(settings.database_url, pool_size, max_overflow))
+    replicas = [create_engine(url, **engine_options(url, pool_size, max_overflow)) for url in replica_urls()]
+    instrument_engine(primary, "primary")
+    for replica in replicas:
+        instrument_engine(replica, "replica")
+    return primary, replicas
+
+
+engine, replica_engines = _create_sync_engines()
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+_replica_sessions = [sessionmaker(autocommit=False, autoflush=False, bind=replica) for replica in replica_engines]
+_next_replica = count()
+
+
+def ReadSessionLocal() -> Session:
+    """Session for read-only work on the next replica (round robin), or the primary without replicas.
+
+    Replicas may lag the primary, so code that reads its own writes keeps
+    using SessionLocal.
+    """
+    if not _replica_sessions:
+        return SessionLocal()
+    return _replica_sessions[next(_next_replica) % len(_replica_sessions)]()
+
+
+def configure_worker_engines():
+    """Replace the sync engines inherited by a Celery worker with ones sized for it.
+
+    Inherited pools are dropped without closing their connections, which
+    still belong to the parent process.
+    """
+    global engine, replica_engines
+    for old in [engine, *replica_engines]:
+        old.dispose(close=False)
+    engine, replica_engines = _create_sync_engines(settings.worker_db_pool_size, settings.worker_db_max_overflow)
+    SessionLocal.configure(bind=engine)
+    for factory, replica in zip(_replica_sessions, replica_engines):
+        factory.configure(bind=replica)
+
+
+def dispose_engines():
+    for current in [engine, *replica_engines]:
+        current.dispose()
+
+
+async_database_url = settings.async_database_url or to_async_database_url(settings.database_url)
+async_engine = create_async_engine(async_database_url, **engine_options(async_database_url))
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+instrument_engine(async_engine.sync_engine, "primary_async")
+
+async_replica_engines = [
+    create_async_engine(url, **engine_options(url))
+    for url in map(to_async_database_url, replica_urls())
+]
+for replica in async_replica_engines:
+    instrument_engine(replica.sync_engine, "replica_async")
+_async_replica_sessions = [
+    async_sessionmaker(replica, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+    for replica in async_replica_engines
+]
+
+
+def AsyncReadSessionLocal() -> AsyncSession:
+    """Async counterpart of ReadSessionLocal."""
+    if not _async_replica_sessions:
+        return AsyncSessionLocal()
+    return _async_replica_sessions[next(_next_replica) % len(_async_replica_sessions)]()
+
+
+def _pool_connections() -> Dict[tuple, float]:
+    engines = [("primary", engine), ("primary_async", async_engine.sync_engine)]
+    engines += [("replica", replica) for replica in replica_engines]
+    engines += [("replica_async", replica.sync_engine) for replica in async_replica_engines]
+    values: Dict[tuple, float] = {}
+    for name, current in engines:
+        pool = current.pool
+        if hasattr(pool, "checkedout"):
+            # Replicas share a label, so their connections are summed
+            checked_out = values.get((name, "checked_out"), 0) + pool.checkedout()
+            idle = values.get((name, "idle"), 0) + pool.checkedin()
+            values[(name, "checked_out")], values[(name, "idle")] = checked_out, idle
+    return values
+
+
+registry.register(Gauge("db_pool_connections", "Pooled database connections by engine and state", ("engine", "state"), _pool_connections))
+
+
+async def dispose_async_engines():
+    for current in [async_engine, *async_replica_engines]:
+        await current.dispose()
 
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close() 
\ No newline at end of file
+        db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+async def get_async_read_db():
+    async with AsyncReadSessionLocal() as db:
+        yield db
@@ -1,17 +1,48 @@
+import asyncio
 from contextlib import asynccontextmanager
-from fastapi import FastAPI, Depends
+from fastapi import FastAPI, Depends, Response
 from fastapi.middleware.cors import CORSMiddleware
+from app.core.concurrency import run_sync, shutdown_process_pool
 from app.core.config import settings
+from app.core.metrics import CONTENT_TYPE, MetricsMiddleware, render_metrics
 from app.api.v1.api import api_router
-from app.db.session import engine
+from app.db.session import dispose_async_engines, dispose_engines, engine
+from app.db.neo4j import close_async_driver, close_driver, get_async_driver, get_driver
 from app.db.base import Base
 from app.models.spatial import SpatialData
+from app.services.analysis import GeospatialAnalyzer
+from app.services.cache import close_async_redis_pool
+from app.services.property_filters import ensure_property_indexes
+from app.services.spatial_index import load_spatial_index
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # CREATE TABLES
     Base.metadata.create_all(bind=engine)
+    # ONE POOLED NEO4J DRIVER PER PROCESS, SHARED BY EVERY REQUEST
+    get_driver()
+    get_async_driver()
+    # FILL CELL KEYS FOR ROWS WRITTEN BEFORE THE COLUMN EXISTED
+    cell_key_backfill = asyncio.create_task(run_sync(GeospatialAnalyzer().backfill_cell_keys))
+    # EXPRESSION INDEXES FOR RANGE FILTERS ON HOT PROPERTY KEYS
+    property_indexes = asyncio.create_task(run_sync(ensure_property_indexes))
+    # WARM THE IN-MEMORY SPATIAL INDEX IN THE BACKGROUND
+    index_loader = None
+    if settings.spatial_index_enabled:
+        index_loader = asyncio.create_task(run_sync(load_spatial_index))
     yield
+    if index_loader and not index_loader.done():
+        index_loader.cancel()
+    if not cell_key_backfill.done():
+        cell_key_backfill.cancel()
+    if not property_indexes.done():
+        property_indexes.cancel()
+    await dispose_async_engines()
+    await close_async_driver()
+    await close_async_redis_pool()
+    await run_sync(close_driver)
+    await run_sync(dispose_engines)
+    shutdown_process_pool()
 
 app = FastAPI(title="OCTA", lifespan=lifespan)
 
@@ -23,4 +54,11 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(MetricsMiddleware)
+
 app.include_router(api_router, prefix="/api/v1")
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus text exposition of this process's metrics and the shared Celery task metrics."""
+    return Response(await run_sync(render_metrics), media_type=CONTENT_TYPE)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, func, JSON, Float
+from sqlalchemy import Column, Integer, BigInteger, SmallInteger, String, DateTime, Text, func, JSON, Float, Index, LargeBinary, UniqueConstraint
 from sqlalchemy.dialects.postgresql import JSONB
 from typing import Optional, Dict, Any
 from datetime import datetime
@@ -8,11 +8,16 @@ class SpatialData(Base):
     """Spatial data model for storing geographic points with properties."""
     
     __tablename__ = "spatial_data"
+    __table_args__ = (
+        # Serves the property filters (@>, ?, @?), see app.services.property_filters
+        Index("ix_spatial_data_properties", "properties", postgresql_using="gin"),
+    )
 
     id = Column(Integer, primary_key=True)
     name = Column(String(255), nullable=False)
     latitude = Column(Float, nullable=False)
     longitude = Column(Float, nullable=False)
+    cell_key = Column(BigInteger, nullable=True, index=True)  # see app.services.cells
     properties = Column(JSONB, nullable=True, default={})
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
@@ -24,4 +29,59 @@ class SpatialData(Base):
         """Extract coordinates from latitude and longitude."""
         if hasattr(self, 'latitude') and hasattr(self, 'longitude'):
             return (self.latitude, self.longitude)
-        return None
\ No newline at end of file
+        return None
+
+class SpatialDataSummary(Base):
+    """Single-row running totals for spatial_data, maintained on ingest."""
+    
+    __tablename__ = "spatial_data_summary"
+
+    id = Column(Integer, primary_key=True)
+    total_points = Column(BigInteger, nullable=False, default=0)
+    min_latitude = Column(Float, nullable=True)
+    max_latitude = Column(Float, nullable=True)
+    min_longitude = Column(Float, nullable=True)
+    max_longitude = Column(Float, nullable=True)
+    sum_latitude = Column(Float, nullable=False, default=0.0)
+    sum_longitude = Column(Float, nullable=False, default=0.0)
+    rebuilt_at = Column(DateTime(timezone=True), nullable=True)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class SpatialPropertyKeyStats(Base):
+    """Per-property-key counts; distinct value cardinality is recounted by the statistics refresh."""
+    
+    __tablename__ = "spatial_property_key_stats"
+
+    key = Column(Text, primary_key=True)
+    point_count = Column(BigInteger, nullable=False, default=0)
+    distinct_values = Column(BigInteger, nullable=True)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class SpatialTileRollup(Base):
+    """Point counts and coordinate sums per Web Mercator tile, for each rollup zoom level."""
+    
+    __tablename__ = "spatial_tile_rollup"
+
+    zoom = Column(SmallInteger, primary_key=True)
+    tile_key = Column(BigInteger, primary_key=True)
+    point_count = Column(BigInteger, nullable=False, default=0)
+    sum_latitude = Column(Float, nullable=False, default=0.0)
+    sum_longitude = Column(Float, nullable=False, default=0.0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class SpatialRegion(Base):
+    """One polygon of a region layer (admin areas, service zones), used to tag points by spatial join."""
+    
+    __tablename__ = "spatial_region"
+    __table_args__ = (UniqueConstraint("layer", "region_id", name="uq_spatial_region_layer_region_id"),)
+
+    id = Column(Integer, primary_key=True)
+    layer = Column(Text, nullable=False, index=True)
+    region_id = Column(Text, nullable=False)
+    name = Column(Text, nullable=True)
+    properties = Column(JSONB, nullable=True, default={})
+    geometry = Column(LargeBinary, nullable=False)  # WKB, lon/lat (EPSG:4326)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
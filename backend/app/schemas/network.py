@@ -0,0 +1,7 @@
+from pydantic import BaseModel, Field
+from typing import List, Optional
+
+class DistanceMatrixRequest(BaseModel):
+    sources: List[str] = Field(..., min_length=1, description="Origin node names")
+    targets: Optional[List[str]] = Field(None, description="Destination node names; defaults to the sources")
+    network_id: Optional[str] = Field(None, description="Restrict to nodes with this network_id; all nodes when omitted")
@@ -1,6 +1,7 @@
-from pydantic import BaseModel, Field
-from typing import Optional, Dict, Any
+from pydantic import BaseModel, Field, field_validator
+from typing import Optional, Dict, Any, List
 from datetime import datetime
+import json
 from geoalchemy2.shape import from_shape
 from shapely.geometry import Point
 
@@ -9,8 +10,18 @@ class SpatialDataBase(BaseModel):
     properties: Optional[Dict[str, Any]] = Field(default={}, description="Additional properties")
 
 class SpatialDataCreate(SpatialDataBase):
-    latitude: float = Field(..., description="Latitude coordinate")
-    longitude: float = Field(..., description="Longitude coordinate")
+    latitude: float = Field(..., ge=-90, le=90, allow_inf_nan=False, description="Latitude coordinate")
+    longitude: float = Field(..., ge=-180, le=180, allow_inf_nan=False, description="Longitude coordinate")
+
+    @field_validator("properties")
+    @classmethod
+    def properties_are_json(cls, properties: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """JSONB rejects NaN and Infinity, which would fail the whole COPY batch."""
+        try:
+            json.dumps(properties, allow_nan=False)
+        except (ValueError, TypeError) as e:
+            raise ValueError(f"Properties are not valid JSON: {e}")
+        return properties
     
     @property
     def geom(self):
@@ -24,4 +35,49 @@ class SpatialDataResponse(SpatialDataBase):
     created_at: datetime
     
     class Config:
-        from_attributes = True 
\ No newline at end of file
+        from_attributes = True 
+
+class BulkIngestRowError(BaseModel):
+    index: int = Field(..., description="Zero-based position of the record in the upload")
+    error: str = Field(..., description="Validation or parse error message")
+
+class BulkIngestBatchReport(BaseModel):
+    batch: int
+    received: int
+    inserted: int
+    rejected: int
+    elapsed_seconds: float
+    rows_per_second: float
+    errors: List[BulkIngestRowError] = []
+    errors_truncated: bool = False
+
+class BulkIngestResult(BaseModel):
+    format: str
+    chunk_size: int
+    received: int
+    inserted: int
+    rejected: int
+    elapsed_seconds: float
+    rows_per_second: float
+    batches: List[BulkIngestBatchReport] = []
+
+class QueryPoint(BaseModel):
+    latitude: float = Field(..., ge=-90, le=90)
+    longitude: float = Field(..., ge=-180, le=180)
+
+class NearestBatchRequest(BaseModel):
+    points: List[QueryPoint] = Field(..., min_length=1, description="Query locations, each answered separately")
+    k: int = Field(10, ge=1, description="Neighbours per query point")
+
+class RadiusBatchRequest(BaseModel):
+    points: List[QueryPoint] = Field(..., min_length=1, description="Query locations, each answered separately")
+    radius_km: float = Field(..., gt=0, description="Great-circle search radius")
+    limit: int = Field(1000, ge=1, description="Maximum points returned per query point, nearest first")
+
+class RegionLayerUpload(BaseModel):
+    type: str = Field("FeatureCollection", description="GeoJSON FeatureCollection")
+    features: List[Dict[str, Any]] = Field(..., min_length=1, description="Polygon or MultiPolygon features")
+
+class RegionLookupRequest(BaseModel):
+    points: List[QueryPoint] = Field(..., min_length=1, description="Points to locate, answered in order")
+    predicate: str = Field("intersects", description="intersects (boundary points count) or contains")
@@ -1,120 +1,251 @@
-from typing import Dict, Any, List
+from typing import Dict, Any, Iterable, List, Optional, Tuple
 import logging
-from app.db.session import SessionLocal
-from app.crud import spatial
+import time
+import numpy as np
+from sqlalchemy import text
+from app.core.config import settings
+from app.db.session import ReadSessionLocal, SessionLocal
+from app.crud import spatial, statistics
+from app.services.cache import read_through
+from app.services.cells import zoom_for_tile_size
+from app.services.hotspots import HotspotDetector
+from app.services.patterns import SpatialPatternAccumulator, analyze_coordinates, analyze_coordinate_stream
 
 logger = logging.getLogger(__name__)
 
+# dataset_id that selects the whole spatial_data table
+ALL_DATASETS = "all"
+
+
+def _dataset_filter(dataset_id: str) -> Optional[str]:
+    return None if dataset_id == ALL_DATASETS else dataset_id
+
+
 class GeospatialAnalyzer:
     def __init__(self):
         self.logger = logger
     
-    def process_dataset(self, dataset_id: str) -> Dict[str, Any]:
-        """Process a large geospatial dataset."""
-        self.logger.info(f"Processing dataset: {dataset_id}")
-        
-        # Simulate complex processing
-        result = {
+    def plan_dataset_chunks(self, dataset_id: str) -> List[Tuple[int, int]]:
+        """Inclusive id ranges of about ``dataset_chunk_rows`` rows covering a dataset."""
+        db = ReadSessionLocal()
+        try:
+            return spatial.get_id_chunk_bounds(db, settings.dataset_chunk_rows, _dataset_filter(dataset_id))
+        finally:
+            db.close()
+    
+    def process_dataset_chunk(self, dataset_id: str, first_id: int, last_id: int) -> Dict[str, Any]:
+        """Partial pattern and density state of one id range, merged by reduce_dataset_chunks.
+
+        Raises on failure so the chunk can be retried on its own.
+        """
+        db = ReadSessionLocal()
+        try:
+            lats, lons = spatial.get_coordinates_in_id_range(db, first_id, last_id, _dataset_filter(dataset_id))
+        finally:
+            db.close()
+        patterns = SpatialPatternAccumulator().update(np.column_stack((lats, lons)))
+        density = HotspotDetector(radius_km=settings.dataset_cluster_radius_km, min_points=settings.hotspot_min_points)
+        density.add(lats, lons)
+        return {
+            "first_id": first_id,
+            "last_id": last_id,
+            "points": len(lats),
+            "patterns": patterns.to_dict(),
+            "density": density.to_dict(),
+        }
+    
+    def reduce_dataset_chunks(self, dataset_id: str, partials: List[Dict[str, Any]], elapsed: float) -> Dict[str, Any]:
+        """Merge chunk partials into the dataset result.
+
+        Clusters are connected dense grid cells (see HotspotDetector) and
+        outliers are the points left in sparse cells.
+        """
+        patterns = SpatialPatternAccumulator()
+        density = HotspotDetector(radius_km=settings.dataset_cluster_radius_km, min_points=settings.hotspot_min_points)
+        for partial in partials:
+            patterns.merge(SpatialPatternAccumulator.from_dict(partial["patterns"]))
+            density.merge(HotspotDetector.from_dict(partial["density"]))
+        clusters = density.result(max_hotspots=settings.hotspot_max_results)
+        return {
             "dataset_id": dataset_id,
             "status": "completed",
-            "processed_points": 1000,
+            "processed_points": patterns.count,
+            "chunks": len(partials),
             "analysis_type": "spatial_clustering",
-            "clusters_found": 5,
-            "outliers_detected": 23,
-            "processing_time": "2.5s"
+            "clusters_found": clusters["total_hotspots"],
+            "outliers_detected": clusters["noise_points"],
+            "clusters": clusters["hotspots"],
+            "patterns": patterns.result() if patterns.count else None,
+            "processing_time": f"{elapsed:.1f}s"
         }
-        
-        return result
     
-    def analyze_spatial_patterns(self, coordinates: List[tuple]) -> Dict[str, Any]:
-        """Analyze spatial patterns in coordinate data."""
-        if not coordinates:
+    def process_dataset(self, dataset_id: str) -> Dict[str, Any]:
+        """Process a geospatial dataset chunk by chunk in this process.
+
+        ``dataset_id`` matches ``properties.dataset_id``; ``"all"`` selects the
+        whole table. The Celery task runs the same chunks in parallel.
+        """
+        self.logger.info(f"Processing dataset: {dataset_id}")
+        try:
+            started = time.perf_counter()
+            partials = [
+                self.process_dataset_chunk(dataset_id, first_id, last_id)
+                for first_id, last_id in self.plan_dataset_chunks(dataset_id)
+            ]
+            return self.reduce_dataset_chunks(dataset_id, partials, time.perf_counter() - started)
+        except Exception as e:
+            self.logger.error(f"Error processing dataset {dataset_id}: {e}")
+            return {"error": str(e)}
+    
+    def analyze_spatial_patterns(self, coordinates: Any) -> Dict[str, Any]:
+        """Analyze spatial patterns in coordinate data.
+
+        Accepts (lat, lon) tuples, an (n, 2) array or a structured array with
+        ``lat``/``lon`` fields.
+        """
+        if coordinates is None or len(coordinates) == 0:
             return {"error": "No coordinates provided"}
-        
-        # Calculate basic statistics
-        point_count = len(coordinates)
-        
-        # Calculate bounding box
-        if coordinates:
-            lats = [coord[0] for coord in coordinates]
-            lons = [coord[1] for coord in coordinates]
-            bbox = {
-                "min_lat": min(lats),
-                "max_lat": max(lats),
-                "min_lon": min(lons),
-                "max_lon": max(lons)
-            }
-        else:
-            bbox = None
-        
-        return {
-            "point_count": point_count,
-            "analysis_type": "pattern_detection",
-            "status": "completed",
-            "bounding_box": bbox,
-            "density": point_count / 100 if point_count > 0 else 0
-        }
+        return analyze_coordinates(coordinates)
+    
+    def analyze_spatial_patterns_stream(self, chunks: Iterable[Any]) -> Dict[str, Any]:
+        """Analyze spatial patterns over an iterable of coordinate chunks with constant memory."""
+        return analyze_coordinate_stream(chunks)
     
+    @read_through("analysis:spatial_patterns", dataset="spatial_data")
+    def analyze_stored_patterns(self) -> Dict[str, Any]:
+        """Analyze spatial patterns over the whole spatial_data table."""
+        db = SessionLocal()
+        try:
+            chunks = (
+                np.column_stack((lats, lons))
+                for _, lats, lons in spatial.iter_spatial_coordinates(db, chunk_size=settings.pattern_chunk_size)
+            )
+            return self.analyze_spatial_patterns_stream(chunks)
+        except Exception as e:
+            self.logger.error(f"Error analyzing stored spatial patterns: {e}")
+            return {"error": str(e)}
+        finally:
+            db.close()
+    
+    @read_through("analysis:spatial_statistics", ttl=settings.statistics_cache_ttl, dataset="spatial_data")
     def get_spatial_statistics(self) -> Dict[str, Any]:
-        """Get overall spatial data statistics."""
+        """Get overall spatial data statistics from the server-side summary tables."""
+        db = SessionLocal()
         try:
-            db = SessionLocal()
-            all_data = spatial.get_all_spatial_data(db, limit=1000)
-            
-            if not all_data:
+            result = statistics.get_spatial_statistics(db)
+            if not result["total_points"]:
                 return {"total_points": 0, "status": "no_data"}
+            result["status"] = "completed"
+            return result
             
-            # Calculate statistics
-            total_points = len(all_data)
-            unique_properties = set()
-            
-            for data in all_data:
-                if data.properties:
-                    unique_properties.update(data.properties.keys())
-            
-            return {
-                "total_points": total_points,
-                "unique_property_keys": len(unique_properties),
-                "property_keys": list(unique_properties),
-                "status": "completed"
-            }
-            
+        except statistics.StatisticsNotReady:
+            raise
         except Exception as e:
             self.logger.error(f"Error getting spatial statistics: {e}")
             return {"error": str(e)}
         finally:
             db.close()
     
-    def detect_hotspots(self, radius_km: float = 1.0) -> Dict[str, Any]:
-        """Detect spatial hotspots using clustering."""
+    def refresh_spatial_statistics(self) -> Dict[str, Any]:
+        """Build the summary tables on first use, afterwards recount per-key distinct values."""
+        # Cleared before the scan, so writes from here on queue another refresh
+        statistics.clear_statistics_schedule()
+        db = SessionLocal()
         try:
-            db = SessionLocal()
-            all_data = spatial.get_all_spatial_data(db, limit=500)
-            
-            if not all_data:
+            rebuilt = statistics.refresh_spatial_statistics(db)
+            return {"status": "completed", "rebuilt": rebuilt}
+        except Exception as e:
+            self.logger.error(f"Error refreshing spatial statistics: {e}")
+            return {"error": str(e)}
+        finally:
+            db.close()
+    
+    def backfill_cell_keys(self) -> Dict[str, Any]:
+        """Fill cell_key for rows that predate it, then rebuild the summary and tile rollups.
+
+        Every API process calls this at startup; on PostgreSQL a session-level
+        advisory lock, held on its own connection across the per-chunk
+        commits, lets only one of them run it.
+        """
+        db = SessionLocal()
+        lock_connection = None
+        try:
+            bind = db.get_bind()
+            if bind.dialect.name == "postgresql":
+                lock_connection = bind.connect()
+                acquired = lock_connection.execute(
+                    text("SELECT pg_try_advisory_lock(:lock_id)"), {"lock_id": statistics.BACKFILL_LOCK_ID}
+                ).scalar()
+                # The lock is session-level; end the transaction so the connection is not left idle in one
+                lock_connection.commit()
+                if not acquired:
+                    return {"status": "skipped", "reason": "backfill running in another process"}
+            updated = spatial.backfill_cell_keys(db, chunk_size=settings.cell_backfill_chunk_size)
+            if updated:
+                self.logger.info(f"Backfilled cell keys for {updated} rows")
+                statistics.rebuild_spatial_statistics(db)
+            return {"status": "completed", "updated": updated}
+        except Exception as e:
+            self.logger.error(f"Error backfilling cell keys: {e}")
+            return {"error": str(e)}
+        finally:
+            db.close()
+            if lock_connection is not None:
+                try:
+                    lock_connection.execute(text("SELECT pg_advisory_unlock(:lock_id)"), {"lock_id": statistics.BACKFILL_LOCK_ID})
+                finally:
+                    lock_connection.close()
+    
+    @read_through("analysis:hotspots", dataset="spatial_data")
+    def detect_hotspots(
+        self,
+        radius_km: float = 1.0,
+        min_points: Optional[int] = None,
+        max_hotspots: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        """Detect spatial hotspots with grid-bucketed density clustering over the full table.
+
+        When the tile rollups are fine enough for ``radius_km`` the detector is
+        fed per-tile aggregates instead of raw points.
+        """
+        db = SessionLocal()
+        try:
+            started = time.perf_counter()
+            detector = HotspotDetector(
+                radius_km=radius_km,
+                min_points=min_points or settings.hotspot_min_points,
+            )
+            source = "points"
+            rollup_zoom = max(
+                zoom_for_tile_size(radius_km * settings.hotspot_rollup_resolution),
+                settings.tile_rollup_min_zoom,
+            )
+            if rollup_zoom <= settings.tile_rollup_max_zoom:
+                try:
+                    for _, counts, sum_lats, sum_lons in statistics.iter_tile_rollups(
+                        db, rollup_zoom, chunk_size=settings.hotspot_chunk_size
+                    ):
+                        detector.add_aggregates(counts, sum_lats, sum_lons)
+                except statistics.StatisticsNotReady:
+                    # Rollups are being built; read the raw points this time
+                    pass
+                if detector.points_scanned:
+                    source = f"rollup_z{rollup_zoom}"
+            if detector.points_scanned == 0:
+                for _, lats, lons in spatial.iter_spatial_coordinates(db, chunk_size=settings.hotspot_chunk_size):
+                    detector.add(lats, lons)
+
+            if detector.points_scanned == 0:
                 return {"hotspots": [], "status": "no_data"}
-            
-            # Simple hotspot detection (in real app, use proper clustering)
-            hotspots = []
-            for i, data in enumerate(all_data[:5]):  # Limit for demo
-                if data.coordinates:
-                    hotspots.append({
-                        "id": f"hotspot_{i}",
-                        "center": data.coordinates,
-                        "radius_km": radius_km,
-                        "point_count": 1,
-                        "density": "high"
-                    })
-            
-            return {
-                "hotspots": hotspots,
-                "total_hotspots": len(hotspots),
-                "radius_km": radius_km,
-                "status": "completed"
-            }
+
+            result = detector.result(max_hotspots=max_hotspots or settings.hotspot_max_results)
+            result["source"] = source
+            result["processing_time"] = f"{time.perf_counter() - started:.2f}s"
+            result["status"] = "completed"
+            return result
             
         except Exception as e:
             self.logger.error(f"Error detecting hotspots: {e}")
             return {"error": str(e)}
         finally:
-            db.close() 
\ No newline at end of file
+            db.close()
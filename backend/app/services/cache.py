@@ -1,53 +1,546 @@
 import redis
+import redis.asyncio
+import asyncio
+import functools
+import hashlib
+import inspect
 import json
-from typing import Any, Optional, Dict
+import math
+import threading
+import time
+import uuid
+import weakref
+import numpy as np
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Optional, Dict, Iterable, List, Tuple
+from app.core.concurrency import run_sync
 from app.core.config import settings
+from app.core.metrics import cache_duration, cache_operations
+from app.services.cells import lonlat_to_tile
 import logging
 
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - optional dependency
+    msgpack = None
+
 logger = logging.getLogger(__name__)
 
+_MISSING = object()
+
+
+class JsonSerializer:
+    name = "json"
+
+    def dumps(self, value: Any) -> bytes:
+        return json.dumps(value).encode()
+
+    def loads(self, data: bytes) -> Any:
+        return json.loads(data)
+
+
+class OrjsonSerializer:
+    """orjson produces plain JSON, so values stay readable by JsonSerializer."""
+    name = "orjson"
+
+    def dumps(self, value: Any) -> bytes:
+        return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+
+    def loads(self, data: bytes) -> Any:
+        return orjson.loads(data)
+
+
+class MsgpackSerializer:
+    name = "msgpack"
+
+    def dumps(self, value: Any) -> bytes:
+        return msgpack.packb(value, use_bin_type=True)
+
+    def loads(self, data: bytes) -> Any:
+        return msgpack.unpackb(data, raw=False)
+
+
+def get_serializer(name: Optional[str] = None):
+    """Return the configured serializer, falling back to stdlib json when unavailable."""
+    name = name or settings.cache_serializer
+    if name == "msgpack" and msgpack is not None:
+        return MsgpackSerializer()
+    if name in ("orjson", "msgpack") and orjson is not None:
+        if name == "msgpack":
+            logger.warning("msgpack is not installed, using orjson for cache values")
+        return OrjsonSerializer()
+    return JsonSerializer()
+
+
+class TierStats:
+    """Hit/miss/latency counters for one cache tier."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.hits = 0
+        self.misses = 0
+        self.sets = 0
+        self.errors = 0
+        self.operations = 0
+        self.latency_seconds = 0.0
+
+    def record(self, elapsed: float, hits: int = 0, misses: int = 0, sets: int = 0, errors: int = 0):
+        with self._lock:
+            self.operations += 1
+            self.latency_seconds += elapsed
+            self.hits += hits
+            self.misses += misses
+            self.sets += sets
+            self.errors += errors
+        if settings.metrics_enabled:
+            cache_duration.observe(elapsed, self.name)
+            for result, count in (("hit", hits), ("miss", misses), ("set", sets), ("error", errors)):
+                if count:
+                    cache_operations.inc(self.name, result, amount=count)
+
+    def to_dict(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "sets": self.sets,
+            "errors": self.errors,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "operations": self.operations,
+            "avg_latency_us": round(self.latency_seconds / self.operations * 1e6, 2) if self.operations else 0.0,
+        }
+
+
+class LocalCache:
+    """Thread-safe, size-bounded LRU cache with per-entry expiry."""
+
+    def __init__(self, max_entries: int = 10000, default_ttl: float = 5.0):
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self._entries: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Any:
+        """Return the stored value or the _MISSING sentinel."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return _MISSING
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return _MISSING
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None):
+        ttl = self.default_ttl if ttl is None else min(ttl, self.default_ttl)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str) -> bool:
+        with self._lock:
+            return self._entries.pop(key, None) is not None
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+# Process-wide shared state: one Redis connection pool, one local tier, one set of counters
+_redis_pool: Optional[redis.ConnectionPool] = None
+_async_redis_pool: Optional[redis.asyncio.ConnectionPool] = None
+_pool_lock = threading.Lock()
+local_cache = LocalCache(
+    max_entries=settings.cache_local_max_entries,
+    default_ttl=settings.cache_local_ttl,
+)
+cache_stats = {
+    "local": TierStats("local"),
+    "redis": TierStats("redis"),
+}
+
+
+def get_redis_pool() -> redis.ConnectionPool:
+    """Return the process-wide Redis connection pool, creating it on first use."""
+    global _redis_pool
+    if _redis_pool is None:
+        with _pool_lock:
+            if _redis_pool is None:
+                _redis_pool = redis.ConnectionPool.from_url(
+                    settings.redis_url,
+                    max_connections=settings.redis_max_connections,
+                )
+    return _redis_pool
+
+
+def get_redis_client() -> redis.Redis:
+    """Redis client backed by the shared connection pool."""
+    return redis.Redis(connection_pool=get_redis_pool())
+
+
+def get_async_redis_client() -> redis.asyncio.Redis:
+    """Asyncio Redis client backed by a shared pool; use it from a single event loop."""
+    global _async_redis_pool
+    if _async_redis_pool is None:
+        with _pool_lock:
+            if _async_redis_pool is None:
+                _async_redis_pool = redis.asyncio.ConnectionPool.from_url(
+                    settings.redis_url,
+                    max_connections=settings.redis_max_connections,
+                )
+    return redis.asyncio.Redis(connection_pool=_async_redis_pool)
+
+
+async def close_async_redis_pool():
+    global _async_redis_pool
+    with _pool_lock:
+        pool, _async_redis_pool = _async_redis_pool, None
+    if pool is not None:
+        await pool.disconnect()
+
+
+def make_cache_key(namespace: str, params: Any = None, version: Optional[int] = None) -> str:
+    """Stable cache key: SHA-256 of the canonical JSON form of ``params``.
+
+    Identical across processes and restarts, unlike ``hash()``. When a dataset
+    version is given it is embedded so bumping the version retires old keys.
+    """
+    canonical = json.dumps(params, sort_keys=True, separators=(",", ":"), default=str)
+    digest = hashlib.sha256(canonical.encode()).hexdigest()
+    if version is None:
+        return f"{namespace}:{digest}"
+    return f"{namespace}:v{version}:{digest}"
+
+
+SPATIAL_DATASET_TAG = "spatial_data"
+SPATIAL_RECORDS_TAG = "spatial_records"
+MAP_TILES_TAG = "map_tiles"
+
+
+def point_tile_tag(latitude: float, longitude: float) -> str:
+    """Tag of the coarse tile containing a point; bbox cache entries depend on these."""
+    size = settings.bbox_cache_tile_size
+    return f"bbox_tile:{math.floor(latitude / size)}:{math.floor(longitude / size)}"
+
+
+def bbox_tile_tags(minx: float, miny: float, maxx: float, maxy: float) -> Optional[List[str]]:
+    """Tags of every coarse tile a bbox touches, or None when there are too many to track."""
+    size = settings.bbox_cache_tile_size
+    rows = range(math.floor(miny / size), math.floor(maxy / size) + 1)
+    if minx > maxx:
+        cols = list(range(math.floor(minx / size), math.floor(180.0 / size) + 1))
+        cols += list(range(math.floor(-180.0 / size), math.floor(maxx / size) + 1))
+    else:
+        cols = list(range(math.floor(minx / size), math.floor(maxx / size) + 1))
+    if len(rows) * len(cols) > settings.bbox_cache_max_tiles:
+        return None
+    return [f"bbox_tile:{row}:{col}" for row in rows for col in cols]
+
+
+def map_tile_tag(z: int, x: int, y: int) -> str:
+    """Tag of one z/x/y vector tile."""
+    return f"map_tile:{z}/{x}/{y}"
+
+
+def map_zoom_tag(z: int) -> str:
+    """Tag of every vector tile at one zoom level."""
+    return f"{MAP_TILES_TAG}:{z}"
+
+
+def written_map_tile_tags(lats: Any, lons: Any) -> List[str]:
+    """Tags of the vector tiles holding the written points, distinct per zoom.
+
+    Tiles are tagged one by one from zoom 0 down while the total stays within
+    ``tile_invalidate_max_tags``; from the first zoom that would exceed it,
+    each remaining zoom is retired with its zoom tag instead, since deeper
+    zooms only hold more distinct tiles.
+    """
+    lats = np.asarray(lats, dtype=np.float64)
+    lons = np.asarray(lons, dtype=np.float64)
+    if not len(lats):
+        return []
+    tags: List[str] = []
+    for z in range(settings.tile_max_zoom + 1):
+        xs, ys = lonlat_to_tile(lats, lons, z)
+        tiles = np.unique((xs << np.uint64(32)) | ys)
+        if len(tags) + len(tiles) > settings.tile_invalidate_max_tags:
+            tags.extend(map_zoom_tag(zoom) for zoom in range(z, settings.tile_max_zoom + 1))
+            break
+        tags.extend(
+            map_tile_tag(z, x, y)
+            for x, y in zip((tiles >> np.uint64(32)).tolist(), (tiles & np.uint64(0xFFFFFFFF)).tolist())
+        )
+    return tags
+
+
+def _should_cache(result: Any) -> bool:
+    # Services report failures as {"error": ...}; never cache those
+    return not (isinstance(result, dict) and "error" in result)
+
+
+class _ComputeLock:
+    """Weak-referenceable wrapper, since plain locks cannot live in a WeakValueDictionary."""
+    __slots__ = ("lock", "__weakref__")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+
+    def __enter__(self):
+        self.lock.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.lock.release()
+
+
+# Per-key locks so concurrent misses in one process compute once
+_compute_locks: "weakref.WeakValueDictionary[str, _ComputeLock]" = weakref.WeakValueDictionary()
+_compute_locks_guard = threading.Lock()
+
+# Event-loop refresh tasks, referenced until done so they are not collected mid-flight
+_refresh_tasks: set = set()
+
+# Deletes a lock only while it still holds the caller's token, atomically
+_RELEASE_LOCK_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+_RENEW_LOCK_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("pexpire", KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+# Dataset versions cached briefly in-process to avoid a round trip per read
+_dataset_versions: Dict[str, Tuple[float, int]] = {}
+
+
+def _compute_lock(key: str) -> _ComputeLock:
+    with _compute_locks_guard:
+        lock = _compute_locks.get(key)
+        if lock is None:
+            lock = _ComputeLock()
+            _compute_locks[key] = lock
+        return lock
+
+
+def get_cache_stats() -> Dict[str, Any]:
+    """Counters for every cache tier."""
+    return {
+        "local": {**cache_stats["local"].to_dict(), "entries": len(local_cache)},
+        "redis": cache_stats["redis"].to_dict(),
+        "serializer": get_serializer().name,
+    }
+
+
 class CacheService:
+    """Two-tier cache: a process-local LRU in front of Redis.
+
+    Values are serialized once and the bytes are kept in both tiers, so callers
+    never share mutable objects through the local tier. Local entries live for
+    at most ``cache_local_ttl`` seconds, which bounds how stale a read can be
+    after another process changes Redis.
+    """
+
     def __init__(self):
-        self.redis_client = redis.from_url(settings.redis_url)
+        self.redis_client = get_redis_client()
         self.default_ttl = 3600  # 1 hour default
-    
+        self.serializer = get_serializer()
+        self.local = local_cache if settings.cache_local_enabled else None
+
+    def _local_get(self, key: str) -> Any:
+        if self.local is None:
+            return _MISSING
+        started = time.perf_counter()
+        value = self.local.get(key)
+        cache_stats["local"].record(
+            time.perf_counter() - started,
+            hits=int(value is not _MISSING),
+            misses=int(value is _MISSING),
+        )
+        return value
+
+    def _local_set(self, key: str, value: bytes, ttl: int):
+        if self.local is not None:
+            self.local.set(key, value, ttl)
+
     def set(self, key: str, value: Any, ttl: int = None) -> bool:
         """Set a value in cache with optional TTL."""
+        started = time.perf_counter()
         try:
-            serialized_value = json.dumps(value)
+            serialized_value = self.serializer.dumps(value)
             ttl = ttl or self.default_ttl
-            return self.redis_client.setex(key, ttl, serialized_value)
+            result = self.redis_client.setex(key, ttl, serialized_value)
+            cache_stats["redis"].record(time.perf_counter() - started, sets=1)
+            self._local_set(key, serialized_value, ttl)
+            return result
         except Exception as e:
+            cache_stats["redis"].record(time.perf_counter() - started, errors=1)
             logger.error(f"Error setting cache key {key}: {e}")
             return False
-    
+
     def get(self, key: str) -> Optional[Any]:
         """Get a value from cache."""
+        local_value = self._local_get(key)
+        if local_value is not _MISSING:
+            return self.serializer.loads(local_value)
+
+        started = time.perf_counter()
         try:
             value = self.redis_client.get(key)
+            cache_stats["redis"].record(
+                time.perf_counter() - started,
+                hits=int(value is not None),
+                misses=int(value is None),
+            )
             if value:
-                return json.loads(value)
+                self._local_set(key, value, settings.cache_local_ttl)
+                return self.serializer.loads(value)
             return None
         except Exception as e:
+            cache_stats["redis"].record(time.perf_counter() - started, errors=1)
             logger.error(f"Error getting cache key {key}: {e}")
             return None
-    
+
+    def get_bytes(self, key: str, local: bool = True) -> Optional[bytes]:
+        """Get a raw bytes value, bypassing the serializer.
+
+        Pass ``local=False`` for large blobs that should not occupy the local tier.
+        """
+        if local:
+            local_value = self._local_get(key)
+            if local_value is not _MISSING:
+                return local_value
+
+        started = time.perf_counter()
+        try:
+            value = self.redis_client.get(key)
+            cache_stats["redis"].record(
+                time.perf_counter() - started,
+                hits=int(value is not None),
+                misses=int(value is None),
+            )
+            if value is not None and local:
+                self._local_set(key, value, settings.cache_local_ttl)
+            return value
+        except Exception as e:
+            cache_stats["redis"].record(time.perf_counter() - started, errors=1)
+            logger.error(f"Error getting cache key {key}: {e}")
+            return None
+
+    def set_bytes(self, key: str, value: bytes, ttl: int = None, local: bool = True) -> bool:
+        """Set a raw bytes value, bypassing the serializer."""
+        started = time.perf_counter()
+        try:
+            ttl = ttl or self.default_ttl
+            result = self.redis_client.setex(key, ttl, value)
+            cache_stats["redis"].record(time.perf_counter() - started, sets=1)
+            if local:
+                self._local_set(key, value, ttl)
+            return result
+        except Exception as e:
+            cache_stats["redis"].record(time.perf_counter() - started, errors=1)
+            logger.error(f"Error setting cache key {key}: {e}")
+            return False
+
+    def mget(self, keys: Iterable[str]) -> Dict[str, Any]:
+        """Get many keys, checking the local tier first and fetching the rest in one round trip.
+
+        Returns only the keys that were found.
+        """
+        found: Dict[str, Any] = {}
+        remote_keys: List[str] = []
+        for key in keys:
+            local_value = self._local_get(key)
+            if local_value is _MISSING:
+                remote_keys.append(key)
+            else:
+                found[key] = self.serializer.loads(local_value)
+
+        if not remote_keys:
+            return found
+
+        started = time.perf_counter()
+        try:
+            values = self.redis_client.mget(remote_keys)
+            hits = 0
+            for key, value in zip(remote_keys, values):
+                if value is not None:
+                    hits += 1
+                    self._local_set(key, value, settings.cache_local_ttl)
+                    found[key] = self.serializer.loads(value)
+            cache_stats["redis"].record(
+                time.perf_counter() - started,
+                hits=hits,
+                misses=len(remote_keys) - hits,
+            )
+        except Exception as e:
+            cache_stats["redis"].record(time.perf_counter() - started, errors=1)
+            logger.error(f"Error getting {len(remote_keys)} cache keys: {e}")
+        return found
+
+    def mset(self, mapping: Dict[str, Any], ttl: int = None) -> bool:
+        """Set many keys with one pipelined round trip."""
+        if not mapping:
+            return True
+        ttl = ttl or self.default_ttl
+        started = time.perf_counter()
+        try:
+            serialized = {key: self.serializer.dumps(value) for key, value in mapping.items()}
+            pipeline = self.redis_client.pipeline(transaction=False)
+            for key, value in serialized.items():
+                pipeline.setex(key, ttl, value)
+            pipeline.execute()
+            cache_stats["redis"].record(time.perf_counter() - started, sets=len(serialized))
+            for key, value in serialized.items():
+                self._local_set(key, value, ttl)
+            return True
+        except Exception as e:
+            cache_stats["redis"].record(time.perf_counter() - started, errors=1)
+            logger.error(f"Error setting {len(mapping)} cache keys: {e}")
+            return False
+
     def delete(self, key: str) -> bool:
         """Delete a key from cache."""
+        if self.local is not None:
+            self.local.delete(key)
         try:
             return bool(self.redis_client.delete(key))
         except Exception as e:
             logger.error(f"Error deleting cache key {key}: {e}")
             return False
-    
+
     def exists(self, key: str) -> bool:
         """Check if a key exists in cache."""
+        if self._local_get(key) is not _MISSING:
+            return True
         try:
             return bool(self.redis_client.exists(key))
         except Exception as e:
             logger.error(f"Error checking cache key {key}: {e}")
             return False
-    
+
     def get_ttl(self, key: str) -> int:
         """Get remaining TTL for a key."""
         try:
@@ -55,40 +548,495 @@ class CacheService:
         except Exception as e:
             logger.error(f"Error getting TTL for key {key}: {e}")
             return -1
-    
+
+    def _spatial_key(self, spatial_id: int, version: Optional[int] = None) -> str:
+        if version is None:
+            version = self.get_dataset_version(SPATIAL_RECORDS_TAG)
+        return f"spatial_data:v{version}:{spatial_id}"
+
     def cache_spatial_data(self, spatial_id: int, data: Dict[str, Any]) -> bool:
         """Cache spatial data with a specific key pattern."""
-        key = f"spatial_data:{spatial_id}"
+        key = self._spatial_key(spatial_id)
         return self.set(key, data, ttl=1800)  # 30 minutes
-    
+
     def get_cached_spatial_data(self, spatial_id: int) -> Optional[Dict[str, Any]]:
         """Get cached spatial data."""
-        key = f"spatial_data:{spatial_id}"
+        key = self._spatial_key(spatial_id)
         return self.get(key)
-    
-    def cache_analysis_result(self, analysis_type: str, params: str, result: Dict[str, Any]) -> bool:
+
+    def get_cached_spatial_data_many(self, spatial_ids: Iterable[int]) -> Dict[int, Dict[str, Any]]:
+        """Get cached spatial data for many IDs in one round trip."""
+        version = self.get_dataset_version(SPATIAL_RECORDS_TAG)
+        keys = {self._spatial_key(spatial_id, version): spatial_id for spatial_id in spatial_ids}
+        return {keys[key]: value for key, value in self.mget(keys).items()}
+
+    def cache_spatial_data_many(self, records: Dict[int, Dict[str, Any]]) -> bool:
+        """Cache many spatial data records in one round trip."""
+        version = self.get_dataset_version(SPATIAL_RECORDS_TAG)
+        return self.mset(
+            {self._spatial_key(spatial_id, version): data for spatial_id, data in records.items()},
+            ttl=1800,
+        )
+
+    def _bbox_key(self, minx: float, miny: float, maxx: float, maxy: float, filters: Any = None) -> Optional[str]:
+        """Key for a bbox result, built from the versions of every coarse tile it touches."""
+        tags = bbox_tile_tags(minx, miny, maxx, maxy)
+        if tags is None:
+            return None
+        versions = self.get_tag_versions(tags)
+        params = {"bbox": [minx, miny, maxx, maxy], "tiles": versions}
+        if filters:
+            params["filters"] = filters
+        return make_cache_key("spatial_bbox_columns", params)
+
+    def get_cached_bbox(self, minx: float, miny: float, maxx: float, maxy: float, filters: Any = None) -> Optional[Dict[str, Any]]:
+        """Cached columns for a bounding box and property filters, if every tile it covers is unchanged."""
+        key = self._bbox_key(minx, miny, maxx, maxy, filters)
+        return self.get(key) if key else None
+
+    def cache_bbox(self, minx: float, miny: float, maxx: float, maxy: float, columns: Dict[str, Any], filters: Any = None) -> bool:
+        """Cache columns (see app.services.encoding) for a bounding box; large boxes and results are skipped."""
+        if columns["count"] > settings.bbox_cache_max_rows:
+            return False
+        key = self._bbox_key(minx, miny, maxx, maxy, filters)
+        return self.set(key, columns, ttl=settings.bbox_cache_ttl) if key else False
+
+    def cache_analysis_result(self, analysis_type: str, params: Any, result: Dict[str, Any]) -> bool:
         """Cache analysis results."""
-        key = f"analysis:{analysis_type}:{hash(params)}"
+        key = make_cache_key(f"analysis:{analysis_type}", params)
         return self.set(key, result, ttl=7200)  # 2 hours
-    
-    def get_cached_analysis(self, analysis_type: str, params: str) -> Optional[Dict[str, Any]]:
+
+    def get_cached_analysis(self, analysis_type: str, params: Any) -> Optional[Dict[str, Any]]:
         """Get cached analysis result."""
-        key = f"analysis:{analysis_type}:{hash(params)}"
+        key = make_cache_key(f"analysis:{analysis_type}", params)
         return self.get(key)
-    
-    def clear_spatial_cache(self, spatial_id: int = None) -> bool:
-        """Clear spatial data cache."""
+
+    def get_dataset_version(self, dataset: str) -> int:
+        """Current version counter of a dataset, cached in-process for ``cache_version_ttl``."""
+        cached = _dataset_versions.get(dataset)
+        now = time.monotonic()
+        if cached and cached[0] > now:
+            return cached[1]
+        try:
+            pipeline = self.redis_client.pipeline(transaction=False)
+            pipeline.get(f"dataset_version:{dataset}")
+            pipeline.exists(f"dataset_dirty:{dataset}")
+            pipeline.exists(f"dataset_bump_window:{dataset}")
+            version, dirty, window_open = pipeline.execute()
+            version = int(version or 0)
+            if dirty and not window_open:
+                # Writes were coalesced into a window that has closed: the first reader bumps for them
+                version = self._flush_coalesced_bump(dataset) or version
+        except Exception as e:
+            logger.error(f"Error reading dataset version {dataset}: {e}")
+            return cached[1] if cached else 0
+        _dataset_versions[dataset] = (now + settings.cache_version_ttl, version)
+        return version
+
+    def bump_dataset_version_coalesced(self, dataset: str, interval: float) -> bool:
+        """Bump a dataset version at most once per ``interval`` seconds.
+
+        The first write of a window bumps at once and later ones only mark the
+        dataset dirty; the first version read after the window closes bumps
+        for them. Readers see a write at most ``interval`` plus
+        ``cache_version_ttl`` late, however high the write rate.
+        """
+        try:
+            if self.redis_client.set(f"dataset_bump_window:{dataset}", 1, nx=True, px=int(interval * 1000)):
+                return self.bump_dataset_version(dataset) >= 0
+            self.redis_client.set(f"dataset_dirty:{dataset}", 1)
+            return True
+        except Exception as e:
+            logger.error(f"Error bumping dataset version {dataset}: {e}")
+            return False
+
+    def _flush_coalesced_bump(self, dataset: str) -> Optional[int]:
+        pipeline = self.redis_client.pipeline(transaction=True)
+        pipeline.get(f"dataset_dirty:{dataset}")
+        pipeline.delete(f"dataset_dirty:{dataset}")
+        dirty, _ = pipeline.execute()
+        # Only the reader that cleared the flag bumps, and it opens a new window like a write would
+        if not dirty or not self.redis_client.set(
+            f"dataset_bump_window:{dataset}", 1, nx=True, px=int(settings.spatial_dataset_bump_interval * 1000)
+        ):
+            return None
+        version = self.bump_dataset_version(dataset)
+        return version if version >= 0 else None
+
+    def bump_dataset_version(self, dataset: str) -> int:
+        """Increment a dataset version, retiring every key built with the old one."""
+        try:
+            version = int(self.redis_client.incr(f"dataset_version:{dataset}"))
+            _dataset_versions[dataset] = (time.monotonic() + settings.cache_version_ttl, version)
+            return version
+        except Exception as e:
+            logger.error(f"Error bumping dataset version {dataset}: {e}")
+            return -1
+
+    def _acquire_refresh_lock(self, key: str, timeout: float) -> Optional[str]:
+        token = uuid.uuid4().hex
+        try:
+            if self.redis_client.set(f"lock:{key}", token, nx=True, px=int(timeout * 1000)):
+                return token
+        except Exception as e:
+            logger.error(f"Error acquiring cache lock {key}: {e}")
+            # Redis unavailable: let this caller compute
+            return token
+        return None
+
+    def _release_refresh_lock(self, key: str, token: str):
+        try:
+            self.redis_client.register_script(_RELEASE_LOCK_SCRIPT)(keys=[f"lock:{key}"], args=[token])
+        except Exception as e:
+            logger.error(f"Error releasing cache lock {key}: {e}")
+
+    @contextmanager
+    def _renewing_lock(self, key: str, token: Optional[str], lease: float):
+        """Keep a single-flight lock alive while the block runs.
+
+        The lock is taken with a short ``lease`` and renewed every third of
+        it, so a holder that dies releases it within one lease instead of
+        leaving waiters stalled for the whole ``cache_lock_timeout``.
+        """
+        if token is None:
+            yield
+            return
+        stop = threading.Event()
+
+        def renew():
+            while not stop.wait(lease / 3):
+                try:
+                    self.redis_client.register_script(_RENEW_LOCK_SCRIPT)(
+                        keys=[f"lock:{key}"], args=[token, int(lease * 1000)]
+                    )
+                except Exception as e:
+                    logger.error(f"Error renewing cache lock {key}: {e}")
+                    return
+
+        thread = threading.Thread(target=renew, daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            stop.set()
+
+    def _poll_holder(self, key: str) -> Tuple[bool, Any]:
+        """(found, value) for a miss another caller is computing: its cached envelope or its uncached result."""
+        found = self.mget([key, f"uncached:{key}"])
+        if key in found:
+            return True, found[key]["value"]
+        if f"uncached:{key}" in found:
+            return True, found[f"uncached:{key}"]["value"]
+        return False, None
+
+    def _publish(self, key: str, value: Any, ttl: int, stale_ttl: int):
+        if _should_cache(value):
+            self._store_envelope(key, value, ttl, stale_ttl)
+        else:
+            # Error results are not cached, but callers waiting on this miss take them instead of timing out
+            self.set(f"uncached:{key}", {"value": value}, ttl=settings.cache_uncached_result_ttl)
+
+    def _store_envelope(self, key: str, value: Any, ttl: int, stale_ttl: int):
+        envelope = {"value": value, "fresh_until": time.time() + ttl}
+        self.set(key, envelope, ttl=ttl + stale_ttl)
+
+    def _refresh(self, key: str, compute: Callable[[], Any], ttl: int, stale_ttl: int, token: str):
+        try:
+            value = compute()
+            if _should_cache(value):
+                self._store_envelope(key, value, ttl, stale_ttl)
+        except Exception as e:
+            logger.error(f"Error refreshing cache key {key}: {e}")
+        finally:
+            self._release_refresh_lock(key, token)
+
+    def get_or_compute(
+        self,
+        key: str,
+        compute: Callable[[], Any],
+        ttl: int = None,
+        stale_ttl: int = None,
+        lock_timeout: float = None,
+    ) -> Any:
+        """Read-through lookup with single-flight misses and stale-while-revalidate.
+
+        Fresh entries are returned directly. Entries past ``ttl`` but within
+        ``stale_ttl`` are returned immediately while one caller (across all
+        processes, via a Redis lock) recomputes in a background thread. On a
+        miss, only the lock holder computes; other callers wait for its result,
+        cached or not, and take the lock over if the holder releases it or
+        dies. After ``lock_timeout`` they compute themselves.
+        """
+        ttl = ttl or settings.analysis_cache_ttl
+        stale_ttl = settings.analysis_cache_stale_ttl if stale_ttl is None else stale_ttl
+        lock_timeout = lock_timeout or settings.cache_lock_timeout
+        lease = min(settings.cache_lock_lease, lock_timeout)
+
+        envelope = self.get(key)
+        if envelope is not None:
+            if envelope["fresh_until"] >= time.time():
+                return envelope["value"]
+            token = self._acquire_refresh_lock(key, lock_timeout)
+            if token:
+                threading.Thread(
+                    target=self._refresh,
+                    args=(key, compute, ttl, stale_ttl, token),
+                    daemon=True,
+                ).start()
+            return envelope["value"]
+
+        with _compute_lock(key):
+            envelope = self.get(key)
+            if envelope is not None:
+                return envelope["value"]
+
+            token = self._acquire_refresh_lock(key, lease)
+            deadline = time.monotonic() + lock_timeout
+            while token is None and time.monotonic() < deadline:
+                # Another process is computing; wait for it to publish, or take over its lock
+                time.sleep(0.05)
+                found, value = self._poll_holder(key)
+                if found:
+                    return value
+                token = self._acquire_refresh_lock(key, lease)
+
+            try:
+                with self._renewing_lock(key, token, lease):
+                    value = compute()
+                self._publish(key, value, ttl, stale_ttl)
+                return value
+            finally:
+                if token:
+                    self._release_refresh_lock(key, token)
+
+    async def _refresh_async(self, key: str, compute: Callable[[], Awaitable[Any]], ttl: int, stale_ttl: int, token: str):
+        try:
+            value = await compute()
+            if _should_cache(value):
+                await run_sync(self._store_envelope, key, value, ttl, stale_ttl)
+        except Exception as e:
+            logger.error(f"Error refreshing cache key {key}: {e}")
+        finally:
+            await run_sync(self._release_refresh_lock, key, token)
+
+    async def get_or_compute_async(
+        self,
+        key: str,
+        compute: Callable[[], Awaitable[Any]],
+        ttl: int = None,
+        stale_ttl: int = None,
+        lock_timeout: float = None,
+    ) -> Any:
+        """get_or_compute for coroutine producers.
+
+        Redis calls run in the bounded thread pool and stale entries are
+        refreshed in an event-loop task; single-flight relies on the Redis lock.
+        """
+        ttl = ttl or settings.analysis_cache_ttl
+        stale_ttl = settings.analysis_cache_stale_ttl if stale_ttl is None else stale_ttl
+        lock_timeout = lock_timeout or settings.cache_lock_timeout
+        lease = min(settings.cache_lock_lease, lock_timeout)
+
+        envelope = await run_sync(self.get, key)
+        if envelope is not None:
+            if envelope["fresh_until"] >= time.time():
+                return envelope["value"]
+            token = await run_sync(self._acquire_refresh_lock, key, lock_timeout)
+            if token:
+                task = asyncio.create_task(self._refresh_async(key, compute, ttl, stale_ttl, token))
+                _refresh_tasks.add(task)
+                task.add_done_callback(_refresh_tasks.discard)
+            return envelope["value"]
+
+        token = await run_sync(self._acquire_refresh_lock, key, lease)
+        deadline = time.monotonic() + lock_timeout
+        while token is None and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+            found, value = await run_sync(self._poll_holder, key)
+            if found:
+                return value
+            token = await run_sync(self._acquire_refresh_lock, key, lease)
+
+        try:
+            with self._renewing_lock(key, token, lease):
+                value = await compute()
+            await run_sync(self._publish, key, value, ttl, stale_ttl)
+            return value
+        finally:
+            if token:
+                await run_sync(self._release_refresh_lock, key, token)
+
+    def get_tag_versions(self, tags: List[str]) -> List[int]:
+        """Versions for many tags, using the in-process copies where still trusted."""
+        now = time.monotonic()
+        versions: Dict[str, int] = {}
+        missing = []
+        for tag in tags:
+            cached = _dataset_versions.get(tag)
+            if cached and cached[0] > now:
+                versions[tag] = cached[1]
+            else:
+                missing.append(tag)
+
+        if missing:
+            try:
+                values = self.redis_client.mget([f"dataset_version:{tag}" for tag in missing])
+            except Exception as e:
+                logger.error(f"Error reading {len(missing)} tag versions: {e}")
+                values = [None] * len(missing)
+            for tag, value in zip(missing, values):
+                versions[tag] = int(value or 0)
+                _dataset_versions[tag] = (now + settings.cache_version_ttl, versions[tag])
+        return [versions[tag] for tag in tags]
+
+    def invalidate_tags(self, tags: Iterable[str]) -> bool:
+        """Bump the version of every tag in one pipelined round trip (O(1) per tag)."""
+        tags = list(dict.fromkeys(tags))
+        if not tags:
+            return True
+        try:
+            pipeline = self.redis_client.pipeline(transaction=False)
+            for tag in tags:
+                pipeline.incr(f"dataset_version:{tag}")
+            versions = pipeline.execute()
+            expires_at = time.monotonic() + settings.cache_version_ttl
+            for tag, version in zip(tags, versions):
+                # Only copies this process already holds; a bulk write bumps thousands of tile tags
+                if tag in _dataset_versions:
+                    _dataset_versions[tag] = (expires_at, int(version))
+            return True
+        except Exception as e:
+            logger.error(f"Error invalidating {len(tags)} cache tags: {e}")
+            return False
+
+    def unlink_keys(self, keys: Iterable[str]) -> int:
+        """Remove keys from both tiers; Redis frees the memory asynchronously (UNLINK)."""
+        keys = list(keys)
+        if not keys:
+            return 0
+        if self.local is not None:
+            for key in keys:
+                self.local.delete(key)
+        try:
+            return int(self.redis_client.unlink(*keys))
+        except Exception as e:
+            logger.error(f"Error unlinking {len(keys)} cache keys: {e}")
+            return 0
+
+    def sweep_keys(self, pattern: str, batch_size: int = None) -> int:
+        """Delete keys matching a pattern with incremental SCAN + UNLINK batches.
+
+        Never blocks Redis the way KEYS does; meant for background cleanup of
+        keys already retired by a version bump.
+        """
+        batch_size = batch_size or settings.cache_sweep_batch_size
+        removed = 0
+        batch: List[bytes] = []
+        try:
+            for key in self.redis_client.scan_iter(match=pattern, count=batch_size):
+                batch.append(key)
+                if len(batch) >= batch_size:
+                    removed += int(self.redis_client.unlink(*batch))
+                    batch = []
+            if batch:
+                removed += int(self.redis_client.unlink(*batch))
+        except Exception as e:
+            logger.error(f"Error sweeping cache keys {pattern}: {e}")
+        return removed
+
+    def invalidate_spatial_write(self, spatial_ids: Iterable[int] = (), points: Iterable[Tuple[float, float]] = ()) -> bool:
+        """Invalidate exactly what a spatial_data write can affect.
+
+        Drops the cached records for the written IDs, bumps the coarse bbox tile
+        tags containing the written (lat, lon) points, and bumps the spatial_data
+        dataset version used by whole-table analysis entries, at most once per
+        ``spatial_dataset_bump_interval``. Vector tiles are retired per z/x/y
+        tile, per zoom where a write touches too many tiles, and all at once
+        only for very large writes.
+        """
+        version = self.get_dataset_version(SPATIAL_RECORDS_TAG)
+        self.unlink_keys(self._spatial_key(spatial_id, version) for spatial_id in spatial_ids)
+        points = list(points)
+        tags = {point_tile_tag(latitude, longitude) for latitude, longitude in points}
+        if len(points) > settings.tile_invalidate_max_points:
+            tags.add(MAP_TILES_TAG)
+        elif points:
+            lats, lons = zip(*points)
+            tags.update(written_map_tile_tags(lats, lons))
+        # Every write touches the whole table, so a steady write stream would otherwise retire these on each row
+        coalesced = self.bump_dataset_version_coalesced(SPATIAL_DATASET_TAG, settings.spatial_dataset_bump_interval)
+        return self.invalidate_tags(tags) and coalesced
+
+    def clear_spatial_cache(self, spatial_id: int = None, sweep: bool = False) -> bool:
+        """Clear spatial data cache.
+
+        Without an ID, every cached record is retired in O(1) by bumping the
+        record version; ``sweep`` additionally removes the retired keys with a
+        non-blocking SCAN instead of waiting for their TTL.
+        """
         try:
             if spatial_id:
-                key = f"spatial_data:{spatial_id}"
-                return self.delete(key)
+                return bool(self.unlink_keys([self._spatial_key(spatial_id)]))
             else:
-                # Clear all spatial data cache
-                pattern = "spatial_data:*"
-                keys = self.redis_client.keys(pattern)
-                if keys:
-                    return bool(self.redis_client.delete(*keys))
-                return True
+                old_version = self.get_dataset_version(SPATIAL_RECORDS_TAG)
+                invalidated = self.invalidate_tags([SPATIAL_RECORDS_TAG])
+                if sweep:
+                    self.sweep_keys(f"spatial_data:v{old_version}:*")
+                return invalidated
         except Exception as e:
             logger.error(f"Error clearing spatial cache: {e}")
-            return False 
\ No newline at end of file
+            return False
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss/latency counters for each tier."""
+        return get_cache_stats()
+
+
+
+def read_through(
+    namespace: str,
+    ttl: int = None,
+    stale_ttl: int = None,
+    dataset: Optional[str] = None,
+):
+    """Decorator caching a function's result under a content hash of its arguments.
+
+    ``self`` is excluded from the key, so it works on service methods. When
+    ``dataset`` is given its version is part of the key. Coroutine functions
+    get an async wrapper sharing the same keys. The undecorated function stays
+    available as ``.uncached``.
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                bound = signature.bind(*args, **kwargs)
+                bound.apply_defaults()
+                params = {name: value for name, value in bound.arguments.items() if name != "self"}
+
+                cache = CacheService()
+                version = await run_sync(cache.get_dataset_version, dataset) if dataset else None
+                key = make_cache_key(namespace, params, version)
+                return await cache.get_or_compute_async(
+                    key, lambda: func(*args, **kwargs), ttl=ttl, stale_ttl=stale_ttl
+                )
+
+            async_wrapper.uncached = func
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            params = {name: value for name, value in bound.arguments.items() if name != "self"}
+
+            cache = CacheService()
+            version = cache.get_dataset_version(dataset) if dataset else None
+            key = make_cache_key(namespace, params, version)
+            return cache.get_or_compute(key, lambda: func(*args, **kwargs), ttl=ttl, stale_ttl=stale_ttl)
+
+        wrapper.uncached = func
+        return wrapper
+    return decorator
\ No newline at end of file
@@ -0,0 +1,168 @@
+from typing import Any, List, Tuple
+import math
+import numpy as np
+from app.services.geo import EARTH_RADIUS_KM
+
+# Cell keys are Web Mercator quadtree tiles at CELL_KEY_ZOOM with the tile x/y
+# bits interleaved (x in even bits, y in odd bits). Reading the key two bits at a
+# time from the top gives the Bing quadkey digits, so every tile at a coarser
+# zoom owns one contiguous key range and B-tree range scans follow the quadtree.
+CELL_KEY_ZOOM = 30
+MAX_LATITUDE = 85.0511287798066
+
+_SPREAD_MASKS = (
+    (16, 0x0000FFFF0000FFFF),
+    (8, 0x00FF00FF00FF00FF),
+    (4, 0x0F0F0F0F0F0F0F0F),
+    (2, 0x3333333333333333),
+    (1, 0x5555555555555555),
+)
+
+_COMPACT_MASKS = (
+    (1, 0x3333333333333333),
+    (2, 0x0F0F0F0F0F0F0F0F),
+    (4, 0x00FF00FF00FF00FF),
+    (8, 0x0000FFFF0000FFFF),
+    (16, 0x00000000FFFFFFFF),
+)
+
+
+def _spread_bits(values: Any) -> Any:
+    for shift, mask in _SPREAD_MASKS:
+        values = (values | (values << shift)) & mask
+    return values
+
+
+def _compact_bits(values: Any) -> Any:
+    values = values & 0x5555555555555555
+    for shift, mask in _COMPACT_MASKS:
+        values = (values | (values >> shift)) & mask
+    return values
+
+
+def lonlat_to_world(lats: Any, lons: Any) -> Tuple[np.ndarray, np.ndarray]:
+    """Web Mercator coordinates in [0, 1] (y down); latitudes are clamped to the projection."""
+    lats = np.clip(np.asarray(lats, dtype=np.float64), -MAX_LATITUDE, MAX_LATITUDE)
+    lons = np.asarray(lons, dtype=np.float64)
+    lat_rad = np.radians(lats)
+    return (
+        (lons + 180.0) / 360.0,
+        (1.0 - np.log(np.tan(lat_rad) + 1.0 / np.cos(lat_rad)) / math.pi) / 2.0,
+    )
+
+
+def lonlat_to_tile(lats: Any, lons: Any, zoom: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Web Mercator tile x/y for coordinates at a zoom level."""
+    n = 1 << zoom
+    world_x, world_y = lonlat_to_world(lats, lons)
+    x = np.floor(world_x * n)
+    y = np.floor(world_y * n)
+    return (
+        np.clip(x, 0, n - 1).astype(np.uint64),
+        np.clip(y, 0, n - 1).astype(np.uint64),
+    )
+
+
+def tile_key(x: Any, y: Any) -> Any:
+    """Interleave tile x/y into a quadtree key (scalars or uint64 arrays)."""
+    return _spread_bits(x) | (_spread_bits(y) << 1)
+
+
+def tile_xy(key: Any) -> Tuple[Any, Any]:
+    """Inverse of tile_key."""
+    return _compact_bits(key), _compact_bits(key >> 1)
+
+
+def cell_keys(lats: Any, lons: Any) -> np.ndarray:
+    """Cell keys for arrays of coordinates, as int64 for storage in a BIGINT column."""
+    x, y = lonlat_to_tile(lats, lons, CELL_KEY_ZOOM)
+    return tile_key(x, y).astype(np.int64)
+
+
+def cell_key(latitude: float, longitude: float) -> int:
+    """Cell key for a single coordinate."""
+    return int(cell_keys([latitude], [longitude])[0])
+
+
+def parent_keys(keys: Any, zoom: int) -> Any:
+    """Tile keys at ``zoom`` containing the given cell keys."""
+    return keys >> (2 * (CELL_KEY_ZOOM - zoom))
+
+
+def tile_key_range(key: int, zoom: int) -> Tuple[int, int]:
+    """Inclusive range of cell keys inside a tile."""
+    shift = 2 * (CELL_KEY_ZOOM - zoom)
+    return key << shift, ((key + 1) << shift) - 1
+
+
+def zoom_for_tile_size(edge_km: float) -> int:
+    """Coarsest zoom whose tiles are at most ``edge_km`` across at the equator."""
+    return max(0, math.ceil(math.log2(2.0 * math.pi * EARTH_RADIUS_KM / edge_km)))
+
+
+def tile_bounds(x: int, y: int, zoom: int) -> Tuple[float, float, float, float]:
+    """(min_lon, min_lat, max_lon, max_lat) of a tile."""
+    n = 1 << zoom
+
+    def tile_lat(row: int) -> float:
+        return math.degrees(math.atan(math.sinh(math.pi * (1.0 - 2.0 * row / n))))
+
+    return x / n * 360.0 - 180.0, tile_lat(y + 1), (x + 1) / n * 360.0 - 180.0, tile_lat(y)
+
+
+def _split_antimeridian(minx: float, miny: float, maxx: float, maxy: float) -> List[Tuple[float, float, float, float]]:
+    if minx > maxx:
+        return [(minx, miny, 180.0, maxy), (-180.0, miny, maxx, maxy)]
+    return [(minx, miny, maxx, maxy)]
+
+
+def _bbox_tiles(minx: float, miny: float, maxx: float, maxy: float, zoom: int) -> Tuple[int, int, int, int]:
+    # Tile rows grow southwards, so the northern edge gives the first row
+    x, y = lonlat_to_tile([maxy, miny], [minx, maxx], zoom)
+    return int(x[0]), int(x[1]), int(y[0]), int(y[1])
+
+
+def _merge_ranges(keys: List[int]) -> List[Tuple[int, int]]:
+    ranges: List[Tuple[int, int]] = []
+    for key in sorted(set(keys)):
+        if ranges and ranges[-1][1] == key - 1:
+            ranges[-1] = (ranges[-1][0], key)
+        else:
+            ranges.append((key, key))
+    return ranges
+
+
+def cover_tiles(minx: float, miny: float, maxx: float, maxy: float, zoom: int) -> List[Tuple[int, int]]:
+    """Inclusive tile key ranges at ``zoom`` covering a bbox (minx > maxx crosses the antimeridian)."""
+    keys: List[int] = []
+    for box in _split_antimeridian(minx, miny, maxx, maxy):
+        x0, x1, y0, y1 = _bbox_tiles(*box, zoom)
+        xs, ys = np.meshgrid(
+            np.arange(x0, x1 + 1, dtype=np.uint64),
+            np.arange(y0, y1 + 1, dtype=np.uint64),
+        )
+        keys.extend(int(key) for key in tile_key(xs.ravel(), ys.ravel()))
+    return _merge_ranges(keys)
+
+
+def cover_bbox(minx: float, miny: float, maxx: float, maxy: float, max_tiles: int = 64) -> List[Tuple[int, int]]:
+    """Inclusive cell key ranges covering a bbox, using the finest zoom with at most ``max_tiles`` tiles.
+
+    The cover is a superset of the bbox, so callers still filter on
+    latitude/longitude; the ranges only narrow the index scan.
+    """
+    boxes = _split_antimeridian(minx, miny, maxx, maxy)
+    zoom = 0
+    for candidate in range(CELL_KEY_ZOOM, -1, -1):
+        tiles = 0
+        for box in boxes:
+            x0, x1, y0, y1 = _bbox_tiles(*box, candidate)
+            tiles += (x1 - x0 + 1) * (y1 - y0 + 1)
+        if tiles <= max_tiles:
+            zoom = candidate
+            break
+
+    ranges = []
+    for first, last in cover_tiles(minx, miny, maxx, maxy, zoom):
+        ranges.append((tile_key_range(first, zoom)[0], tile_key_range(last, zoom)[1]))
+    return ranges
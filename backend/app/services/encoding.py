@@ -0,0 +1,216 @@
+from contextlib import contextmanager
+from datetime import datetime
+from itertools import chain
+from operator import itemgetter
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+import gc
+import gzip
+import json
+import logging
+from fastapi import Response
+from app.core.config import settings
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+except ImportError:  # pragma: no cover - optional dependency
+    pyarrow = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+# Response formats for spatial-data listings, selected by Accept header or ?format=
+RESPONSE_MEDIA_TYPES = {
+    "json": "application/json",
+    "columnar": "application/vnd.octa.columnar+json",
+    "arrow": "application/vnd.apache.arrow.stream",
+}
+
+SPATIAL_COLUMNS = ("id", "name", "latitude", "longitude", "properties", "created_at")
+
+_EMPTY: Dict[str, Any] = {}
+
+
+def available_formats() -> List[str]:
+    return [fmt for fmt in RESPONSE_MEDIA_TYPES if fmt != "arrow" or pyarrow is not None]
+
+
+def negotiate_format(accept: Optional[str], requested: Optional[str] = None) -> str:
+    """Pick a response format from an explicit ``format`` parameter or the Accept header.
+
+    Raises ValueError for an unknown or unavailable explicit format; Accept
+    entries that cannot be served fall through to row JSON.
+    """
+    formats = available_formats()
+    if requested:
+        if requested not in formats:
+            raise ValueError(f"Unsupported format {requested!r}, expected one of {', '.join(formats)}")
+        return requested
+
+    ranked: List[Tuple[float, int, str]] = []
+    for position, part in enumerate((accept or "").split(",")):
+        media_type, _, params = part.strip().partition(";")
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        for fmt in formats:
+            if media_type.strip().lower() == RESPONSE_MEDIA_TYPES[fmt] and quality > 0:
+                ranked.append((-quality, position, fmt))
+    return min(ranked)[2] if ranked else "json"
+
+
+@contextmanager
+def _gc_paused() -> Iterator[None]:
+    """Suspend the cyclic GC while building millions of acyclic containers.
+
+    Allocation-triggered collections otherwise rescan every container built so
+    far, which makes large responses several times slower to assemble.
+    """
+    was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if was_enabled:
+            gc.enable()
+
+
+def rows_to_columns(rows: Sequence[Any]) -> Dict[str, Any]:
+    """Transpose spatial_data rows (column tuples, ORM objects or dicts) into parallel lists."""
+    if not rows:
+        return {"count": 0, **{column: [] for column in SPATIAL_COLUMNS}}
+    with _gc_paused():
+        if isinstance(rows[0], dict):
+            values = [list(map(itemgetter(column), rows)) for column in SPATIAL_COLUMNS]
+        elif isinstance(rows[0], tuple) or hasattr(rows[0], "_mapping"):
+            # Row tuples from column selects, in SPATIAL_COLUMNS order
+            values = [list(map(itemgetter(index), rows)) for index in range(len(SPATIAL_COLUMNS))]
+        else:
+            values = [[getattr(row, column) for row in rows] for column in SPATIAL_COLUMNS]
+    columns = dict(zip(SPATIAL_COLUMNS, values))
+    columns["count"] = len(rows)
+    return columns
+
+
+def cacheable_columns(columns: Dict[str, Any]) -> Dict[str, Any]:
+    """Columns with timestamps as ISO strings, safe for every cache serializer."""
+    created_at = [value.isoformat() if isinstance(value, datetime) else value for value in columns["created_at"]]
+    return {**columns, "created_at": created_at}
+
+
+def columns_to_records(columns: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Row dicts in the shape of the default JSON listing."""
+    with _gc_paused():
+        return [
+            {
+                "id": spatial_id,
+                "name": name,
+                "latitude": latitude,
+                "longitude": longitude,
+                "properties": properties or {},
+                "created_at": created_at,
+            }
+            for spatial_id, name, latitude, longitude, properties, created_at in zip(
+                *(columns[column] for column in SPATIAL_COLUMNS)
+            )
+        ]
+
+
+def _property_columns(properties: List[Any]) -> Dict[str, List[Any]]:
+    """One list per property key, None where a row lacks the key."""
+    with _gc_paused():
+        keys = dict.fromkeys(chain.from_iterable(filter(None, properties)))
+        rows = [row or _EMPTY for row in properties]
+        return {key: [row.get(key) for row in rows] for key in keys}
+
+
+def _dumps(value: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(value, separators=(",", ":"), default=lambda item: item.isoformat()).encode()
+
+
+def _encode_arrow(columns: Dict[str, Any]) -> bytes:
+    created_at = [
+        datetime.fromisoformat(value) if isinstance(value, str) else value
+        for value in columns["created_at"]
+    ]
+    arrays = {
+        "id": pyarrow.array(columns["id"], type=pyarrow.int64()),
+        "name": pyarrow.array(columns["name"], type=pyarrow.string()),
+        "latitude": pyarrow.array(columns["latitude"], type=pyarrow.float64()),
+        "longitude": pyarrow.array(columns["longitude"], type=pyarrow.float64()),
+        "created_at": pyarrow.array(created_at, type=pyarrow.timestamp("us", tz="UTC")),
+    }
+    # One typed column per property key; keys whose values mix types travel as JSON text
+    for key, values in _property_columns(columns["properties"]).items():
+        try:
+            arrays[f"properties.{key}"] = pyarrow.array(values)
+        except (pyarrow.ArrowInvalid, pyarrow.ArrowTypeError):
+            arrays[f"properties.{key}"] = pyarrow.array(
+                [None if value is None else _dumps(value).decode() for value in values],
+                type=pyarrow.string(),
+            )
+    table = pyarrow.table(arrays)
+    sink = pyarrow.BufferOutputStream()
+    with pyarrow.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def encode_columns(columns: Dict[str, Any], fmt: str) -> bytes:
+    """Serialize columns as row JSON, columnar JSON or an Arrow IPC stream."""
+    if fmt == "arrow":
+        return _encode_arrow(columns)
+    if fmt == "columnar":
+        return _dumps({
+            "count": columns["count"],
+            "id": columns["id"],
+            "name": columns["name"],
+            "latitude": columns["latitude"],
+            "longitude": columns["longitude"],
+            "created_at": columns["created_at"],
+            "properties": _property_columns(columns["properties"]),
+        })
+    return _dumps(columns_to_records(columns))
+
+
+def compress(body: bytes, accept_encoding: Optional[str]) -> Tuple[bytes, Optional[str]]:
+    """Compress with zstd or gzip when the client accepts it and the body is large enough."""
+    if len(body) < settings.response_compression_min_bytes:
+        return body, None
+    accepted = {part.split(";", 1)[0].strip().lower() for part in (accept_encoding or "").split(",")}
+    if "zstd" in accepted and zstandard is not None:
+        return zstandard.ZstdCompressor(level=settings.response_zstd_level).compress(body), "zstd"
+    if "gzip" in accepted:
+        return gzip.compress(body, compresslevel=settings.response_gzip_level), "gzip"
+    return body, None
+
+
+def spatial_response(
+    columns: Dict[str, Any],
+    fmt: str,
+    accept_encoding: Optional[str] = None,
+    headers: Optional[Dict[str, str]] = None,
+) -> Response:
+    """Pre-encoded response for spatial rows, bypassing FastAPI's per-row JSON encoding."""
+    body, encoding = compress(encode_columns(columns, fmt), accept_encoding)
+    headers = dict(headers or {})
+    headers["Vary"] = "Accept, Accept-Encoding"
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type=RESPONSE_MEDIA_TYPES[fmt], headers=headers)
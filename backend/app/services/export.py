@@ -0,0 +1,118 @@
+from typing import Any, Dict, Iterator, List, Optional
+import base64
+import csv
+import io
+import json
+import logging
+from app.core.config import settings
+from app.crud import spatial
+from app.db.session import ReadSessionLocal
+
+logger = logging.getLogger(__name__)
+
+EXPORT_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "geojson": "application/geo+json",
+    "csv": "text/csv",
+}
+
+CSV_COLUMNS = ["id", "name", "latitude", "longitude", "properties", "created_at"]
+
+
+def encode_cursor(last_id: int) -> str:
+    """Opaque continuation token for keyset pagination."""
+    payload = json.dumps({"id": last_id}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> int:
+    """Decode a continuation token; raises ValueError when it is malformed."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        last_id = json.loads(base64.urlsafe_b64decode(padded.encode()))["id"]
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {e}")
+    if not isinstance(last_id, int) or last_id < 0:
+        raise ValueError("Invalid cursor")
+    return last_id
+
+
+def spatial_row_to_dict(row: Any) -> Dict[str, Any]:
+    """Plain dict for a SpatialData row or ORM object, as returned by the JSON endpoints."""
+    return {
+        "id": row.id,
+        "name": row.name,
+        "latitude": row.latitude,
+        "longitude": row.longitude,
+        "properties": row.properties or {},
+        "created_at": row.created_at.isoformat() if row.created_at else None,
+    }
+
+
+def _feature(row: Any) -> Dict[str, Any]:
+    properties = dict(row.properties or {})
+    properties["name"] = row.name
+    properties["created_at"] = row.created_at.isoformat() if row.created_at else None
+    return {
+        "type": "Feature",
+        "id": row.id,
+        "geometry": {"type": "Point", "coordinates": [row.longitude, row.latitude]},
+        "properties": properties,
+    }
+
+
+def _ndjson_batch(rows: List[Any]) -> str:
+    return "".join(json.dumps(spatial_row_to_dict(row), separators=(",", ":")) + "\n" for row in rows)
+
+
+def _csv_batch(rows: List[Any]) -> str:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([
+            row.id,
+            row.name,
+            row.latitude,
+            row.longitude,
+            json.dumps(row.properties or {}, separators=(",", ":")),
+            row.created_at.isoformat() if row.created_at else "",
+        ])
+    return buffer.getvalue()
+
+
+def stream_spatial_export(fmt: str, batch_size: Optional[int] = None) -> Iterator[str]:
+    """Yield the whole spatial_data table as NDJSON, GeoJSON or CSV text chunks.
+
+    Rows come from a server-side cursor one batch at a time, so memory stays
+    flat regardless of table size. Opens its own session because the response
+    body outlives the request handler.
+    """
+    if fmt not in EXPORT_MEDIA_TYPES:
+        raise ValueError(f"Unsupported export format: {fmt}")
+
+    batch_size = batch_size or settings.export_batch_size
+    db = ReadSessionLocal()
+    try:
+        if fmt == "csv":
+            yield ",".join(CSV_COLUMNS) + "\r\n"
+        elif fmt == "geojson":
+            yield '{"type":"FeatureCollection","features":['
+
+        first = True
+        for rows in spatial.stream_spatial_data_rows(db, batch_size=batch_size):
+            if fmt == "ndjson":
+                yield _ndjson_batch(rows)
+            elif fmt == "csv":
+                yield _csv_batch(rows)
+            else:
+                body = ",".join(json.dumps(_feature(row), separators=(",", ":")) for row in rows)
+                yield body if first else "," + body
+            first = False
+
+        if fmt == "geojson":
+            yield "]}"
+    except Exception as e:
+        logger.error(f"Error exporting spatial data: {e}")
+        raise
+    finally:
+        db.close()
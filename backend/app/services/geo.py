@@ -0,0 +1,33 @@
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = np.pi * EARTH_RADIUS_KM / 180.0
+
+
+def haversine_km(lat1, lon1, lat2, lon2) -> np.ndarray:
+    """Great-circle distance in kilometres between coordinate arrays (degrees)."""
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(value, dtype=np.float64)) for value in (lat1, lon1, lat2, lon2))
+    a = (
+        np.sin((lat2 - lat1) / 2.0) ** 2
+        + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2.0) ** 2
+    )
+    return 2.0 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def unit_vectors(lats, lons) -> np.ndarray:
+    """(n, 3) points on the unit sphere for coordinate arrays (degrees)."""
+    lat_r = np.radians(np.asarray(lats, dtype=np.float64))
+    lon_r = np.radians(np.asarray(lons, dtype=np.float64))
+    cos_lat = np.cos(lat_r)
+    return np.column_stack((cos_lat * np.cos(lon_r), cos_lat * np.sin(lon_r), np.sin(lat_r)))
+
+
+def chord_to_km(chord) -> np.ndarray:
+    """Great-circle distance in kilometres for straight-line distances between unit vectors."""
+    return 2.0 * EARTH_RADIUS_KM * np.arcsin(np.clip(np.asarray(chord, dtype=np.float64) / 2.0, 0.0, 1.0))
+
+
+def km_to_chord(km) -> np.ndarray:
+    """Straight-line distance between unit vectors that are ``km`` apart on the sphere."""
+    angle = np.minimum(np.asarray(km, dtype=np.float64) / EARTH_RADIUS_KM, np.pi)
+    return 2.0 * np.sin(angle / 2.0)
@@ -0,0 +1,715 @@
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import asyncio
+import heapq
+import logging
+import threading
+import time
+import zlib
+import numpy as np
+from app.core.concurrency import run_sync
+from app.core.config import settings
+from app.db.neo4j import AsyncNeo4jConnection, Neo4jConnection
+from app.services.cache import CacheService
+from app.services.geo import haversine_km
+
+logger = logging.getLogger(__name__)
+
+# A network is the set of :Node vertices sharing a network_id property; None
+# snapshots every :Node. Relationships are read as undirected edges weighted by
+# settings.network_weight_property (1.0 when absent).
+NODES_QUERY = """
+MATCH (n:Node)
+WHERE $network_id IS NULL OR n.network_id = $network_id
+RETURN elementId(n) AS id, n.name AS name, n.latitude AS latitude, n.longitude AS longitude
+"""
+
+# NODES_QUERY plus the metrics written back by the last network metrics run
+METRIC_NODES_QUERY = """
+MATCH (n:Node)
+WHERE $network_id IS NULL OR n.network_id = $network_id
+RETURN elementId(n) AS id, n.name AS name, n.latitude AS latitude, n.longitude AS longitude,
+       n.pagerank AS pagerank, n.community AS community, n.metrics_digest AS metrics_digest
+"""
+
+EDGES_QUERY = """
+MATCH (a:Node)-[r]->(b:Node)
+WHERE $network_id IS NULL OR (a.network_id = $network_id AND b.network_id = $network_id)
+RETURN elementId(a) AS source, elementId(b) AS target, r[$weight_property] AS weight
+"""
+
+
+# Odd 64-bit multipliers for GraphSnapshot.fingerprint
+_MIX_A = np.uint64(0x9E3779B97F4A7C15)
+_MIX_B = np.uint64(0xC2B2AE3D27D4EB4F)
+_MIX_C = np.uint64(0x165667B19E3779F9)
+
+
+class GraphSnapshot:
+    """Immutable undirected graph in CSR form.
+
+    Neighbours of node ``i`` are ``indices[offsets[i]:offsets[i + 1]]`` with the
+    matching ``weights``. Traversal-heavy metrics expand whole BFS frontiers
+    with array operations; heap-based searches use list copies of the arrays.
+    """
+
+    def __init__(
+        self,
+        names: List[Optional[str]],
+        latitudes: np.ndarray,
+        longitudes: np.ndarray,
+        offsets: np.ndarray,
+        indices: np.ndarray,
+        weights: np.ndarray,
+        element_ids: Optional[List[str]] = None,
+    ):
+        self.names = names
+        self.element_ids = element_ids
+        self.latitudes = latitudes
+        self.longitudes = longitudes
+        self.offsets = offsets
+        self.indices = indices
+        self.weights = weights
+        self.node_index: Dict[str, int] = {}
+        for position, name in enumerate(names):
+            if name is not None:
+                self.node_index.setdefault(str(name), position)
+        self.weighted = bool(len(weights)) and not bool(np.all(weights == 1.0))
+        self.loaded_at = time.monotonic()
+        self._lists: Optional[Tuple[List[int], List[int], List[float]]] = None
+        self._cost_per_km: Optional[float] = None
+        # Values stored on the nodes by the previous metrics run, when loaded with them
+        self.stored_metrics: Dict[str, Any] = {}
+
+    @classmethod
+    def from_edges(
+        cls,
+        names: List[Optional[str]],
+        latitudes: Any,
+        longitudes: Any,
+        sources: Any,
+        targets: Any,
+        weights: Any = None,
+        element_ids: Optional[List[str]] = None,
+    ) -> "GraphSnapshot":
+        """Build the CSR arrays from an edge list; each edge is stored in both directions."""
+        node_count = len(names)
+        sources = np.asarray(sources, dtype=np.int64)
+        targets = np.asarray(targets, dtype=np.int64)
+        weights = np.ones(len(sources)) if weights is None else np.asarray(weights, dtype=np.float64)
+        if len(weights) and weights.min() < 0:
+            logger.warning("Negative edge weights clamped to 0 in graph snapshot")
+            weights = np.maximum(weights, 0.0)
+
+        keep = sources != targets
+        sources, targets, weights = sources[keep], targets[keep], weights[keep]
+        rows = np.concatenate([sources, targets])
+        cols = np.concatenate([targets, sources])
+        both_weights = np.concatenate([weights, weights])
+        order = np.argsort(rows, kind="stable")
+        offsets = np.zeros(node_count + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=node_count), out=offsets[1:])
+        return cls(
+            names,
+            np.asarray(latitudes, dtype=np.float64),
+            np.asarray(longitudes, dtype=np.float64),
+            offsets,
+            cols[order].astype(np.int32),
+            both_weights[order],
+            element_ids,
+        )
+
+    @property
+    def node_count(self) -> int:
+        return len(self.names)
+
+    @property
+    def edge_count(self) -> int:
+        return len(self.indices) // 2
+
+    def degree(self) -> np.ndarray:
+        return np.diff(self.offsets)
+
+    def fingerprint(self) -> int:
+        """Digest of the nodes, coordinates, edges and weights.
+
+        Neo4j returns records in no fixed order, so per-node and per-edge
+        hashes are summed rather than chained: the same graph gives the same
+        fingerprint on every load.
+        """
+        keys = self.element_ids or [str(node) for node in range(self.node_count)]
+        node_hashes = np.asarray(
+            [zlib.crc32(f"{key}\x1f{name}".encode()) for key, name in zip(keys, self.names)], dtype=np.uint64
+        )
+        # uint64 arrays wrap on overflow, which is what the mixing wants
+        coordinates = self.latitudes.view(np.uint64) * _MIX_A ^ self.longitudes.view(np.uint64) * _MIX_B
+        nodes = node_hashes * _MIX_C ^ coordinates
+        rows = np.repeat(np.arange(self.node_count), np.diff(self.offsets))
+        edges = node_hashes[rows] * _MIX_A ^ node_hashes[self.indices] * _MIX_B ^ self.weights.view(np.uint64)
+        with np.errstate(over="ignore"):
+            return int(nodes.sum(dtype=np.uint64) ^ edges.sum(dtype=np.uint64) * _MIX_C)
+
+    def _adjacency_lists(self) -> Tuple[List[int], List[int], List[float]]:
+        if self._lists is None:
+            self._lists = (self.offsets.tolist(), self.indices.tolist(), self.weights.tolist())
+        return self._lists
+
+    def _expand(self, frontier: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """(parent, neighbour) pairs for every edge leaving the frontier."""
+        starts = self.offsets[frontier]
+        counts = self.offsets[frontier + 1] - starts
+        total = int(counts.sum())
+        positions = np.repeat(starts - (np.cumsum(counts) - counts), counts) + np.arange(total)
+        return np.repeat(frontier, counts), self.indices[positions]
+
+    def bfs_distances(self, source: int) -> np.ndarray:
+        """Hop counts from ``source`` (-1 where unreachable)."""
+        distances = np.full(self.node_count, -1, dtype=np.int64)
+        distances[source] = 0
+        frontier = np.asarray([source], dtype=np.int64)
+        depth = 0
+        while frontier.size:
+            _, neighbours = self._expand(frontier)
+            depth += 1
+            # The next frontier is just the newly reached nodes, so each level costs its own edges, not a scan of every node
+            frontier = np.unique(neighbours[distances[neighbours] < 0])
+            distances[frontier] = depth
+        return distances
+
+    def _bfs_path(self, source: int, target: int) -> Optional[List[int]]:
+        parents = np.full(self.node_count, -1, dtype=np.int64)
+        parents[source] = source
+        frontier = np.asarray([source], dtype=np.int64)
+        while frontier.size and parents[target] < 0:
+            origins, neighbours = self._expand(frontier)
+            fresh = parents[neighbours] < 0
+            # Any frontier node is a valid parent when several reach the same neighbour
+            parents[neighbours[fresh]] = origins[fresh]
+            frontier = np.unique(neighbours[fresh])
+        if parents[target] < 0:
+            return None
+        path = [target]
+        while path[-1] != source:
+            path.append(int(parents[path[-1]]))
+        return path[::-1]
+
+    def _heuristic(self, target: int) -> Optional[List[float]]:
+        """Admissible A* bound: straight-line km times the cheapest weight per km of any edge."""
+        if np.isnan(self.latitudes).any() or np.isnan(self.longitudes).any():
+            return None
+        if self._cost_per_km is None:
+            sources = np.repeat(np.arange(self.node_count), self.degree())
+            lengths = haversine_km(
+                self.latitudes[sources], self.longitudes[sources],
+                self.latitudes[self.indices], self.longitudes[self.indices],
+            )
+            positive = lengths > 0
+            self._cost_per_km = float((self.weights[positive] / lengths[positive]).min()) if positive.any() else 0.0
+        if self._cost_per_km <= 0:
+            return None
+        distances = haversine_km(self.latitudes, self.longitudes, self.latitudes[target], self.longitudes[target])
+        return (distances * self._cost_per_km).tolist()
+
+    def _search_path(self, source: int, target: int, heuristic: Optional[List[float]] = None) -> Optional[Tuple[List[int], float]]:
+        """Dijkstra, or A* when a consistent heuristic is given."""
+        offsets, indices, weights = self._adjacency_lists()
+        best = [float("inf")] * self.node_count
+        parents = [-1] * self.node_count
+        settled = bytearray(self.node_count)
+        best[source] = 0.0
+        queue = [(heuristic[source] if heuristic else 0.0, 0.0, source)]
+        while queue:
+            _, cost, node = heapq.heappop(queue)
+            if settled[node]:
+                continue
+            if node == target:
+                path = [target]
+                while path[-1] != source:
+                    path.append(parents[path[-1]])
+                return path[::-1], cost
+            settled[node] = 1
+            for position in range(offsets[node], offsets[node + 1]):
+                neighbour = indices[position]
+                candidate = cost + weights[position]
+                if candidate < best[neighbour] and not settled[neighbour]:
+                    best[neighbour] = candidate
+                    parents[neighbour] = node
+                    estimate = candidate + heuristic[neighbour] if heuristic else candidate
+                    heapq.heappush(queue, (estimate, candidate, neighbour))
+        return None
+
+    def shortest_path(self, source: int, target: int, algorithm: str = "auto") -> Tuple[Optional[List[int]], Optional[float], str]:
+        """(node path, cost, algorithm used); BFS on unweighted graphs, A* when coordinates allow."""
+        if algorithm == "auto":
+            if not self.weighted:
+                algorithm = "bfs"
+            else:
+                algorithm = "astar" if self._heuristic(target) is not None else "dijkstra"
+
+        if algorithm == "bfs":
+            path = self._bfs_path(source, target)
+            if path is None:
+                return None, None, algorithm
+            offsets, indices, weights = self._adjacency_lists()
+            cost = 0.0
+            for node, following in zip(path, path[1:]):
+                cost += min(
+                    weights[position]
+                    for position in range(offsets[node], offsets[node + 1])
+                    if indices[position] == following
+                )
+            return path, cost, algorithm
+
+        heuristic = self._heuristic(target) if algorithm == "astar" else None
+        if algorithm == "astar" and heuristic is None:
+            algorithm = "dijkstra"
+        found = self._search_path(source, target, heuristic)
+        if found is None:
+            return None, None, algorithm
+        return found[0], found[1], algorithm
+
+    def distances_from(self, source: int, targets: np.ndarray) -> np.ndarray:
+        """Path costs from one source to many targets (inf where unreachable).
+
+        One search serves every target: a vectorized BFS on unweighted graphs,
+        otherwise Dijkstra stopped as soon as the last target is settled.
+        """
+        if not self.weighted:
+            hops = self.bfs_distances(source)[targets].astype(np.float64)
+            hops[hops < 0] = np.inf
+            return hops
+
+        offsets, indices, weights = self._adjacency_lists()
+        best = [float("inf")] * self.node_count
+        settled = bytearray(self.node_count)
+        remaining = set(np.asarray(targets).tolist())
+        best[source] = 0.0
+        queue = [(0.0, source)]
+        while queue and remaining:
+            cost, node = heapq.heappop(queue)
+            if settled[node]:
+                continue
+            settled[node] = 1
+            remaining.discard(node)
+            for position in range(offsets[node], offsets[node + 1]):
+                neighbour = indices[position]
+                candidate = cost + weights[position]
+                if candidate < best[neighbour] and not settled[neighbour]:
+                    best[neighbour] = candidate
+                    heapq.heappush(queue, (candidate, neighbour))
+        return np.asarray(best)[targets]
+
+    def pagerank(
+        self,
+        damping: float = None,
+        tolerance: float = None,
+        max_iter: int = None,
+        initial: Optional[np.ndarray] = None,
+    ) -> np.ndarray:
+        """Weighted PageRank by power iteration; dangling mass is spread uniformly.
+
+        ``initial`` warm-starts the iteration (e.g. from the previous run's
+        ranks), which converges in a few steps when little has changed.
+        """
+        damping = settings.network_pagerank_damping if damping is None else damping
+        tolerance = tolerance or settings.network_pagerank_tolerance
+        max_iter = max_iter or settings.network_pagerank_max_iter
+        count = self.node_count
+        if count == 0:
+            return np.empty(0)
+        sources = np.repeat(np.arange(count), self.degree())
+        strength = np.bincount(sources, weights=self.weights, minlength=count)
+        edge_share = np.divide(self.weights, strength[sources], out=np.zeros_like(self.weights), where=strength[sources] > 0)
+        dangling = strength == 0
+
+        rank = np.full(count, 1.0 / count)
+        if initial is not None and np.isfinite(initial).all() and initial.sum() > 0:
+            rank = initial / initial.sum()
+        for _ in range(max_iter):
+            spread = np.bincount(self.indices, weights=rank[sources] * edge_share, minlength=count)
+            updated = (1.0 - damping) / count + damping * (spread + rank[dangling].sum() / count)
+            converged = np.abs(updated - rank).sum() < count * tolerance
+            rank = updated
+            if converged:
+                break
+        return rank
+
+    def label_propagation(
+        self,
+        initial: Optional[np.ndarray] = None,
+        max_iter: int = None,
+        seed: int = 0,
+        renumber: bool = True,
+    ) -> np.ndarray:
+        """Community labels by weighted label propagation.
+
+        Every round each node picks the label with the largest total edge
+        weight among its neighbours, keeping its own label on ties. Only a
+        random half of the nodes adopt their pick per round, which prevents the
+        oscillation of fully synchronous updates. Stops once at most
+        ``network_community_min_change`` of the nodes would still move.
+        ``initial`` warm-starts from earlier labels. Labels are renumbered
+        0..k-1 by community size, or with ``renumber=False`` kept in the label
+        space of ``initial`` so community ids stay stable across runs.
+        """
+        max_iter = max_iter or settings.network_community_max_iter
+        count = self.node_count
+        if count == 0:
+            return np.empty(0, dtype=np.int64)
+        if initial is None:
+            label_values = np.arange(count, dtype=np.int64)
+            labels = label_values.copy()
+        else:
+            label_values, labels = np.unique(np.asarray(initial, dtype=np.int64), return_inverse=True)
+            labels = labels.astype(np.int64).ravel()
+        sources = np.repeat(np.arange(count, dtype=np.int64), self.degree())
+        rng = np.random.default_rng(seed)
+
+        for _ in range(max_iter):
+            # Total weight per (node, neighbour label)
+            pairs, inverse = np.unique(sources * count + labels[self.indices], return_inverse=True)
+            totals = np.bincount(inverse.ravel(), weights=self.weights, minlength=len(pairs))
+            nodes, candidates = pairs // count, pairs % count
+
+            current = np.zeros(count)
+            own = candidates == labels[nodes]
+            current[nodes[own]] = totals[own]
+            # Heaviest label per node; ties go to the smaller label for determinism
+            order = np.lexsort((candidates, -totals, nodes))
+            first = order[np.r_[True, nodes[order][1:] != nodes[order][:-1]]]
+            best = labels.copy()
+            best_total = np.zeros(count)
+            best[nodes[first]] = candidates[first]
+            best_total[nodes[first]] = totals[first]
+
+            improving = best_total > current
+            # Sparse graphs keep a fringe of nodes flipping between equally good labels
+            if improving.sum() <= count * settings.network_community_min_change:
+                break
+            improving &= rng.random(count) < 0.5
+            labels[improving] = best[improving]
+
+        if not renumber:
+            return label_values[labels]
+        # Renumber by descending community size
+        _, inverse, sizes = np.unique(labels, return_inverse=True, return_counts=True)
+        rank = np.empty(len(sizes), dtype=np.int64)
+        rank[np.argsort(-sizes, kind="stable")] = np.arange(len(sizes))
+        return rank[inverse.ravel()]
+
+    def modularity(self, labels: np.ndarray) -> float:
+        """Weighted Newman modularity of a partition."""
+        total = self.weights.sum()
+        if total == 0:
+            return 0.0
+        sources = np.repeat(np.arange(self.node_count), self.degree())
+        inside = self.weights[labels[sources] == labels[self.indices]].sum()
+        strength = np.bincount(sources, weights=self.weights, minlength=self.node_count)
+        community_strength = np.bincount(labels, weights=strength)
+        # CSR stores each edge twice, so ``total`` is already 2m
+        return float(inside / total - ((community_strength / total) ** 2).sum())
+
+    def neighbourhood_digests(self) -> np.ndarray:
+        """Order-independent int64 fingerprint of each node's neighbours and edge weights.
+
+        Requires ``element_ids``; a node's digest changes when any of its edges
+        is added, removed or reweighted, so comparing digests with the previous
+        run finds the part of the graph that changed.
+        """
+        node_hashes = np.fromiter(
+            (zlib.crc32(element_id.encode()) for element_id in self.element_ids),
+            dtype=np.uint64,
+            count=self.node_count,
+        )
+        edge_hashes = (
+            node_hashes[self.indices] * np.uint64(0x9E3779B97F4A7C15)
+            + np.round(self.weights * 1e6).astype(np.int64).astype(np.uint64)
+        )
+        digests = np.zeros(self.node_count, dtype=np.uint64)
+        degree = self.degree()
+        connected = degree > 0
+        if connected.any():
+            # uint64 sums wrap, which keeps the fingerprint order-independent
+            digests[connected] = np.add.reduceat(edge_hashes, self.offsets[:-1][connected])
+        return digests.view(np.int64)
+
+    def _sample_sources(self, samples: Optional[int], seed: int) -> np.ndarray:
+        samples = samples or settings.network_centrality_samples
+        if samples >= self.node_count:
+            return np.arange(self.node_count)
+        return np.random.default_rng(seed).choice(self.node_count, size=samples, replace=False)
+
+    def betweenness(self, samples: Optional[int] = None, seed: int = 0) -> np.ndarray:
+        """Hop-based betweenness (Brandes), normalized; estimated from ``samples`` BFS sources on larger graphs."""
+        count = self.node_count
+        centrality = np.zeros(count)
+        if count <= 2:
+            return centrality
+        sources = self._sample_sources(samples, seed)
+        for source in sources:
+            distances = np.full(count, -1, dtype=np.int64)
+            sigma = np.zeros(count)
+            distances[source] = 0
+            sigma[source] = 1.0
+            frontier = np.asarray([source], dtype=np.int64)
+            levels = []
+            depth = 0
+            # Every level touches only its own edges and nodes; the per-source buffers are the only O(V) work
+            while frontier.size:
+                parents, neighbours = self._expand(frontier)
+                distances[neighbours[distances[neighbours] < 0]] = depth + 1
+                on_path = distances[neighbours] == depth + 1
+                parents, neighbours = parents[on_path], neighbours[on_path]
+                frontier, inverse = np.unique(neighbours, return_inverse=True)
+                sigma[frontier] += np.bincount(inverse, weights=sigma[parents])
+                levels.append((parents, neighbours))
+                depth += 1
+
+            delta = np.zeros(count)
+            for parents, neighbours in reversed(levels):
+                origins, inverse = np.unique(parents, return_inverse=True)
+                delta[origins] += np.bincount(
+                    inverse, weights=sigma[parents] / sigma[neighbours] * (1.0 + delta[neighbours])
+                )
+            delta[source] = 0.0
+            centrality += delta
+        # Each undirected pair is counted from both ends
+        return centrality * (count / len(sources)) / ((count - 1) * (count - 2))
+
+    def closeness(self, samples: Optional[int] = None, seed: int = 0) -> np.ndarray:
+        """Hop-based closeness with the Wasserman-Faust correction for disconnected graphs.
+
+        Exact when every node is a BFS source; otherwise distances to a
+        random sample of pivots estimate each node's mean distance.
+        """
+        count = self.node_count
+        if count <= 1:
+            return np.zeros(count)
+        sources = self._sample_sources(samples, seed)
+        totals = np.zeros(count)
+        reached = np.zeros(count)
+        for source in sources:
+            distances = self.bfs_distances(source)
+            reachable = distances > 0
+            totals[reachable] += distances[reachable]
+            reached[reachable] += 1
+        is_source = np.zeros(count)
+        is_source[sources] = 1.0
+        fraction = reached / np.maximum(len(sources) - is_source, 1.0)
+        return np.divide(fraction * reached, totals, out=np.zeros(count), where=totals > 0)
+
+
+class _SnapshotBuilder:
+    """Collects streamed node and edge records for one network."""
+
+    def __init__(self, stored_metrics: bool = False):
+        self.stored_metrics = stored_metrics
+        self.started = time.perf_counter()
+        self.positions: Dict[str, int] = {}
+        self.names: List[Optional[str]] = []
+        self.latitudes: List[Optional[float]] = []
+        self.longitudes: List[Optional[float]] = []
+        self.pageranks: List[Optional[float]] = []
+        self.communities: List[Optional[int]] = []
+        self.digests: List[Optional[int]] = []
+        self.sources: List[int] = []
+        self.targets: List[int] = []
+        self.weights: List[float] = []
+
+    @property
+    def nodes_query(self) -> str:
+        return METRIC_NODES_QUERY if self.stored_metrics else NODES_QUERY
+
+    def add_node(self, row: Dict[str, Any]) -> int:
+        """Add a node record; returns the number of nodes read so far."""
+        self.positions[row["id"]] = len(self.names)
+        self.names.append(row["name"])
+        self.latitudes.append(row["latitude"] if isinstance(row["latitude"], (int, float)) else None)
+        self.longitudes.append(row["longitude"] if isinstance(row["longitude"], (int, float)) else None)
+        if self.stored_metrics:
+            self.pageranks.append(row["pagerank"] if isinstance(row["pagerank"], (int, float)) else None)
+            self.communities.append(row["community"] if isinstance(row["community"], int) else None)
+            self.digests.append(row["metrics_digest"] if isinstance(row["metrics_digest"], int) else None)
+        return len(self.names)
+
+    def add_edge(self, row: Dict[str, Any]):
+        source = self.positions.get(row["source"])
+        target = self.positions.get(row["target"])
+        if source is None or target is None:
+            return
+        self.sources.append(source)
+        self.targets.append(target)
+        weight = row["weight"]
+        self.weights.append(float(weight) if isinstance(weight, (int, float)) and not isinstance(weight, bool) else 1.0)
+
+    def build(self, network_id: Optional[str]) -> GraphSnapshot:
+        snapshot = GraphSnapshot.from_edges(
+            self.names,
+            np.asarray(self.latitudes, dtype=np.float64),
+            np.asarray(self.longitudes, dtype=np.float64),
+            self.sources,
+            self.targets,
+            self.weights,
+            element_ids=list(self.positions),
+        )
+        if self.stored_metrics:
+            snapshot.stored_metrics = {
+                "pagerank": np.asarray(self.pageranks, dtype=np.float64),
+                "community": self.communities,
+                "metrics_digest": self.digests,
+            }
+        logger.info(
+            f"Loaded graph snapshot {network_id!r}: {snapshot.node_count} nodes, "
+            f"{snapshot.edge_count} edges in {time.perf_counter() - self.started:.2f}s"
+        )
+        return snapshot
+
+
+def _edge_parameters(network_id: Optional[str]) -> Dict[str, Any]:
+    return {"network_id": network_id, "weight_property": settings.network_weight_property}
+
+
+def _note_fingerprint(network_id: Optional[str], snapshot: GraphSnapshot):
+    """Bump the network dataset version when a load finds the graph changed since the last load.
+
+    The graph is written outside this service, so a reload is where a change
+    shows up. The last fingerprint is shared in Redis, so the first process
+    to see the change retires every process's snapshots and cached results,
+    and the reloads that follow do not bump again.
+    """
+    fingerprint = snapshot.fingerprint()
+    cache = CacheService()
+    try:
+        previous = cache.redis_client.set(f"network_fingerprint:{network_id!r}", fingerprint, get=True)
+    except Exception as e:
+        logger.error(f"Error recording graph fingerprint for network {network_id!r}: {e}")
+        return
+    if previous is not None and int(previous) != fingerprint:
+        logger.info(f"Graph {network_id!r} changed since its last load, retiring cached network results")
+        cache.bump_dataset_version("network")
+
+
+def _finish_snapshot(builder: _SnapshotBuilder, network_id: Optional[str]) -> GraphSnapshot:
+    snapshot = builder.build(network_id)
+    _note_fingerprint(network_id, snapshot)
+    return snapshot
+
+
+def load_snapshot(
+    network_id: Optional[str],
+    neo4j: Optional[Neo4jConnection] = None,
+    stored_metrics: bool = False,
+    progress: Optional[Callable[[str, int], None]] = None,
+) -> GraphSnapshot:
+    """Stream one network's nodes and relationships from Neo4j into a GraphSnapshot.
+
+    Records arrive in ``neo4j_fetch_size`` pages over one cursor per query;
+    ``progress(step, rows_read)`` is called after each page.
+    """
+    neo4j = neo4j or Neo4jConnection()
+    page = settings.neo4j_fetch_size
+    builder = _SnapshotBuilder(stored_metrics)
+    for row in neo4j.stream(builder.nodes_query, {"network_id": network_id}):
+        nodes = builder.add_node(row)
+        if progress and nodes % page == 0:
+            progress("nodes", nodes)
+    for read, row in enumerate(neo4j.stream(EDGES_QUERY, _edge_parameters(network_id)), 1):
+        if progress and read % page == 0:
+            progress("edges", read)
+        builder.add_edge(row)
+    return _finish_snapshot(builder, network_id)
+
+
+async def load_snapshot_async(network_id: Optional[str], neo4j: Optional[AsyncNeo4jConnection] = None) -> GraphSnapshot:
+    """load_snapshot over the asyncio driver; the CSR arrays are built in the thread pool."""
+    neo4j = neo4j or AsyncNeo4jConnection()
+    builder = _SnapshotBuilder()
+    async for row in neo4j.stream(builder.nodes_query, {"network_id": network_id}):
+        builder.add_node(row)
+    async for row in neo4j.stream(EDGES_QUERY, _edge_parameters(network_id)):
+        builder.add_edge(row)
+    return await run_sync(_finish_snapshot, builder, network_id)
+
+
+class GraphSnapshotCache:
+    """Per-process LRU of graph snapshots keyed by network_id and the network dataset version.
+
+    Entries expire after ``network_snapshot_ttl`` seconds, and bumping the
+    ``network`` dataset version retires them at once. Concurrent misses for
+    the same network load it once.
+    """
+
+    def __init__(self):
+        self._entries: "OrderedDict[Tuple[Optional[str], int], GraphSnapshot]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_locks: Dict[Tuple[Optional[str], int], threading.Lock] = {}
+        self._async_loads: Dict[Tuple[Optional[str], int], "asyncio.Future[GraphSnapshot]"] = {}
+
+    def _lookup(self, key: Tuple[Optional[str], int]) -> Optional[GraphSnapshot]:
+        with self._lock:
+            snapshot = self._entries.get(key)
+            if snapshot is None:
+                return None
+            if time.monotonic() - snapshot.loaded_at > settings.network_snapshot_ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return snapshot
+
+    def get(self, network_id: Optional[str]) -> GraphSnapshot:
+        key = (network_id, CacheService().get_dataset_version("network"))
+        snapshot = self._lookup(key)
+        if snapshot is not None:
+            return snapshot
+
+        with self._lock:
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+        with load_lock:
+            snapshot = self._lookup(key)
+            if snapshot is None:
+                snapshot = load_snapshot(network_id)
+                # Re-read: the load bumps the version when it finds the graph changed
+                self._store((network_id, CacheService().get_dataset_version("network")), snapshot)
+        with self._lock:
+            self._load_locks.pop(key, None)
+        return snapshot
+
+    async def get_async(self, network_id: Optional[str]) -> GraphSnapshot:
+        """``get`` for the event loop: loads over the asyncio driver, concurrent misses share one load."""
+        key = (network_id, await run_sync(CacheService().get_dataset_version, "network"))
+        snapshot = self._lookup(key)
+        if snapshot is not None:
+            return snapshot
+
+        load = self._async_loads.get(key)
+        if load is None:
+            load = asyncio.ensure_future(self._load_async(key))
+            self._async_loads[key] = load
+        # Shielded so a cancelled request does not cancel the load other requests wait on
+        return await asyncio.shield(load)
+
+    async def _load_async(self, key: Tuple[Optional[str], int]) -> GraphSnapshot:
+        try:
+            snapshot = await load_snapshot_async(key[0])
+            # Re-read: the load bumps the version when it finds the graph changed
+            self._store((key[0], await run_sync(CacheService().get_dataset_version, "network")), snapshot)
+            return snapshot
+        finally:
+            self._async_loads.pop(key, None)
+
+    def _store(self, key: Tuple[Optional[str], int], snapshot: GraphSnapshot):
+        network_id = key[0]
+        with self._lock:
+            self._entries[key] = snapshot
+            # Older versions of this network are unreachable now
+            for stale in [entry for entry in self._entries if entry[0] == network_id and entry != key]:
+                del self._entries[stale]
+            while len(self._entries) > settings.network_snapshot_max_graphs:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+graph_snapshots = GraphSnapshotCache()
@@ -0,0 +1,239 @@
+from typing import Any, Dict, Iterable, Optional, Tuple
+import numpy as np
+from app.services.geo import KM_PER_DEGREE, haversine_km
+
+# Row index is shifted into the high 32 bits of a cell key
+_ROW_SHIFT = np.int64(1 << 32)
+
+
+class HotspotDetector:
+    """Grid-bucketed density clustering over streamed coordinate chunks.
+
+    Points are bucketed into cells roughly ``radius_km`` on a side (the column
+    width of each latitude row is widened by 1/cos(lat) so cells stay close to
+    square). A cell holding at least ``min_points`` points is dense, which is
+    the grid analogue of a DBSCAN core point. Dense cells that touch and whose
+    centroids lie within ``2 * radius_km`` (haversine) of each other are joined
+    into one hotspot.
+
+    Only per-cell counts and coordinate sums are kept, so memory grows with the
+    number of occupied cells rather than the number of points.
+    """
+
+    def __init__(self, radius_km: float = 1.0, min_points: int = 10, compact_every: int = 2_000_000):
+        if radius_km <= 0:
+            raise ValueError("radius_km must be positive")
+        self.radius_km = radius_km
+        self.min_points = max(1, int(min_points))
+        self.cell_deg = radius_km / KM_PER_DEGREE
+        self.compact_every = compact_every
+        self.points_scanned = 0
+        self._buffer = []
+        self._buffered_cells = 0
+        self._keys = np.empty(0, dtype=np.int64)
+        self._counts = np.empty(0, dtype=np.int64)
+        self._sum_lat = np.empty(0, dtype=np.float64)
+        self._sum_lon = np.empty(0, dtype=np.float64)
+
+    def _rows(self, lats: np.ndarray) -> np.ndarray:
+        return np.floor((lats + 90.0) / self.cell_deg).astype(np.int64)
+
+    def _col_width(self, rows: np.ndarray) -> np.ndarray:
+        row_lat = (rows + 0.5) * self.cell_deg - 90.0
+        return self.cell_deg / np.maximum(np.cos(np.radians(row_lat)), 1e-3)
+
+    def _cols(self, rows: np.ndarray, lons: np.ndarray) -> np.ndarray:
+        return np.floor((lons + 180.0) / self._col_width(rows)).astype(np.int64)
+
+    def add(self, lats: np.ndarray, lons: np.ndarray):
+        """Accumulate one chunk of coordinates."""
+        lats = np.asarray(lats, dtype=np.float64)
+        lons = np.asarray(lons, dtype=np.float64)
+        if len(lats) == 0:
+            return
+        rows = self._rows(lats)
+        keys = rows * _ROW_SHIFT + self._cols(rows, lons)
+
+        unique_keys, inverse = np.unique(keys, return_inverse=True)
+        self.add_cells(
+            unique_keys,
+            np.bincount(inverse),
+            np.bincount(inverse, weights=lats),
+            np.bincount(inverse, weights=lons),
+        )
+        self.points_scanned += len(lats)
+
+    def add_aggregates(self, counts: np.ndarray, sum_lat: np.ndarray, sum_lon: np.ndarray):
+        """Accumulate pre-aggregated groups of points (e.g. tile rollups) by their centroids.
+
+        Exact when each group is much smaller than a detector cell.
+        """
+        counts = np.asarray(counts, dtype=np.int64)
+        if len(counts) == 0:
+            return
+        rows = self._rows(sum_lat / counts)
+        keys = rows * _ROW_SHIFT + self._cols(rows, sum_lon / counts)
+        self.add_cells(keys, counts, np.asarray(sum_lat, dtype=np.float64), np.asarray(sum_lon, dtype=np.float64))
+        self.points_scanned += int(counts.sum())
+
+    def add_cells(self, keys: np.ndarray, counts: np.ndarray, sum_lat: np.ndarray, sum_lon: np.ndarray):
+        """Accumulate pre-aggregated cell counts and coordinate sums."""
+        self._buffer.append((keys, counts, sum_lat, sum_lon))
+        self._buffered_cells += len(keys)
+        if self._buffered_cells >= self.compact_every:
+            self._compact()
+
+    def merge(self, other: "HotspotDetector") -> "HotspotDetector":
+        """Fold another detector's cells (e.g. from a parallel chunk) into this one."""
+        other._compact()
+        self.add_cells(other._keys, other._counts, other._sum_lat, other._sum_lon)
+        self.points_scanned += other.points_scanned
+        return self
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON-serializable state, for passing partial results between workers."""
+        self._compact()
+        return {
+            "radius_km": self.radius_km,
+            "min_points": self.min_points,
+            "points_scanned": self.points_scanned,
+            "keys": self._keys.tolist(),
+            "counts": self._counts.tolist(),
+            "sum_lat": self._sum_lat.tolist(),
+            "sum_lon": self._sum_lon.tolist(),
+        }
+
+    @classmethod
+    def from_dict(cls, state: Dict[str, Any]) -> "HotspotDetector":
+        detector = cls(radius_km=state["radius_km"], min_points=state["min_points"])
+        detector.points_scanned = state["points_scanned"]
+        detector._keys = np.asarray(state["keys"], dtype=np.int64)
+        detector._counts = np.asarray(state["counts"], dtype=np.int64)
+        detector._sum_lat = np.asarray(state["sum_lat"], dtype=np.float64)
+        detector._sum_lon = np.asarray(state["sum_lon"], dtype=np.float64)
+        return detector
+
+    def _compact(self):
+        if not self._buffer:
+            return
+        keys, counts, sum_lat, sum_lon = (
+            np.concatenate([self._keys] + [part[0] for part in self._buffer]),
+            np.concatenate([self._counts] + [part[1] for part in self._buffer]),
+            np.concatenate([self._sum_lat] + [part[2] for part in self._buffer]),
+            np.concatenate([self._sum_lon] + [part[3] for part in self._buffer]),
+        )
+        self._keys, inverse = np.unique(keys, return_inverse=True)
+        self._counts = np.bincount(inverse, weights=counts).astype(np.int64)
+        self._sum_lat = np.bincount(inverse, weights=sum_lat)
+        self._sum_lon = np.bincount(inverse, weights=sum_lon)
+        self._buffer = []
+        self._buffered_cells = 0
+
+    def _neighbour_pairs(self, keys: np.ndarray, lats: np.ndarray, lons: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Index pairs (i, j) of touching dense cells, found by sorted-key lookup."""
+        rows = keys // _ROW_SHIFT
+        sources, targets = [], []
+        for d_row in (-1, 0, 1):
+            neighbour_rows = rows + d_row
+            # Column widths differ per row, so project each centroid into the neighbour row
+            base_cols = self._cols(neighbour_rows, lons)
+            for d_col in (-1, 0, 1):
+                if d_row == 0 and d_col == 0:
+                    continue
+                candidates = neighbour_rows * _ROW_SHIFT + base_cols + d_col
+                positions = np.minimum(np.searchsorted(keys, candidates), len(keys) - 1)
+                found = keys[positions] == candidates
+                sources.append(np.nonzero(found)[0])
+                targets.append(positions[found])
+
+        sources = np.concatenate(sources)
+        targets = np.concatenate(targets)
+        close = haversine_km(lats[sources], lons[sources], lats[targets], lons[targets]) <= 2.0 * self.radius_km
+        return sources[close], targets[close]
+
+    @staticmethod
+    def _connected_components(n: int, sources: np.ndarray, targets: np.ndarray) -> np.ndarray:
+        """Label connected components by vectorized min-label propagation."""
+        labels = np.arange(n, dtype=np.int64)
+        if len(sources) == 0:
+            return labels
+        while True:
+            previous = labels
+            labels = labels.copy()
+            np.minimum.at(labels, sources, previous[targets])
+            np.minimum.at(labels, targets, previous[sources])
+            # Pointer jumping shortens long chains
+            labels = labels[labels]
+            if np.array_equal(labels, previous):
+                return labels
+
+    def result(self, max_hotspots: Optional[int] = None) -> Dict[str, Any]:
+        """Cluster the dense cells and return hotspots ordered by member count."""
+        self._compact()
+        occupied = len(self._keys)
+        cell_area_km2 = self.radius_km ** 2
+        summary = {
+            "points_scanned": self.points_scanned,
+            "occupied_cells": occupied,
+            # Points in sparse cells, the grid analogue of DBSCAN noise
+            "noise_points": int(self._counts[self._counts < self.min_points].sum()),
+            "min_points": self.min_points,
+            "radius_km": self.radius_km,
+        }
+
+        dense = self._counts >= self.min_points
+        if not dense.any():
+            return {"hotspots": [], "total_hotspots": 0, **summary}
+
+        keys = self._keys[dense]
+        counts = self._counts[dense]
+        sum_lat = self._sum_lat[dense]
+        sum_lon = self._sum_lon[dense]
+        cell_lats = sum_lat / counts
+        cell_lons = sum_lon / counts
+
+        sources, targets = self._neighbour_pairs(keys, cell_lats, cell_lons)
+        labels = self._connected_components(len(keys), sources, targets)
+        clusters, members = np.unique(labels, return_inverse=True)
+
+        member_counts = np.bincount(members, weights=counts)
+        cluster_cells = np.bincount(members)
+        centroid_lats = np.bincount(members, weights=sum_lat) / member_counts
+        centroid_lons = np.bincount(members, weights=sum_lon) / member_counts
+
+        spread = haversine_km(centroid_lats[members], centroid_lons[members], cell_lats, cell_lons)
+        extents = np.zeros(len(clusters))
+        np.maximum.at(extents, members, spread)
+
+        densities = member_counts / (cluster_cells * cell_area_km2)
+        mean_density = self._counts.sum() / (occupied * cell_area_km2)
+        order = np.argsort(-member_counts, kind="stable")
+        if max_hotspots:
+            order = order[:max_hotspots]
+
+        hotspots = [
+            {
+                "id": f"hotspot_{rank}",
+                "center": (round(float(centroid_lats[i]), 6), round(float(centroid_lons[i]), 6)),
+                "radius_km": round(float(extents[i]) + self.radius_km / 2.0, 4),
+                "point_count": int(member_counts[i]),
+                "cell_count": int(cluster_cells[i]),
+                "density": round(float(densities[i]), 4),
+                "density_score": round(float(densities[i] / mean_density), 4),
+            }
+            for rank, i in enumerate(order)
+        ]
+        return {"hotspots": hotspots, "total_hotspots": len(clusters), **summary}
+
+
+def detect_hotspots_in_chunks(
+    chunks: Iterable[Tuple[np.ndarray, np.ndarray]],
+    radius_km: float = 1.0,
+    min_points: int = 10,
+    max_hotspots: Optional[int] = None,
+) -> Dict[str, Any]:
+    """Run the detector over an iterable of (lats, lons) chunks."""
+    detector = HotspotDetector(radius_km=radius_km, min_points=min_points)
+    for lats, lons in chunks:
+        detector.add(lats, lons)
+    return detector.result(max_hotspots=max_hotspots)
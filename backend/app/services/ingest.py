@@ -0,0 +1,405 @@
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+import csv
+import json
+import logging
+import re
+import time
+from pydantic import ValidationError
+from sqlalchemy.orm import Session
+from app.core.concurrency import run_sync
+from app.core.config import settings
+from app.crud import spatial
+from app.schemas.spatial import (
+    SpatialDataCreate,
+    BulkIngestRowError,
+    BulkIngestBatchReport,
+    BulkIngestResult,
+)
+
+logger = logging.getLogger(__name__)
+
+SUPPORTED_FORMATS = ("ndjson", "csv", "geojson")
+
+CONTENT_TYPE_FORMATS = {
+    "application/x-ndjson": "ndjson",
+    "application/ndjson": "ndjson",
+    "application/jsonl": "ndjson",
+    "text/csv": "csv",
+    "application/geo+json": "geojson",
+    "application/json": "geojson",
+}
+
+_FEATURES_RE = re.compile(r'"features"\s*:\s*\[')
+_SKIP_RE = re.compile(r"[\s,]*")
+
+
+def detect_format(content_type: Optional[str]) -> Optional[str]:
+    """Map a request Content-Type header to an ingest format."""
+    if not content_type:
+        return None
+    media_type = content_type.split(";", 1)[0].strip().lower()
+    return CONTENT_TYPE_FORMATS.get(media_type)
+
+
+def feature_to_record(feature: Dict[str, Any]) -> Dict[str, Any]:
+    """Flatten a GeoJSON Point feature into a SpatialDataCreate payload."""
+    if feature.get("type") != "Feature":
+        return feature
+
+    geometry = feature.get("geometry") or {}
+    if geometry.get("type") != "Point":
+        raise ValueError(f"Unsupported geometry type: {geometry.get('type')}")
+
+    coordinates = geometry.get("coordinates") or []
+    if len(coordinates) < 2:
+        raise ValueError("Point geometry requires [longitude, latitude]")
+
+    properties = dict(feature.get("properties") or {})
+    name = properties.pop("name", None)
+    if name is None:
+        name = feature.get("id")
+
+    return {
+        "name": name,
+        "longitude": coordinates[0],
+        "latitude": coordinates[1],
+        "properties": properties,
+    }
+
+
+def _decode_line(line: bytes) -> Tuple[Optional[str], Optional[str]]:
+    if len(line) > settings.ingest_max_record_bytes:
+        return None, f"Line exceeds {settings.ingest_max_record_bytes} bytes"
+    try:
+        return line.decode("utf-8").rstrip("\r"), None
+    except UnicodeDecodeError as e:
+        return None, f"Invalid UTF-8 at byte {e.start} of the line"
+
+
+async def iter_lines(stream: AsyncIterator[bytes]) -> AsyncIterator[Tuple[Optional[str], Optional[str]]]:
+    """Split a byte stream into (line, error) pairs without buffering the whole body.
+
+    At most ``ingest_max_record_bytes`` of one line are held: a longer line
+    is reported once and skipped up to the next newline. A line that is not
+    valid UTF-8 is reported instead of decoded.
+    """
+    pending = bytearray()
+    skipping = False
+    async for chunk in stream:
+        start = 0
+        # Only the new chunk is scanned, so a long line costs linear time
+        end = chunk.find(b"\n")
+        while end >= 0:
+            if skipping:
+                skipping = False
+            else:
+                pending += chunk[start:end]
+                yield _decode_line(pending)
+            pending = bytearray()
+            start = end + 1
+            end = chunk.find(b"\n", start)
+        if skipping:
+            continue
+        pending += chunk[start:]
+        if len(pending) > settings.ingest_max_record_bytes:
+            yield None, f"Line exceeds {settings.ingest_max_record_bytes} bytes"
+            pending = bytearray()
+            skipping = True
+    if pending:
+        yield _decode_line(pending)
+
+
+async def iter_ndjson_records(stream: AsyncIterator[bytes]) -> AsyncIterator[Tuple[Any, Optional[str]]]:
+    """Yield (record, error) pairs from newline-delimited JSON."""
+    async for line, error in iter_lines(stream):
+        if error is not None:
+            yield None, error
+            continue
+        if not line.strip():
+            continue
+        try:
+            yield feature_to_record(json.loads(line)), None
+        except (ValueError, TypeError) as e:
+            yield None, str(e)
+
+
+async def _iter_csv_rows(stream: AsyncIterator[bytes]) -> AsyncIterator[Tuple[Optional[List[str]], Optional[str]]]:
+    """Yield (values, error) per CSV record, joining lines until a quoted field is closed."""
+    lines: List[str] = []
+    size = 0
+    quotes = 0
+    async for line, error in iter_lines(stream):
+        if error is not None:
+            # The record the line belonged to is lost; resume with the next line
+            yield None, error
+            lines, size, quotes = [], 0, 0
+            continue
+        if not lines and not line.strip():
+            continue
+        lines.append(line)
+        size += len(line) + 1
+        # Escaped quotes come in pairs, so an odd count means a field is still open
+        quotes += line.count('"')
+        if quotes % 2:
+            if size > settings.ingest_max_record_bytes:
+                yield None, f"Record exceeds {settings.ingest_max_record_bytes} bytes, unterminated quoted field?"
+                lines, size, quotes = [], 0, 0
+            continue
+        yield next(csv.reader([f"{line}\n" for line in lines])), None
+        lines, size, quotes = [], 0, 0
+    if lines:
+        yield None, "Unterminated quoted field at end of input"
+
+
+async def iter_csv_records(stream: AsyncIterator[bytes]) -> AsyncIterator[Tuple[Any, Optional[str]]]:
+    """Yield (record, error) pairs from CSV with a header row.
+
+    Columns ``name``, ``latitude`` and ``longitude`` are required. A
+    ``properties`` column is parsed as JSON; any other column is stored as a
+    property value.
+    """
+    header: Optional[List[str]] = None
+    async for values, error in _iter_csv_rows(stream):
+        if error is not None:
+            yield None, error
+            continue
+        if header is None:
+            header = [column.strip() for column in values]
+            continue
+        if len(values) != len(header):
+            yield None, f"Expected {len(header)} columns, got {len(values)}"
+            continue
+
+        row = dict(zip(header, values))
+        try:
+            properties = json.loads(row.pop("properties") or "{}") if "properties" in row else {}
+        except ValueError as e:
+            yield None, f"Invalid properties JSON: {e}"
+            continue
+        record = {
+            "name": row.pop("name", None),
+            "latitude": row.pop("latitude", None),
+            "longitude": row.pop("longitude", None),
+        }
+        properties.update(row)
+        record["properties"] = properties
+        yield record, None
+
+
+# A decode error this close to the end of the buffer may just be a truncated
+# token (``tr`` of ``true``, ``1.`` of ``1.5``), so it waits for more data
+_INCOMPLETE_MARGIN = 16
+
+
+def _value_end(text: str, start: int) -> Optional[int]:
+    """End of the (possibly malformed) array element at ``start``, by bracket depth outside strings.
+
+    Returns the index just past the element, or None when the buffer ends first.
+    """
+    depth = 0
+    in_string = escaped = False
+    for index in range(start, len(text)):
+        char = text[index]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in "{[":
+            depth += 1
+        elif char in "}]":
+            if depth == 0:
+                return index
+            depth -= 1
+            if depth == 0:
+                return index + 1
+        elif char == "," and depth == 0:
+            return index
+    return None
+
+
+class _FeatureCollectionParser:
+    """Incrementally extract features from a streamed GeoJSON FeatureCollection."""
+
+    def __init__(self):
+        self._decoder = json.JSONDecoder()
+        self._buffer = ""
+        self._in_features = False
+        self.done = False
+
+    def feed(self, text: str) -> List[Tuple[Any, Optional[str]]]:
+        """Return (feature, error) pairs for the elements completed by ``text``."""
+        if self.done:
+            return []
+        self._buffer += text
+        features: List[Tuple[Any, Optional[str]]] = []
+
+        if not self._in_features:
+            match = _FEATURES_RE.search(self._buffer)
+            if not match:
+                # Keep a short tail so a key split across chunks is still found
+                self._buffer = self._buffer[-64:]
+                return features
+            self._buffer = self._buffer[match.end():]
+            self._in_features = True
+
+        position = 0
+        while True:
+            position = _SKIP_RE.match(self._buffer, position).end()
+            if position >= len(self._buffer):
+                break
+            if self._buffer[position] == "]":
+                self.done = True
+                position = len(self._buffer)
+                break
+            try:
+                feature, position_end = self._decoder.raw_decode(self._buffer, position)
+            except json.JSONDecodeError as e:
+                if e.msg.startswith("Unterminated string") or e.pos >= len(self._buffer) - _INCOMPLETE_MARGIN:
+                    # Incomplete feature, wait for more data
+                    break
+                # Malformed feature: report it and resume after it
+                position_end = _value_end(self._buffer, position)
+                if position_end is None:
+                    break
+                features.append((None, f"Invalid feature JSON: {e.msg}"))
+                position = max(position_end, position + 1)
+                continue
+            features.append((feature, None))
+            position = position_end
+
+        self._buffer = self._buffer[position:]
+        if len(self._buffer) > settings.ingest_max_record_bytes:
+            features.append((None, f"Feature exceeds {settings.ingest_max_record_bytes} bytes, the rest of the upload is skipped"))
+            self._buffer = ""
+            self.done = True
+        return features
+
+
+async def iter_geojson_records(stream: AsyncIterator[bytes]) -> AsyncIterator[Tuple[Any, Optional[str]]]:
+    """Yield (record, error) pairs from a GeoJSON FeatureCollection."""
+    parser = _FeatureCollectionParser()
+    pending = b""
+    async for chunk in stream:
+        pending += chunk
+        try:
+            text = pending.decode("utf-8")
+            pending = b""
+        except UnicodeDecodeError as e:
+            if e.reason == "unexpected end of data":
+                # Multi-byte character split across chunks
+                text = pending[:e.start].decode("utf-8")
+                pending = pending[e.start:]
+            else:
+                # Invalid bytes; held back they would stall the stream forever
+                text = pending.decode("utf-8", errors="replace")
+                pending = b""
+        for feature, error in parser.feed(text):
+            if error is not None:
+                yield None, error
+                continue
+            try:
+                yield feature_to_record(feature), None
+            except (ValueError, TypeError, AttributeError) as e:
+                yield None, str(e)
+
+    if not parser.done:
+        yield None, "Unexpected end of FeatureCollection"
+
+
+RECORD_READERS = {
+    "ndjson": iter_ndjson_records,
+    "csv": iter_csv_records,
+    "geojson": iter_geojson_records,
+}
+
+
+class BulkIngestor:
+    """Validate streamed records in batches and load them with COPY."""
+
+    def __init__(self, db: Session, chunk_size: Optional[int] = None):
+        self.db = db
+        self.chunk_size = chunk_size or settings.ingest_chunk_size
+        self.max_errors = settings.ingest_max_errors_per_batch
+        self.logger = logger
+
+    async def ingest(self, stream: AsyncIterator[bytes], fmt: str) -> BulkIngestResult:
+        """Consume the stream, writing one batch at a time."""
+        if fmt not in RECORD_READERS:
+            raise ValueError(f"Unsupported ingest format: {fmt}")
+
+        started = time.perf_counter()
+        batches: List[BulkIngestBatchReport] = []
+        pending: List[Tuple[int, Any, Optional[str]]] = []
+        index = 0
+
+        async for record, error in RECORD_READERS[fmt](stream):
+            pending.append((index, record, error))
+            index += 1
+            if len(pending) >= self.chunk_size:
+                batches.append(await run_sync(self._write_batch, len(batches), pending))
+                pending = []
+
+        if pending:
+            batches.append(await run_sync(self._write_batch, len(batches), pending))
+
+        elapsed = time.perf_counter() - started
+        inserted = sum(batch.inserted for batch in batches)
+        return BulkIngestResult(
+            format=fmt,
+            chunk_size=self.chunk_size,
+            received=index,
+            inserted=inserted,
+            rejected=sum(batch.rejected for batch in batches),
+            elapsed_seconds=round(elapsed, 4),
+            rows_per_second=round(inserted / elapsed, 2) if elapsed > 0 else 0.0,
+            batches=batches,
+        )
+
+    def _write_batch(self, batch_number: int, records: List[Tuple[int, Any, Optional[str]]]) -> BulkIngestBatchReport:
+        """Validate one batch against SpatialDataCreate and insert the valid rows."""
+        started = time.perf_counter()
+        valid: List[SpatialDataCreate] = []
+        errors: List[BulkIngestRowError] = []
+        rejected = 0
+
+        for index, record, error in records:
+            if error is None:
+                try:
+                    valid.append(SpatialDataCreate.model_validate(record))
+                    continue
+                except ValidationError as e:
+                    error = "; ".join(
+                        f"{'.'.join(str(part) for part in item['loc'])}: {item['msg']}"
+                        for item in e.errors()
+                    )
+            rejected += 1
+            if len(errors) < self.max_errors:
+                errors.append(BulkIngestRowError(index=index, error=error))
+
+        inserted = 0
+        if valid:
+            try:
+                inserted = spatial.bulk_create_spatial_data(self.db, valid)
+            except Exception as e:
+                self.db.rollback()
+                self.logger.error(f"Error writing ingest batch {batch_number}: {e}")
+                rejected += len(valid)
+                if len(errors) < self.max_errors:
+                    errors.append(BulkIngestRowError(index=records[0][0], error=f"Batch write failed: {e}"))
+
+        elapsed = time.perf_counter() - started
+        return BulkIngestBatchReport(
+            batch=batch_number,
+            received=len(records),
+            inserted=inserted,
+            rejected=rejected,
+            elapsed_seconds=round(elapsed, 4),
+            rows_per_second=round(inserted / elapsed, 2) if elapsed > 0 else 0.0,
+            errors=errors,
+            errors_truncated=rejected > len(errors),
+        )
@@ -0,0 +1,123 @@
+from typing import Any, Dict, List, Optional, Tuple
+import json
+import struct
+
+# Minimal Mapbox Vector Tile (v2.1) writer for point layers. Only the protobuf
+# wire format pieces the spec needs are implemented, so no protobuf runtime or
+# generated code is required.
+
+_WIRE_VARINT = 0
+_WIRE_FIXED64 = 1
+_WIRE_BYTES = 2
+
+_GEOM_POINT = 1
+_CMD_MOVE_TO = 1
+
+
+def _varint(value: int) -> bytes:
+    out = bytearray()
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+
+def _tag(field: int, wire_type: int) -> bytes:
+    return _varint((field << 3) | wire_type)
+
+
+def _bytes_field(field: int, payload: bytes) -> bytes:
+    return _tag(field, _WIRE_BYTES) + _varint(len(payload)) + payload
+
+
+def _zigzag(value: int) -> int:
+    return (value << 1) ^ (value >> 63)
+
+
+def _packed(values: List[int]) -> bytes:
+    return b"".join(_varint(value) for value in values)
+
+
+def _encode_value(value: Any) -> bytes:
+    # Tile.Value: string=1, double=3, uint=5, sint=6, bool=7
+    if isinstance(value, bool):
+        return _tag(7, _WIRE_VARINT) + _varint(int(value))
+    if isinstance(value, int) and -(1 << 63) <= value < (1 << 64):
+        if value >= 0:
+            return _tag(5, _WIRE_VARINT) + _varint(value)
+        return _tag(6, _WIRE_VARINT) + _varint(_zigzag(value))
+    if isinstance(value, float):
+        return _tag(3, _WIRE_FIXED64) + struct.pack("<d", value)
+    if not isinstance(value, str):
+        value = json.dumps(value, separators=(",", ":"), default=str)
+    return _tag(1, _WIRE_BYTES) + _varint(len(value.encode())) + value.encode()
+
+
+class MvtLayer:
+    """One vector tile layer of point features with shared key/value tables."""
+
+    def __init__(self, name: str, extent: int = 4096):
+        self.name = name
+        self.extent = extent
+        self._keys: Dict[str, int] = {}
+        self._values: Dict[Tuple[type, Any], int] = {}
+        self._value_payloads: List[bytes] = []
+        self._features: List[bytes] = []
+
+    def __len__(self) -> int:
+        return len(self._features)
+
+    def _key_index(self, key: str) -> int:
+        index = self._keys.get(key)
+        if index is None:
+            index = self._keys[key] = len(self._keys)
+        return index
+
+    def _value_index(self, value: Any) -> int:
+        if not isinstance(value, (str, bool, int, float)):
+            value = json.dumps(value, separators=(",", ":"), default=str)
+        # Type is part of the identity so True, 1 and 1.0 stay distinct
+        identity = (type(value), value)
+        index = self._values.get(identity)
+        if index is None:
+            index = self._values[identity] = len(self._value_payloads)
+            self._value_payloads.append(_encode_value(value))
+        return index
+
+    def add_point(self, x: int, y: int, properties: Optional[Dict[str, Any]] = None, feature_id: Optional[int] = None):
+        """Add a point in tile coordinates (0..extent, y down)."""
+        tags: List[int] = []
+        for key, value in (properties or {}).items():
+            if value is None:
+                continue
+            tags.append(self._key_index(str(key)))
+            tags.append(self._value_index(value))
+
+        feature = bytearray()
+        if feature_id is not None and feature_id >= 0:
+            feature += _tag(1, _WIRE_VARINT) + _varint(feature_id)
+        if tags:
+            feature += _bytes_field(2, _packed(tags))
+        feature += _tag(3, _WIRE_VARINT) + _varint(_GEOM_POINT)
+        feature += _bytes_field(4, _packed([(1 << 3) | _CMD_MOVE_TO, _zigzag(x), _zigzag(y)]))
+        self._features.append(bytes(feature))
+
+    def encode(self) -> bytes:
+        """Serialized Tile.Layer message."""
+        layer = bytearray()
+        layer += _tag(15, _WIRE_VARINT) + _varint(2)
+        layer += _bytes_field(1, self.name.encode())
+        for feature in self._features:
+            layer += _bytes_field(2, feature)
+        for key in self._keys:
+            layer += _bytes_field(3, key.encode())
+        for value in self._value_payloads:
+            layer += _bytes_field(4, value)
+        layer += _tag(5, _WIRE_VARINT) + _varint(self.extent)
+        return bytes(layer)
+
+
+def encode_tile(layers: List[MvtLayer]) -> bytes:
+    """Serialized Tile message; empty layers are omitted."""
+    return b"".join(_bytes_field(3, layer.encode()) for layer in layers if len(layer))
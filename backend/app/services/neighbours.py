@@ -0,0 +1,301 @@
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import logging
+import threading
+import time
+import numpy as np
+from app.core.config import settings
+from app.crud import spatial
+from app.db.session import SessionLocal
+from app.services.cache import SPATIAL_DATASET_TAG, CacheService
+from app.services.geo import chord_to_km, km_to_chord, unit_vectors
+from app.services.spatial_index import refresh_spatial_index, spatial_index
+
+logger = logging.getLogger(__name__)
+
+# Candidate (query, point) pairs measured per block in a ball search
+_PAIR_BLOCK = 1 << 20
+
+
+def _expand_ranges(starts: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+    """Concatenate the index ranges [start, start + length) into one array."""
+    total = int(lengths.sum())
+    if total == 0:
+        return np.empty(0, dtype=np.int64)
+    offsets = np.repeat(starts - np.concatenate(([0], np.cumsum(lengths)[:-1])), lengths)
+    return np.arange(total, dtype=np.int64) + offsets
+
+
+class KDTree:
+    """Static k-d tree over points on the unit sphere.
+
+    Coordinates are stored as 3D unit vectors, where straight-line (chord)
+    distance orders points exactly like haversine distance, so plain
+    Euclidean bounding-box pruning gives exact great-circle results with no
+    special cases at the poles or the antimeridian. Nodes split at the median
+    of their widest axis and points are permuted so every node covers one
+    contiguous slice.
+
+    Queries are batched: the traversal advances every (query, node) pair one
+    level at a time with array operations instead of a loop per query.
+    """
+
+    def __init__(self, ids: np.ndarray, lats: np.ndarray, lons: np.ndarray, leaf_size: Optional[int] = None):
+        self.leaf_size = max(1, leaf_size or settings.neighbour_leaf_size)
+        ids = np.asarray(ids, dtype=np.int64)
+        lats = np.asarray(lats, dtype=np.float64)
+        lons = np.asarray(lons, dtype=np.float64)
+        points = unit_vectors(lats, lons)
+        perm = np.arange(len(ids))
+
+        starts, ends = [0], [len(ids)]
+        lefts, rights, axes, splits = [-1], [-1], [0], [0.0]
+        lo, hi = [], []
+        node = 0
+        while len(ids) and node < len(starts):
+            start, end = starts[node], ends[node]
+            block = points[perm[start:end]]
+            lo.append(block.min(axis=0))
+            hi.append(block.max(axis=0))
+            if end - start > self.leaf_size:
+                axis = int(np.argmax(hi[node] - lo[node]))
+                mid = (end - start) // 2
+                perm[start:end] = perm[start:end][np.argpartition(block[:, axis], mid)]
+                axes[node] = axis
+                splits[node] = float(points[perm[start + mid], axis])
+                lefts[node] = len(starts)
+                rights[node] = len(starts) + 1
+                for child_start, child_end in ((start, start + mid), (start + mid, end)):
+                    starts.append(child_start)
+                    ends.append(child_end)
+                    lefts.append(-1)
+                    rights.append(-1)
+                    axes.append(0)
+                    splits.append(0.0)
+            node += 1
+
+        self.ids = ids[perm]
+        self.lats = lats[perm]
+        self.lons = lons[perm]
+        self.points = points[perm]
+        self.start = np.asarray(starts, dtype=np.int64)
+        self.count = np.asarray(ends, dtype=np.int64) - self.start
+        self.left = np.asarray(lefts, dtype=np.int64)
+        self.right = np.asarray(rights, dtype=np.int64)
+        self.axis = np.asarray(axes, dtype=np.int64)
+        self.split = np.asarray(splits, dtype=np.float64)
+        self.lo = np.asarray(lo, dtype=np.float64).reshape(-1, 3)
+        self.hi = np.asarray(hi, dtype=np.float64).reshape(-1, 3)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _ball_pairs(
+        self, query: np.ndarray, radius2: np.ndarray, limit: Optional[int] = None
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(query index, point index, squared chord) of the points within each query's radius.
+
+        With ``limit`` only each query's nearest ``limit`` points are kept,
+        trimmed after every block, so held pairs stay bounded by the number
+        of queries times ``limit``.
+        """
+        queries = np.arange(len(query))
+        nodes = np.zeros(len(query), dtype=np.int64)
+        leaf_queries, leaf_nodes = [], []
+        while len(queries):
+            position = query[queries]
+            gap = np.maximum(self.lo[nodes] - position, 0.0) + np.maximum(position - self.hi[nodes], 0.0)
+            reachable = np.einsum("ij,ij->i", gap, gap) <= radius2[queries]
+            queries, nodes = queries[reachable], nodes[reachable]
+            leaf = self.left[nodes] < 0
+            leaf_queries.append(queries[leaf])
+            leaf_nodes.append(nodes[leaf])
+            inner = nodes[~leaf]
+            queries = np.repeat(queries[~leaf], 2)
+            nodes = np.column_stack((self.left[inner], self.right[inner])).ravel()
+
+        queries = np.concatenate(leaf_queries)
+        nodes = np.concatenate(leaf_nodes)
+        lengths = self.count[nodes]
+        # Measure candidates in blocks of leaves so large radii over dense areas stay bounded in memory
+        cumulative = np.cumsum(lengths)
+        found_queries, found_points, found_distance2 = [], [], []
+        block_start = 0
+        while block_start < len(nodes):
+            measured = int(cumulative[block_start - 1]) if block_start else 0
+            block_end = max(block_start + 1, int(np.searchsorted(cumulative, measured + _PAIR_BLOCK, side="right")))
+            block = slice(block_start, block_end)
+            pair_queries = np.repeat(queries[block], lengths[block])
+            pair_points = _expand_ranges(self.start[nodes[block]], lengths[block])
+            delta = self.points[pair_points] - query[pair_queries]
+            distance2 = np.einsum("ij,ij->i", delta, delta)
+            within = distance2 <= radius2[pair_queries]
+            found_queries.append(pair_queries[within])
+            found_points.append(pair_points[within])
+            found_distance2.append(distance2[within])
+            if limit is not None and len(found_queries) > 1:
+                found_queries, found_points, found_distance2 = (
+                    [np.concatenate(found)] for found in (found_queries, found_points, found_distance2)
+                )
+                if np.bincount(found_queries[0]).max() > limit:
+                    order, _ = self._group(found_queries[0], found_distance2[0], len(query), limit)
+                    found_queries, found_points, found_distance2 = (
+                        [found[0][order]] for found in (found_queries, found_points, found_distance2)
+                    )
+            block_start = block_end
+        if not found_queries:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0)
+        return np.concatenate(found_queries), np.concatenate(found_points), np.concatenate(found_distance2)
+
+    def _descend(self, query: np.ndarray, k: int) -> np.ndarray:
+        """Deepest node on each query's root-to-leaf path that still holds ``k`` points."""
+        rows = np.arange(len(query))
+        nodes = np.zeros(len(query), dtype=np.int64)
+        while True:
+            inner = self.left[nodes] >= 0
+            go_left = query[rows, self.axis[nodes]] < self.split[nodes]
+            child = np.where(go_left, self.left[nodes], self.right[nodes])
+            descend = inner & (self.count[child] >= k)
+            if not descend.any():
+                return nodes
+            nodes = np.where(descend, child, nodes)
+
+    @staticmethod
+    def _group(queries: np.ndarray, distance2: np.ndarray, n_queries: int, limit: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Order pairs by query then distance, keeping at most ``limit`` per query.
+
+        Returns the pair order and the number of kept pairs per query.
+        """
+        order = np.lexsort((distance2, queries))
+        counts = np.bincount(queries, minlength=n_queries)
+        group_start = np.repeat(np.cumsum(counts) - counts, counts)
+        keep = np.arange(len(order)) - group_start < limit
+        return order[keep], np.minimum(counts, limit)
+
+    def _results(self, queries, points, distance2, n_queries: int, limit: int) -> List[Dict[str, Any]]:
+        order, counts = self._group(queries, distance2, n_queries, limit)
+        points = points[order]
+        distances = np.round(chord_to_km(np.sqrt(distance2[order])), 6).tolist()
+        ids = self.ids[points].tolist()
+        lats = self.lats[points].tolist()
+        lons = self.lons[points].tolist()
+        results, offset = [], 0
+        for count in counts.tolist():
+            results.append([
+                {"id": ids[i], "latitude": lats[i], "longitude": lons[i], "distance_km": distances[i]}
+                for i in range(offset, offset + count)
+            ])
+            offset += count
+        return results
+
+    def query_radius(self, lats: Sequence[float], lons: Sequence[float], radius_km: float, limit: int) -> List[List[Dict[str, Any]]]:
+        """Points within ``radius_km`` of each query point, nearest first, at most ``limit`` each."""
+        query = unit_vectors(lats, lons)
+        if len(self) == 0:
+            return [[] for _ in range(len(query))]
+        radius2 = np.full(len(query), float(km_to_chord(radius_km)) ** 2)
+        queries, points, distance2 = self._ball_pairs(query, radius2, limit)
+        return self._results(queries, points, distance2, len(query), limit)
+
+    def query_nearest(self, lats: Sequence[float], lons: Sequence[float], k: int) -> List[List[Dict[str, Any]]]:
+        """The ``k`` nearest points to each query point, nearest first.
+
+        Each query's k-th nearest point within the node found by ``_descend``
+        bounds its search radius, then the ball search collects the exact set.
+        """
+        query = unit_vectors(lats, lons)
+        if len(self) == 0:
+            return [[] for _ in range(len(query))]
+        k = min(k, len(self))
+        nodes = self._descend(query, k)
+        lengths = self.count[nodes]
+        queries = np.repeat(np.arange(len(query)), lengths)
+        points = _expand_ranges(self.start[nodes], lengths)
+        delta = self.points[points] - query[queries]
+        distance2 = np.einsum("ij,ij->i", delta, delta)
+
+        order = np.lexsort((distance2, queries))
+        kth = distance2[order][np.cumsum(lengths) - lengths + k - 1]
+        # Widen slightly so the k-th point itself survives rounding
+        queries, points, distance2 = self._ball_pairs(query, kth * (1.0 + 1e-9) + 1e-18, k)
+        return self._results(queries, points, distance2, len(query), k)
+
+
+class NeighbourIndex:
+    """Per-process k-d tree over spatial_data for nearest and radius queries.
+
+    Built from the in-memory grid index when it is warm, otherwise from the
+    database. The tree is rebuilt when the spatial_data dataset version moves,
+    but at most once per ``neighbour_tree_min_age`` seconds so a steady write
+    stream does not rebuild it on every query; ``neighbour_tree_ttl`` bounds
+    its age regardless.
+    """
+
+    def __init__(self):
+        self._tree: Optional[KDTree] = None
+        self._version: Optional[int] = None
+        self._built_at = 0.0
+        self._lock = threading.Lock()
+
+    def _fresh(self, version: int) -> bool:
+        if self._tree is None:
+            return False
+        age = time.monotonic() - self._built_at
+        if age > settings.neighbour_tree_ttl:
+            return False
+        return version == self._version or age < settings.neighbour_tree_min_age
+
+    def _build(self, version: int):
+        started = time.perf_counter()
+        if spatial_index.warm:
+            refresh_spatial_index()
+            ids, lats, lons = spatial_index.snapshot()
+        else:
+            db = SessionLocal()
+            try:
+                chunks = list(spatial.iter_spatial_coordinates(db, chunk_size=settings.spatial_index_load_chunk_size))
+            finally:
+                db.close()
+            ids, lats, lons = (
+                (np.concatenate(parts) for parts in zip(*chunks)) if chunks
+                else (np.empty(0), np.empty(0), np.empty(0))
+            )
+        self._tree = KDTree(ids, lats, lons)
+        self._version = version
+        self._built_at = time.monotonic()
+        logger.info(f"Built neighbour tree over {len(self._tree)} points in {time.perf_counter() - started:.2f}s")
+
+    def get(self) -> KDTree:
+        version = CacheService().get_dataset_version(SPATIAL_DATASET_TAG)
+        if not self._fresh(version):
+            with self._lock:
+                if not self._fresh(version):
+                    self._build(version)
+        return self._tree
+
+    def _chunked(self, lats: Sequence[float], lons: Sequence[float], query) -> List[List[Dict[str, Any]]]:
+        # Bounds the (query, point) pair arrays of dense areas
+        size = settings.neighbour_query_chunk_size
+        results = []
+        for start in range(0, len(lats), size):
+            results.extend(query(lats[start:start + size], lons[start:start + size]))
+        return results
+
+    def nearest(self, lats: Sequence[float], lons: Sequence[float], k: int) -> List[List[Dict[str, Any]]]:
+        tree = self.get()
+        return self._chunked(lats, lons, lambda la, lo: tree.query_nearest(la, lo, k))
+
+    def within_radius(
+        self, lats: Sequence[float], lons: Sequence[float], radius_km: float, limit: int
+    ) -> List[List[Dict[str, Any]]]:
+        tree = self.get()
+        return self._chunked(lats, lons, lambda la, lo: tree.query_radius(la, lo, radius_km, limit))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "points": len(self._tree) if self._tree is not None else 0,
+            "version": self._version,
+            "age_seconds": round(time.monotonic() - self._built_at, 3) if self._tree is not None else None,
+        }
+
+
+neighbour_index = NeighbourIndex()
@@ -1,30 +1,194 @@
-from typing import List, Dict, Any
-from app.db.neo4j import Neo4jConnection
+from concurrent.futures.process import BrokenProcessPool
+from typing import AsyncIterator, List, Dict, Any, Optional
+import asyncio
+import logging
+import numpy as np
+from app.core.concurrency import get_process_pool, run_sync, shutdown_process_pool
+from app.core.config import settings
+from app.services.cache import read_through
+from app.services.graph_engine import GraphSnapshot, graph_snapshots
+
+logger = logging.getLogger(__name__)
+
+CENTRALITY_METRICS = ("degree", "pagerank", "betweenness", "closeness")
+
+# Results never outlive the snapshot they were computed from by more than one reload
+NETWORK_RESULT_TTL = settings.network_snapshot_ttl
+
+
+def _shortest_path(
+    snapshot: GraphSnapshot, start_node: str, end_node: str, network_id: Optional[str], algorithm: str
+) -> Dict[str, Any]:
+    result = {"start": start_node, "end": end_node, "network_id": network_id}
+    source = snapshot.node_index.get(start_node)
+    target = snapshot.node_index.get(end_node)
+    if source is None or target is None:
+        return {**result, "path": [], "hops": None, "cost": None, "algorithm": None}
+
+    path, cost, used = snapshot.shortest_path(source, target, algorithm)
+    return {
+        **result,
+        "path": [snapshot.names[node] for node in path] if path else [],
+        "hops": len(path) - 1 if path else None,
+        "cost": cost,
+        "algorithm": used,
+    }
+
+
+def _centrality(snapshot: GraphSnapshot, network_id: str, limit: int, sort_by: str) -> Dict[str, Any]:
+    metrics = {
+        "degree": snapshot.degree(),
+        "pagerank": snapshot.pagerank(),
+        "betweenness": snapshot.betweenness(),
+        "closeness": snapshot.closeness(),
+    }
+    order = np.argsort(-metrics[sort_by], kind="stable")[:limit]
+    scores = [
+        {
+            "node": snapshot.names[node],
+            "degree": int(metrics["degree"][node]),
+            "pagerank": float(metrics["pagerank"][node]),
+            "betweenness": float(metrics["betweenness"][node]),
+            "closeness": float(metrics["closeness"][node]),
+        }
+        for node in order.tolist()
+    ]
+    return {
+        "centrality_scores": scores,
+        "network_id": network_id,
+        "node_count": snapshot.node_count,
+        "edge_count": snapshot.edge_count,
+        "sort_by": sort_by,
+    }
+
+
+def _path_error(start_node: str, end_node: str, network_id: Optional[str], e: Exception) -> Dict[str, Any]:
+    logger.error(f"Error finding path {start_node} -> {end_node} in network {network_id}: {e}")
+    return {"error": str(e)}
+
+
+def _centrality_error(network_id: str, e: Exception) -> Dict[str, Any]:
+    logger.error(f"Error calculating centrality for network {network_id}: {e}")
+    return {"error": str(e)}
+
+
+def _matrix_rows(snapshot: GraphSnapshot, sources: List[str], targets: List[str]) -> List[Dict[str, Any]]:
+    target_index = np.asarray([snapshot.node_index.get(target, -1) for target in targets], dtype=np.int64)
+    known = target_index >= 0
+    rows = []
+    for name in sources:
+        source = snapshot.node_index.get(name)
+        if source is None:
+            rows.append({"source": name, "distances": None, "error": "unknown node"})
+            continue
+        costs = np.full(len(targets), np.inf)
+        costs[known] = snapshot.distances_from(source, target_index[known])
+        rows.append({"source": name, "distances": np.where(np.isfinite(costs), costs, None).tolist()})
+    return rows
+
+
+def distance_matrix_rows(network_id: Optional[str], sources: List[str], targets: List[str]) -> List[Dict[str, Any]]:
+    """One row of path costs per source, aligned with ``targets`` (None where unreachable or unknown).
+
+    Module-level so process pool workers can run it; each worker keeps its
+    own snapshot cache, so a network is loaded once per worker.
+    """
+    return _matrix_rows(graph_snapshots.get(network_id), sources, targets)
+
+
+def _source_chunks(sources: List[str]) -> List[List[str]]:
+    size = settings.network_matrix_chunk_size
+    return [sources[start:start + size] for start in range(0, len(sources), size)]
+
 
 class NetworkAnalysisService:
-    def __init__(self):
-        self.neo4j = Neo4jConnection()
-    
-    def find_shortest_path(self, start_node: str, end_node: str) -> Dict[str, Any]:
+    """Path and centrality queries answered from cached in-memory graph snapshots."""
+
+    @read_through("network:shortest_path", ttl=NETWORK_RESULT_TTL, stale_ttl=NETWORK_RESULT_TTL, dataset="network")
+    def find_shortest_path(
+        self, start_node: str, end_node: str, network_id: Optional[str] = None, algorithm: str = "auto"
+    ) -> Dict[str, Any]:
         """Find shortest path between two nodes."""
-        query = """
-        MATCH (start:Node {name: $start_node}), (end:Node {name: $end_node})
-        MATCH path = shortestPath((start)-[*]-(end))
-        RETURN path
-        """
-        result = self.neo4j.query(query, {"start_node": start_node, "end_node": end_node})
-        return {"path": result, "start": start_node, "end": end_node}
-    
-    def calculate_centrality(self, network_id: str) -> Dict[str, Any]:
+        try:
+            return _shortest_path(graph_snapshots.get(network_id), start_node, end_node, network_id, algorithm)
+        except Exception as e:
+            return _path_error(start_node, end_node, network_id, e)
+
+    @read_through("network:centrality", ttl=NETWORK_RESULT_TTL, stale_ttl=NETWORK_RESULT_TTL, dataset="network")
+    def calculate_centrality(self, network_id: str, limit: int = 100, sort_by: str = "degree") -> Dict[str, Any]:
         """Calculate centrality metrics for a network."""
-        query = """
-        MATCH (n:Node)
-        RETURN n.name as node, size((n)--()) as degree
-        ORDER BY degree DESC
+        try:
+            return _centrality(graph_snapshots.get(network_id), network_id, limit, sort_by)
+        except Exception as e:
+            return _centrality_error(network_id, e)
+
+    def distance_matrix(
+        self, sources: List[str], targets: List[str], network_id: Optional[str] = None, progress=None
+    ) -> Dict[str, Any]:
+        """Full origin-destination matrix; ``progress(done, total)`` is called after each chunk of sources."""
+        rows = []
+        for chunk in _source_chunks(sources):
+            rows.extend(distance_matrix_rows(network_id, chunk, targets))
+            if progress:
+                progress(len(rows), len(sources))
+        return {"network_id": network_id, "targets": targets, "rows": rows}
+
+
+class AsyncNetworkAnalysisService:
+    """NetworkAnalysisService for API handlers, sharing its cache entries.
+
+    Snapshots are loaded over the asyncio Neo4j driver; only the CPU-bound
+    graph algorithms run in the thread pool.
+    """
+
+    @read_through("network:shortest_path", ttl=NETWORK_RESULT_TTL, stale_ttl=NETWORK_RESULT_TTL, dataset="network")
+    async def find_shortest_path(
+        self, start_node: str, end_node: str, network_id: Optional[str] = None, algorithm: str = "auto"
+    ) -> Dict[str, Any]:
+        """Find shortest path between two nodes."""
+        try:
+            snapshot = await graph_snapshots.get_async(network_id)
+            return await run_sync(_shortest_path, snapshot, start_node, end_node, network_id, algorithm)
+        except Exception as e:
+            return _path_error(start_node, end_node, network_id, e)
+
+    @read_through("network:centrality", ttl=NETWORK_RESULT_TTL, stale_ttl=NETWORK_RESULT_TTL, dataset="network")
+    async def calculate_centrality(self, network_id: str, limit: int = 100, sort_by: str = "degree") -> Dict[str, Any]:
+        """Calculate centrality metrics for a network."""
+        try:
+            snapshot = await graph_snapshots.get_async(network_id)
+            return await run_sync(_centrality, snapshot, network_id, limit, sort_by)
+        except Exception as e:
+            return _centrality_error(network_id, e)
+
+    async def stream_distance_matrix(
+        self, sources: List[str], targets: List[str], network_id: Optional[str] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Matrix rows in completion order.
+
+        Chunks of sources fan out over the process pool; small matrices use
+        the thread pool instead to skip worker start-up and snapshot loading.
         """
-        result = self.neo4j.query(query)
-        return {"centrality_scores": result, "network_id": network_id}
-    
-    def __del__(self):
-        if hasattr(self, 'neo4j'):
-            self.neo4j.close() 
\ No newline at end of file
+        chunks = _source_chunks(sources)
+        if len(sources) < settings.network_matrix_pool_min_sources:
+            snapshot = await graph_snapshots.get_async(network_id)
+            for chunk in chunks:
+                for row in await run_sync(_matrix_rows, snapshot, chunk, targets):
+                    yield row
+            return
+
+        loop = asyncio.get_running_loop()
+        pool = get_process_pool()
+        pending = [loop.run_in_executor(pool, distance_matrix_rows, network_id, chunk, targets) for chunk in chunks]
+        try:
+            for finished in asyncio.as_completed(pending):
+                for row in await finished:
+                    yield row
+        except BrokenProcessPool:
+            # A worker died (e.g. OOM); start a fresh pool on the next request
+            shutdown_process_pool()
+            raise
+        finally:
+            # Client went away or a chunk failed: drop work that has not started
+            for future in pending:
+                future.cancel()
@@ -0,0 +1,170 @@
+from typing import Any, Callable, Dict, List, Optional
+import logging
+import time
+import numpy as np
+from app.core.config import settings
+from app.db.neo4j import Neo4jConnection
+from app.services.cache import CacheService
+from app.services.graph_engine import GraphSnapshot, load_snapshot
+
+logger = logging.getLogger(__name__)
+
+COUNT_NODES_QUERY = """
+MATCH (n:Node)
+WHERE $network_id IS NULL OR n.network_id = $network_id
+RETURN count(n) AS count
+"""
+
+COUNT_EDGES_QUERY = """
+MATCH (a:Node)-[r]->(b:Node)
+WHERE $network_id IS NULL OR (a.network_id = $network_id AND b.network_id = $network_id)
+RETURN count(r) AS count
+"""
+
+# metrics_digest fingerprints each node's neighbourhood so the next run can tell what changed
+WRITE_METRICS_QUERY = """
+UNWIND $rows AS row
+MATCH (n:Node) WHERE elementId(n) = row.id
+SET n.degree = row.degree,
+    n.pagerank = row.pagerank,
+    n.community = row.community,
+    n.metrics_digest = row.digest,
+    n.metrics_updated_at = datetime()
+"""
+
+TOP_RESULTS = 10
+
+
+def _previous_labels(communities: List[Optional[int]]) -> np.ndarray:
+    labels = np.asarray([-1 if community is None else community for community in communities], dtype=np.int64)
+    missing = labels < 0
+    # Nodes without a stored community start in their own
+    labels[missing] = labels.max(initial=-1) + 1 + np.arange(int(missing.sum()))
+    return labels
+
+
+def _changed_nodes(snapshot: GraphSnapshot, digests: np.ndarray) -> np.ndarray:
+    stored = snapshot.stored_metrics
+    previous = np.asarray([0 if digest is None else digest for digest in stored["metrics_digest"]], dtype=np.int64)
+    never_scored = np.asarray([digest is None for digest in stored["metrics_digest"]], dtype=bool)
+    never_scored |= ~np.isfinite(stored["pagerank"])
+    never_scored |= np.asarray([community is None for community in stored["community"]], dtype=bool)
+    return never_scored | (previous != digests)
+
+
+def _write_metrics(
+    neo4j: Neo4jConnection,
+    snapshot: GraphSnapshot,
+    nodes: np.ndarray,
+    degree: np.ndarray,
+    pagerank: np.ndarray,
+    communities: np.ndarray,
+    digests: np.ndarray,
+    progress: Callable[[int, str], None],
+) -> int:
+    batch_size = settings.network_metrics_write_batch_size
+    total = len(nodes)
+    for start in range(0, total, batch_size):
+        batch = nodes[start:start + batch_size]
+        rows = [
+            {"id": snapshot.element_ids[node], "degree": node_degree, "pagerank": rank, "community": community, "digest": digest}
+            for node, node_degree, rank, community, digest in zip(
+                batch.tolist(),
+                degree[batch].tolist(),
+                pagerank[batch].tolist(),
+                communities[batch].tolist(),
+                digests[batch].tolist(),
+            )
+        ]
+        neo4j.write(WRITE_METRICS_QUERY, {"rows": rows})
+        progress(70 + int(30 * (start + len(batch)) / total), "Writing metrics")
+    return total
+
+
+def calculate_network_metrics(
+    network_id: Optional[str],
+    incremental: bool = True,
+    progress: Optional[Callable[[int, str], None]] = None,
+) -> Dict[str, Any]:
+    """Degree, PageRank and label-propagation communities for a network, written back to its nodes.
+
+    The graph is streamed from Neo4j in pages, the metrics are computed on a
+    CSR snapshot and stored on each node in UNWIND batches. With
+    ``incremental``, nodes whose neighbourhood digest is unchanged since the
+    last run are compared against their stored values: when at most
+    ``network_metrics_incremental_max_change`` of the nodes changed, PageRank
+    and the communities are warm-started from the stored values and only
+    nodes whose metrics moved are rewritten. ``progress(percent, step)``
+    receives progress updates.
+    """
+    started = time.perf_counter()
+    progress = progress or (lambda percent, step: None)
+    neo4j = Neo4jConnection()
+
+    progress(0, "Counting network")
+    node_total = neo4j.query(COUNT_NODES_QUERY, {"network_id": network_id})[0]["count"]
+    edge_total = neo4j.query(COUNT_EDGES_QUERY, {"network_id": network_id})[0]["count"]
+    rows_total = max(node_total + edge_total, 1)
+
+    def loading(step: str, rows: int):
+        done = rows if step == "nodes" else node_total + rows
+        progress(int(50 * min(done, rows_total) / rows_total), f"Loading {step}")
+
+    snapshot = load_snapshot(network_id, neo4j, stored_metrics=True, progress=loading)
+    count = snapshot.node_count
+    result: Dict[str, Any] = {
+        "network_id": network_id,
+        "node_count": count,
+        "edge_count": snapshot.edge_count,
+    }
+    if count == 0:
+        return {**result, "mode": "full", "changed_nodes": 0, "nodes_written": 0,
+                "elapsed_seconds": round(time.perf_counter() - started, 3)}
+
+    digests = snapshot.neighbourhood_digests()
+    changed = _changed_nodes(snapshot, digests)
+    changed_count = int(changed.sum())
+    mode = "full"
+    if incremental and changed_count / count <= settings.network_metrics_incremental_max_change:
+        mode = "unchanged" if changed_count == 0 else "incremental"
+
+    degree = snapshot.degree()
+    if mode == "unchanged":
+        pagerank = snapshot.stored_metrics["pagerank"]
+        communities = _previous_labels(snapshot.stored_metrics["community"])
+        to_write = np.empty(0, dtype=np.int64)
+    else:
+        progress(55, "Calculating PageRank")
+        previous_rank = snapshot.stored_metrics["pagerank"] if mode == "incremental" else None
+        pagerank = snapshot.pagerank(initial=previous_rank)
+
+        progress(60, "Finding communities")
+        if mode == "incremental":
+            previous_labels = _previous_labels(snapshot.stored_metrics["community"])
+            communities = snapshot.label_propagation(initial=previous_labels, renumber=False)
+            moved = np.abs(pagerank - previous_rank) > settings.network_metrics_pagerank_tolerance * previous_rank
+            to_write = np.flatnonzero(changed | moved | (communities != previous_labels))
+        else:
+            communities = snapshot.label_propagation()
+            to_write = np.arange(count)
+
+    written = _write_metrics(neo4j, snapshot, to_write, degree, pagerank, communities, digests, progress)
+    if written:
+        CacheService().bump_dataset_version("network")
+
+    top = np.argsort(-pagerank, kind="stable")[:TOP_RESULTS]
+    community_ids, sizes = np.unique(communities, return_counts=True)
+    largest = np.argsort(-sizes, kind="stable")[:TOP_RESULTS]
+    return {
+        **result,
+        "mode": mode,
+        "changed_nodes": changed_count,
+        "nodes_written": written,
+        "community_count": len(community_ids),
+        "modularity": snapshot.modularity(np.unique(communities, return_inverse=True)[1].ravel()),
+        "top_pagerank": [{"node": snapshot.names[node], "pagerank": float(pagerank[node])} for node in top.tolist()],
+        "largest_communities": [
+            {"community": int(community_ids[index]), "size": int(sizes[index])} for index in largest.tolist()
+        ],
+        "elapsed_seconds": round(time.perf_counter() - started, 3),
+    }
@@ -0,0 +1,238 @@
+from typing import Any, Dict, Iterable, Iterator, Optional
+import itertools
+import numpy as np
+from app.core.config import settings
+from app.services.geo import EARTH_RADIUS_KM, unit_vectors
+
+COORDINATE_DTYPE = np.dtype([("lat", np.float64), ("lon", np.float64)])
+
+# Standard error constant of the Clark-Evans nearest-neighbour statistic
+_CLARK_EVANS_SE = 0.26136
+
+
+def to_coordinate_array(coordinates: Any) -> np.ndarray:
+    """Convert (lat, lon) tuples, an (n, 2) array or a structured array to COORDINATE_DTYPE."""
+    if isinstance(coordinates, np.ndarray) and coordinates.dtype.names:
+        if coordinates.dtype == COORDINATE_DTYPE:
+            return coordinates
+        result = np.empty(len(coordinates), dtype=COORDINATE_DTYPE)
+        result["lat"] = coordinates["lat"]
+        result["lon"] = coordinates["lon"]
+        return result
+
+    values = np.asarray(coordinates, dtype=np.float64)
+    if values.size == 0:
+        return np.empty(0, dtype=COORDINATE_DTYPE)
+    if values.ndim != 2 or values.shape[1] < 2:
+        raise ValueError("Coordinates must be (latitude, longitude) pairs")
+    result = np.empty(len(values), dtype=COORDINATE_DTYPE)
+    result["lat"] = values[:, 0]
+    result["lon"] = values[:, 1]
+    return result
+
+
+def iter_coordinate_file(path: str, chunk_size: int = 1000000, delimiter: str = ",", skip_header: bool = True) -> Iterator[np.ndarray]:
+    """Read a lat,lon text file in fixed-size chunks of COORDINATE_DTYPE records."""
+    with open(path) as handle:
+        if skip_header:
+            next(handle, None)
+        while True:
+            lines = list(itertools.islice(handle, chunk_size))
+            if not lines:
+                return
+            values = np.loadtxt(lines, delimiter=delimiter, usecols=(0, 1), ndmin=2)
+            yield to_coordinate_array(values)
+
+
+def _mean_nearest_neighbour_km(lats: np.ndarray, lons: np.ndarray, ref_lat: float, ref_lon: float, block: int = 1024) -> float:
+    """Mean nearest-neighbour distance on a local equirectangular projection."""
+    x = np.radians(((lons - ref_lon + 180.0) % 360.0) - 180.0) * np.cos(np.radians(ref_lat)) * EARTH_RADIUS_KM
+    y = np.radians(lats - ref_lat) * EARTH_RADIUS_KM
+    nearest = np.empty(len(x))
+    for start in range(0, len(x), block):
+        dx = x[start:start + block, None] - x[None, :]
+        dy = y[start:start + block, None] - y[None, :]
+        distances = dx * dx + dy * dy
+        rows = np.arange(distances.shape[0])
+        distances[rows, rows + start] = np.inf
+        nearest[start:start + block] = distances.min(axis=1)
+    return float(np.sqrt(nearest).mean())
+
+
+class SpatialPatternAccumulator:
+    """Constant-memory spatial pattern statistics fed chunk by chunk.
+
+    Keeps the count, bounding box and the sum of 3D unit vectors (which gives
+    the spherical centroid and standard distance exactly) plus a fixed-size
+    reservoir sample used for the Clark-Evans nearest-neighbour index.
+    """
+
+    def __init__(self, nn_sample_size: Optional[int] = None, seed: Optional[int] = None):
+        self.nn_sample_size = nn_sample_size or settings.pattern_nn_sample_size
+        self._rng = np.random.default_rng(seed)
+        self.count = 0
+        self.min_lat = np.inf
+        self.max_lat = -np.inf
+        self.min_lon = np.inf
+        self.max_lon = -np.inf
+        self.vector_sum = np.zeros(3)
+        self.sample = np.empty(0, dtype=COORDINATE_DTYPE)
+
+    def update(self, coordinates: Any) -> "SpatialPatternAccumulator":
+        """Accumulate one chunk of coordinates."""
+        chunk = to_coordinate_array(coordinates)
+        if len(chunk) == 0:
+            return self
+        lats = chunk["lat"]
+        lons = chunk["lon"]
+
+        self.min_lat = min(self.min_lat, float(lats.min()))
+        self.max_lat = max(self.max_lat, float(lats.max()))
+        self.min_lon = min(self.min_lon, float(lons.min()))
+        self.max_lon = max(self.max_lon, float(lons.max()))
+        self.vector_sum += unit_vectors(lats, lons).sum(axis=0)
+        self._sample(chunk)
+        self.count += len(chunk)
+        return self
+
+    def _sample(self, chunk: np.ndarray):
+        """Vectorized reservoir sampling (Algorithm R) over the chunk."""
+        room = self.nn_sample_size - len(self.sample)
+        if room > 0:
+            self.sample = np.concatenate((self.sample, chunk[:room]))
+        rest = chunk[max(room, 0):]
+        if len(rest) == 0:
+            return
+        positions = self.count + max(room, 0) + np.arange(len(rest))
+        slots = self._rng.integers(0, positions + 1)
+        accepted = slots < self.nn_sample_size
+        self.sample[slots[accepted]] = rest[accepted]
+
+    def merge(self, other: "SpatialPatternAccumulator") -> "SpatialPatternAccumulator":
+        """Fold another accumulator (e.g. from a parallel chunk) into this one."""
+        if other.count == 0:
+            return self
+        if self.count == 0:
+            combined = other.sample
+        else:
+            pool = np.concatenate((self.sample, other.sample))
+            weights = np.concatenate((
+                np.full(len(self.sample), self.count / len(self.sample)),
+                np.full(len(other.sample), other.count / len(other.sample)),
+            ))
+            size = min(self.nn_sample_size, len(pool))
+            combined = pool[self._rng.choice(len(pool), size=size, replace=False, p=weights / weights.sum())]
+
+        self.min_lat = min(self.min_lat, other.min_lat)
+        self.max_lat = max(self.max_lat, other.max_lat)
+        self.min_lon = min(self.min_lon, other.min_lon)
+        self.max_lon = max(self.max_lon, other.max_lon)
+        self.vector_sum += other.vector_sum
+        self.count += other.count
+        self.sample = combined
+        return self
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON-serializable state, for passing partial results between workers."""
+        return {
+            "count": self.count,
+            "bbox": [self.min_lat, self.max_lat, self.min_lon, self.max_lon] if self.count else None,
+            "vector_sum": self.vector_sum.tolist(),
+            "sample": np.column_stack((self.sample["lat"], self.sample["lon"])).tolist(),
+            "nn_sample_size": self.nn_sample_size,
+        }
+
+    @classmethod
+    def from_dict(cls, state: Dict[str, Any]) -> "SpatialPatternAccumulator":
+        accumulator = cls(nn_sample_size=state.get("nn_sample_size"))
+        accumulator.count = state["count"]
+        if state.get("bbox"):
+            accumulator.min_lat, accumulator.max_lat, accumulator.min_lon, accumulator.max_lon = state["bbox"]
+        accumulator.vector_sum = np.asarray(state["vector_sum"], dtype=np.float64)
+        accumulator.sample = to_coordinate_array(state["sample"])
+        return accumulator
+
+    def area_km2(self) -> float:
+        """Spherical area of the bounding box."""
+        if self.count == 0:
+            return 0.0
+        d_lon = np.radians(self.max_lon - self.min_lon)
+        d_sin = np.sin(np.radians(self.max_lat)) - np.sin(np.radians(self.min_lat))
+        return float(EARTH_RADIUS_KM ** 2 * d_lon * d_sin)
+
+    def result(self) -> Dict[str, Any]:
+        """Bounding box, centroid, standard distance, nearest-neighbour index and density."""
+        if self.count == 0:
+            return {"error": "No coordinates provided"}
+
+        mean_vector = self.vector_sum / self.count
+        resultant = float(np.linalg.norm(mean_vector))
+        if resultant > 0:
+            x, y, z = mean_vector / resultant
+            centroid = (float(np.degrees(np.arcsin(z))), float(np.degrees(np.arctan2(y, x))))
+        else:
+            centroid = None
+        # Mean squared chord to the centroid is 2 - 2|mean vector|
+        rms_chord = np.sqrt(max(0.0, 2.0 - 2.0 * resultant))
+        standard_distance_km = float(2.0 * EARTH_RADIUS_KM * np.arcsin(min(1.0, rms_chord / 2.0)))
+
+        area = self.area_km2()
+        result = {
+            "point_count": self.count,
+            "analysis_type": "pattern_detection",
+            "status": "completed",
+            "bounding_box": {
+                "min_lat": self.min_lat,
+                "max_lat": self.max_lat,
+                "min_lon": self.min_lon,
+                "max_lon": self.max_lon,
+            },
+            "centroid": centroid,
+            "standard_distance_km": round(standard_distance_km, 6),
+            "area_km2": round(area, 6),
+            "density": round(self.count / area, 6) if area > 0 else None,
+            "nearest_neighbour": self._nearest_neighbour(area, centroid),
+        }
+        return result
+
+    def _nearest_neighbour(self, area: float, centroid: Optional[tuple]) -> Optional[Dict[str, Any]]:
+        """Clark-Evans index on the reservoir sample (a uniform thinning of the points)."""
+        sample_size = len(self.sample)
+        if sample_size < 2 or area <= 0 or centroid is None:
+            return None
+
+        observed = _mean_nearest_neighbour_km(self.sample["lat"], self.sample["lon"], *centroid)
+        sample_density = sample_size / area
+        expected = 0.5 / np.sqrt(sample_density)
+        standard_error = _CLARK_EVANS_SE / np.sqrt(sample_size * sample_density)
+        index = observed / expected
+        z_score = (observed - expected) / standard_error
+
+        if z_score < -1.96:
+            pattern = "clustered"
+        elif z_score > 1.96:
+            pattern = "dispersed"
+        else:
+            pattern = "random"
+
+        return {
+            "observed_mean_km": round(observed, 6),
+            "expected_mean_km": round(float(expected), 6),
+            "index": round(float(index), 6),
+            "z_score": round(float(z_score), 4),
+            "pattern": pattern,
+            "sample_size": sample_size,
+        }
+
+
+def analyze_coordinates(coordinates: Any, nn_sample_size: Optional[int] = None) -> Dict[str, Any]:
+    """Pattern statistics for an in-memory coordinate set in one vectorized pass."""
+    return SpatialPatternAccumulator(nn_sample_size=nn_sample_size).update(coordinates).result()
+
+
+def analyze_coordinate_stream(chunks: Iterable[Any], nn_sample_size: Optional[int] = None) -> Dict[str, Any]:
+    """Pattern statistics for an iterable of coordinate chunks with constant memory."""
+    accumulator = SpatialPatternAccumulator(nn_sample_size=nn_sample_size)
+    for chunk in chunks:
+        accumulator.update(chunk)
+    return accumulator.result()
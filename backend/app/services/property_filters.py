@@ -0,0 +1,162 @@
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import json
+import logging
+import math
+import re
+from sqlalchemy import and_, cast, func, literal_column, not_, or_, text
+from sqlalchemy.dialects.postgresql import JSONB, JSONPATH
+from app.core.config import settings
+from app.db.session import engine
+from app.models.spatial import SpatialData
+
+logger = logging.getLogger(__name__)
+
+# where=key:op[:value]; nested keys are dotted (address.city)
+FILTER_OPERATORS = ("eq", "in", "gt", "gte", "lt", "lte", "exists", "missing")
+RANGE_OPERATORS = {"gt": "__gt__", "gte": "__ge__", "lt": "__lt__", "lte": "__le__"}
+
+_KEY_SEGMENT = re.compile(r"^[A-Za-z0-9_\-]+$")
+
+
+def _parse_key(key: str) -> List[str]:
+    path = key.split(".")
+    if not all(_KEY_SEGMENT.match(segment) for segment in path):
+        raise ValueError(f"Invalid property key {key!r}: use letters, digits, '_' and '-', dotted for nested keys")
+    return path
+
+
+def _parse_value(raw: str) -> Any:
+    """JSON scalars (5, 2.5, true, null, "5") as themselves, anything else as a plain string."""
+    try:
+        value = json.loads(raw)
+    except ValueError:
+        return raw
+    # NaN, Infinity and overflowing literals such as 1e999; PostgreSQL JSONB has no such numbers
+    if isinstance(value, float) and not math.isfinite(value):
+        raise ValueError(f"Invalid filter value {raw!r}: numbers must be finite")
+    return value if value is None or isinstance(value, (str, int, float, bool)) else raw
+
+
+def parse_property_filters(expressions: Sequence[str]) -> List[Tuple[List[str], str, Any]]:
+    """Parse ``key:op[:value]`` expressions into (path, op, value) terms.
+
+    ``in`` takes comma-separated values, ``exists``/``missing`` take none, and
+    range operators need a number or string. Raises ValueError on anything
+    malformed.
+    """
+    if len(expressions) > settings.property_filter_max_terms:
+        raise ValueError(f"At most {settings.property_filter_max_terms} property filters are allowed")
+    terms = []
+    for expression in expressions:
+        parts = expression.split(":", 2)
+        if len(parts) < 2:
+            raise ValueError(f"Invalid property filter {expression!r}, expected key:op[:value]")
+        path, op = _parse_key(parts[0]), parts[1]
+        if op not in FILTER_OPERATORS:
+            raise ValueError(f"Unknown filter operator {op!r}, expected one of {', '.join(FILTER_OPERATORS)}")
+        if op in ("exists", "missing"):
+            if len(parts) == 3:
+                raise ValueError(f"Filter operator {op!r} takes no value")
+            terms.append((path, op, None))
+            continue
+        if len(parts) < 3:
+            raise ValueError(f"Filter operator {op!r} needs a value")
+
+        if op == "in":
+            values = [_parse_value(value) for value in parts[2].split(",")]
+            if len(values) > settings.property_filter_max_values:
+                raise ValueError(f"At most {settings.property_filter_max_values} values are allowed in an 'in' filter")
+            terms.append((path, op, values))
+            continue
+        value = _parse_value(parts[2])
+        if op in RANGE_OPERATORS and (isinstance(value, bool) or not isinstance(value, (str, int, float))):
+            raise ValueError(f"Filter operator {op!r} needs a number or string value")
+        terms.append((path, op, value))
+    return terms
+
+
+def property_path_sql(path: Sequence[str]) -> str:
+    """SQL for the JSONB value at ``path``, matching the expression indexes on hot keys.
+
+    Keys are inlined rather than bound so the planner can match the index
+    expression; they are restricted to safe characters by the parser.
+    """
+    if len(path) == 1:
+        return f"properties -> '{path[0]}'"
+    return "properties #> '{" + ",".join(path) + "}'"
+
+
+def _containment(path: Sequence[str], value: Any) -> Dict[str, Any]:
+    document = value
+    for key in reversed(path):
+        document = {key: document}
+    return document
+
+
+def _exists(path: Sequence[str]) -> Any:
+    if len(path) == 1:
+        return SpatialData.properties.has_key(path[0])
+    jsonpath = "$" + "".join(f'."{key}"' for key in path)
+    return SpatialData.properties.op("@?")(cast(jsonpath, JSONPATH))
+
+
+def compile_property_filters(terms: Optional[Sequence[Tuple[List[str], str, Any]]]) -> List[Any]:
+    """WHERE clauses for parsed terms, each one servable by an index.
+
+    Equality and ``in`` become JSONB containment (``@>``) and existence becomes
+    ``?`` or a jsonpath ``@?``, all answered by the GIN index on properties.
+    Ranges compare the JSONB value itself, restricted to the value's JSON type
+    so numbers never match strings, which a per-key expression index serves
+    (see ``property_index_keys``).
+    """
+    clauses = []
+    for path, op, value in terms or ():
+        if op == "eq":
+            clauses.append(SpatialData.properties.contains(_containment(path, value)))
+        elif op == "in":
+            clauses.append(or_(*[SpatialData.properties.contains(_containment(path, item)) for item in value]))
+        elif op == "exists":
+            clauses.append(_exists(path))
+        elif op == "missing":
+            clauses.append(or_(SpatialData.properties.is_(None), not_(_exists(path))))
+        else:
+            expression = literal_column(f"spatial_data.{property_path_sql(path)}", JSONB)
+            json_type = "string" if isinstance(value, str) else "number"
+            clauses.append(and_(
+                func.jsonb_typeof(expression) == json_type,
+                getattr(expression, RANGE_OPERATORS[op])(cast(json.dumps(value), JSONB)),
+            ))
+    return clauses
+
+
+def property_index_name(path: Sequence[str]) -> str:
+    return "ix_spatial_data_prop_" + "__".join(path).replace("-", "_")
+
+
+def ensure_property_indexes(keys: Optional[Sequence[str]] = None) -> List[str]:
+    """Create the B-tree expression index of each hot property key that lacks one.
+
+    Keys default to ``property_index_keys``. Indexes are built CONCURRENTLY,
+    so writes continue meanwhile. PostgreSQL only; returns the index names.
+    """
+    if keys is None:
+        keys = [key.strip() for key in settings.property_index_keys.split(",") if key.strip()]
+    if not keys or engine.dialect.name != "postgresql":
+        return []
+
+    created = []
+    try:
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+            for key in keys:
+                try:
+                    path = _parse_key(key)
+                    name = property_index_name(path)
+                    connection.execute(text(
+                        f'CREATE INDEX CONCURRENTLY IF NOT EXISTS "{name}" ON spatial_data (({property_path_sql(path)}))'
+                    ))
+                    created.append(name)
+                except Exception as e:
+                    logger.error(f"Error creating property index for {key}: {e}")
+    except Exception as e:
+        logger.error(f"Error creating property indexes: {e}")
+    return created
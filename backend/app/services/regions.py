@@ -0,0 +1,220 @@
+from typing import Any, Callable, Dict, List, Optional, Sequence
+import logging
+import threading
+import time
+import numpy as np
+import shapely
+from shapely import STRtree
+from shapely.geometry import shape
+from app.core.config import settings
+from app.crud import regions, spatial
+from app.db.session import SessionLocal
+from app.services.cache import CacheService
+
+logger = logging.getLogger(__name__)
+
+# User-facing predicate -> STRtree predicate of the point against the polygon.
+# "intersects" counts points on a boundary, "contains" only interior points.
+REGION_PREDICATES = {"intersects": "intersects", "contains": "within"}
+
+
+def _layer_tag(layer: str) -> str:
+    return f"region_layer:{layer}"
+
+
+def parse_region_features(features: Sequence[Dict[str, Any]], id_property: Optional[str] = None) -> List[Dict[str, Any]]:
+    """GeoJSON Polygon/MultiPolygon features as region rows with WKB geometry.
+
+    The region id is the feature ``id``, or ``properties[id_property]`` when
+    given. Invalid polygons are repaired with ``make_valid``. Raises
+    ValueError for anything that cannot be stored.
+    """
+    rows = []
+    seen = set()
+    for index, feature in enumerate(features):
+        geometry = feature.get("geometry") or {}
+        if geometry.get("type") not in ("Polygon", "MultiPolygon"):
+            raise ValueError(f"Feature {index}: geometry must be a Polygon or MultiPolygon")
+        properties = feature.get("properties") or {}
+        region_id = properties.get(id_property) if id_property else feature.get("id")
+        if region_id is None:
+            raise ValueError(f"Feature {index}: missing region id ({id_property or 'feature id'})")
+        region_id = str(region_id)
+        if region_id in seen:
+            raise ValueError(f"Feature {index}: duplicate region id {region_id!r}")
+        seen.add(region_id)
+        try:
+            polygon = shape(geometry)
+        except Exception as e:
+            raise ValueError(f"Feature {index}: {e}")
+        if not polygon.is_valid:
+            polygon = shapely.make_valid(polygon)
+        rows.append({
+            "region_id": region_id,
+            "name": properties.get("name"),
+            "properties": properties,
+            "geometry": shapely.to_wkb(polygon),
+        })
+    return rows
+
+
+class RegionLayer:
+    """The polygons of one layer behind a Shapely STRtree, joined against point arrays."""
+
+    def __init__(self, region_ids: Sequence[str], geometries: np.ndarray):
+        self.region_ids = np.asarray(region_ids, dtype=object)
+        self.geometries = np.asarray(geometries, dtype=object)
+        shapely.prepare(self.geometries)
+        self.areas = shapely.area(self.geometries)
+        self.tree = STRtree(self.geometries)
+        self.loaded_at = time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self.region_ids)
+
+    def assign(self, lats: Sequence[float], lons: Sequence[float], predicate: str = "intersects") -> np.ndarray:
+        """Index of the region holding each point, -1 for none.
+
+        Where polygons overlap the smallest one wins, which picks the most
+        specific region of nested layers.
+        """
+        points = shapely.points(np.asarray(lons, dtype=np.float64), np.asarray(lats, dtype=np.float64))
+        point_index, region_index = self.tree.query(points, predicate=REGION_PREDICATES[predicate])
+        assigned = np.full(len(points), -1, dtype=np.int64)
+        if len(point_index):
+            order = np.lexsort((self.areas[region_index], point_index))
+            point_index, region_index = point_index[order], region_index[order]
+            first = np.flatnonzero(np.r_[True, point_index[1:] != point_index[:-1]])
+            assigned[point_index[first]] = region_index[first]
+        return assigned
+
+    def lookup(self, lats: Sequence[float], lons: Sequence[float], predicate: str = "intersects") -> List[Optional[str]]:
+        """Region id of each point, None for points outside every polygon."""
+        assigned = self.assign(lats, lons, predicate)
+        return np.where(assigned >= 0, self.region_ids[np.maximum(assigned, 0)], None).tolist()
+
+
+class RegionLayerCache:
+    """Per-process cache of region layers, retired when a layer is replaced or deleted."""
+
+    def __init__(self):
+        self._entries: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def get(self, layer: str) -> Optional[RegionLayer]:
+        """The layer's STRtree, or None when it has no polygons."""
+        version = CacheService().get_dataset_version(_layer_tag(layer))
+        entry = self._entries.get(layer)
+        if entry is not None and entry[0] == version and time.monotonic() - entry[1].loaded_at <= settings.region_layer_cache_ttl:
+            return entry[1]
+
+        with self._lock:
+            db = SessionLocal()
+            try:
+                rows = regions.get_region_layer(db, layer)
+            finally:
+                db.close()
+            if not rows:
+                self._entries.pop(layer, None)
+                return None
+            region_ids, wkbs = zip(*rows)
+            region_layer = RegionLayer(region_ids, shapely.from_wkb(list(wkbs)))
+            self._entries[layer] = (version, region_layer)
+        return region_layer
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+region_layers = RegionLayerCache()
+
+
+def save_region_layer(layer: str, features: Sequence[Dict[str, Any]], id_property: Optional[str] = None) -> Dict[str, Any]:
+    """Replace a layer's polygons; raises ValueError for invalid features."""
+    rows = parse_region_features(features, id_property)
+    db = SessionLocal()
+    try:
+        count = regions.replace_region_layer(db, layer, rows)
+    finally:
+        db.close()
+    CacheService().invalidate_tags([_layer_tag(layer)])
+    return {"layer": layer, "regions": count}
+
+
+def delete_region_layer(layer: str) -> int:
+    db = SessionLocal()
+    try:
+        deleted = regions.delete_region_layer(db, layer)
+    finally:
+        db.close()
+    CacheService().invalidate_tags([_layer_tag(layer)])
+    return deleted
+
+
+def list_region_layers() -> List[Dict[str, Any]]:
+    db = SessionLocal()
+    try:
+        return regions.list_region_layers(db)
+    finally:
+        db.close()
+
+
+def tag_points_with_regions(
+    layer: str,
+    property_key: Optional[str] = None,
+    predicate: str = "intersects",
+    progress: Optional[Callable[[int, int], None]] = None,
+) -> Dict[str, Any]:
+    """Write the region id of every spatial_data point into ``properties[property_key]``.
+
+    Points are joined in id-ordered chunks of ``region_join_chunk_size`` and
+    each chunk is written back with one bulk UPDATE. Points outside every
+    polygon lose the key. ``property_key`` defaults to the layer name.
+    """
+    property_key = property_key or layer
+    db = SessionLocal()
+    try:
+        started = time.perf_counter()
+        region_layer = region_layers.get(layer)
+        if region_layer is None:
+            return {"error": f"Region layer {layer!r} has no polygons"}
+
+        total = max(spatial.estimate_spatial_data_count(db), 1)
+        scanned = tagged = changed = 0
+        region_counts = np.zeros(len(region_layer), dtype=np.int64)
+        cache = CacheService()
+        for ids, lats, lons in spatial.iter_spatial_coordinates(db, chunk_size=settings.region_join_chunk_size):
+            assigned = region_layer.assign(lats, lons, predicate)
+            inside = assigned >= 0
+            region_counts += np.bincount(assigned[inside], minlength=len(region_layer))
+            region_ids = np.where(inside, region_layer.region_ids[np.maximum(assigned, 0)], None).tolist()
+            changed_ids = regions.write_point_regions(db, property_key, ids.tolist(), region_ids)
+            if changed_ids:
+                moved = np.isin(ids, changed_ids)
+                cache.invalidate_spatial_write(changed_ids, zip(lats[moved].tolist(), lons[moved].tolist()))
+            changed += len(changed_ids)
+            scanned += len(ids)
+            tagged += int(inside.sum())
+            if progress:
+                progress(scanned, max(total, scanned))
+
+        order = np.argsort(-region_counts, kind="stable")
+        return {
+            "layer": layer,
+            "property_key": property_key,
+            "predicate": predicate,
+            "points_scanned": scanned,
+            "points_tagged": tagged,
+            "rows_updated": changed,
+            "regions": {
+                region_layer.region_ids[i]: int(region_counts[i])
+                for i in order[:settings.region_join_max_reported].tolist() if region_counts[i]
+            },
+            "processing_time": f"{time.perf_counter() - started:.1f}s",
+        }
+    except Exception as e:
+        logger.error(f"Error tagging points with region layer {layer}: {e}")
+        return {"error": str(e)}
+    finally:
+        db.close()
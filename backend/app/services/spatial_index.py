@@ -0,0 +1,315 @@
+from typing import Any, Dict, Optional
+import logging
+import threading
+import time
+import numpy as np
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.crud import spatial
+from app.db.session import ReadSessionLocal, SessionLocal
+
+logger = logging.getLogger(__name__)
+
+
+class SpatialIndex:
+    """In-process uniform grid index over NumPy coordinate arrays.
+
+    Points are kept sorted by grid cell key (row-major over lat/lon cells), so
+    every grid row of a bounding box maps to one contiguous slice that is found
+    with ``searchsorted``. New points go to a small pending buffer that is
+    merged into the sorted arrays once it grows past the merge threshold.
+
+    The API only ever appends to spatial_data, and refreshes only look for new
+    IDs. Rows moved or deleted by anything else stay at their old position
+    until the next full reload, every ``spatial_index_reload_seconds``.
+    """
+
+    def __init__(
+        self,
+        cell_size: Optional[float] = None,
+        merge_threshold: Optional[int] = None,
+    ):
+        self.cell_size = cell_size or settings.spatial_index_cell_size
+        self.merge_threshold = merge_threshold or settings.spatial_index_merge_threshold
+        self.n_cols = int(np.ceil(360.0 / self.cell_size)) + 1
+        self.logger = logger
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self):
+        self._keys = np.empty(0, dtype=np.int64)
+        self._ids = np.empty(0, dtype=np.int64)
+        self._lats = np.empty(0, dtype=np.float64)
+        self._lons = np.empty(0, dtype=np.float64)
+        self._pending_ids = []
+        self._pending_lats = []
+        self._pending_lons = []
+        self._pending_set = set()
+        self.max_id = 0
+        # Largest ID seen by a database load or refresh; add() can run ahead of it
+        self.refreshed_id = 0
+        self.warm = False
+        self.hits = 0
+        self.misses = 0
+        self.last_refresh = 0.0
+        self.last_load = 0.0
+        self._reloading = False
+
+    def __len__(self) -> int:
+        return len(self._ids) + len(self._pending_ids)
+
+    def _rows(self, lats: np.ndarray) -> np.ndarray:
+        return np.floor((np.asarray(lats) + 90.0) / self.cell_size).astype(np.int64)
+
+    def _cols(self, lons: np.ndarray) -> np.ndarray:
+        return np.floor((np.asarray(lons) + 180.0) / self.cell_size).astype(np.int64)
+
+    def _cell_keys(self, lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+        return self._rows(lats) * self.n_cols + self._cols(lons)
+
+    def build(self, ids: np.ndarray, lats: np.ndarray, lons: np.ndarray):
+        """Replace the index contents with the given coordinate arrays."""
+        ids = np.asarray(ids, dtype=np.int64)
+        lats = np.asarray(lats, dtype=np.float64)
+        lons = np.asarray(lons, dtype=np.float64)
+        keys = self._cell_keys(lats, lons)
+        order = np.argsort(keys, kind="stable")
+
+        with self._lock:
+            self._keys = keys[order]
+            self._ids = ids[order]
+            self._lats = lats[order]
+            self._lons = lons[order]
+            self._pending_ids, self._pending_lats, self._pending_lons = [], [], []
+            self._pending_set = set()
+            self.max_id = int(ids.max()) if len(ids) else 0
+            self.refreshed_id = self.max_id
+            self.warm = True
+
+    def load(self, db: Session, chunk_size: Optional[int] = None):
+        """Load every row of spatial_data into the index."""
+        started = time.perf_counter()
+        chunk_size = chunk_size or settings.spatial_index_load_chunk_size
+        id_chunks, lat_chunks, lon_chunks = [], [], []
+        for ids, lats, lons in spatial.iter_spatial_coordinates(db, chunk_size=chunk_size):
+            id_chunks.append(ids)
+            lat_chunks.append(lats)
+            lon_chunks.append(lons)
+
+        if id_chunks:
+            self.build(np.concatenate(id_chunks), np.concatenate(lat_chunks), np.concatenate(lon_chunks))
+        else:
+            self.build(np.empty(0), np.empty(0), np.empty(0))
+        self.last_refresh = self.last_load = time.monotonic()
+        self.logger.info(
+            f"Spatial index loaded {len(self)} points in {time.perf_counter() - started:.2f}s"
+        )
+
+    def refresh(self, db: Session):
+        """Pull in rows written by other processes since the last load or refresh.
+
+        IDs are allocated before commit, so rows can become visible out of ID
+        order: concurrent bulk batches, or a single create added here ahead of
+        a batch still in flight. A trailing window of
+        ``spatial_index_refresh_window`` IDs below the last refresh is
+        rechecked on every refresh; only its missing rows are fetched.
+        """
+        self.last_refresh = time.monotonic()
+        first_id = max(0, self.refreshed_id - settings.spatial_index_refresh_window)
+        ids = spatial.get_spatial_ids_after(db, first_id)
+        if not len(ids):
+            return
+        missing = np.sort(ids[~self._contains_many(ids)])
+        chunk_size = settings.spatial_index_load_chunk_size
+        for start in range(0, len(missing), chunk_size):
+            chunk = missing[start:start + chunk_size]
+            found_ids, lats, lons = spatial.get_spatial_coordinates_in_range(db, int(chunk[0]), int(chunk[-1]))
+            wanted = np.isin(found_ids, chunk)
+            self.add_many(found_ids[wanted], lats[wanted], lons[wanted])
+        self.refreshed_id = max(self.refreshed_id, int(ids.max()))
+
+    def refresh_due(self) -> bool:
+        """True when the index is warm and the refresh or reload interval has elapsed."""
+        return self.warm and (
+            time.monotonic() - self.last_refresh >= settings.spatial_index_refresh_seconds or self._reload_due()
+        )
+
+    def _reload_due(self) -> bool:
+        return not self._reloading and time.monotonic() - self.last_load >= settings.spatial_index_reload_seconds
+
+    def maybe_refresh(self, db: Session):
+        """Refresh if the refresh interval has elapsed; start a background full reload when that is due."""
+        if not self.warm:
+            return
+        with self._lock:
+            start_reload = self._reload_due()
+            if start_reload:
+                self._reloading = True
+                self.last_load = time.monotonic()
+        if start_reload:
+            # Queries keep using the current arrays until the rebuilt ones are
+            # swapped in; points added meanwhile come back with the next refresh
+            threading.Thread(target=self._reload, daemon=True).start()
+        if time.monotonic() - self.last_refresh >= settings.spatial_index_refresh_seconds:
+            self.refresh(db)
+
+    def _reload(self):
+        db = ReadSessionLocal()
+        try:
+            self.load(db)
+        except Exception as e:
+            self.logger.error(f"Error reloading spatial index: {e}")
+        finally:
+            db.close()
+            self._reloading = False
+
+    def add(self, spatial_id: int, latitude: float, longitude: float):
+        """Add a single newly created point."""
+        self.add_many([spatial_id], [latitude], [longitude])
+
+    def add_many(self, ids, lats, lons):
+        """Add newly created points, merging the pending buffer when it grows too large."""
+        if not self.warm:
+            return
+        ids = np.asarray(ids, dtype=np.int64)
+        lats = np.asarray(lats, dtype=np.float64)
+        lons = np.asarray(lons, dtype=np.float64)
+        with self._lock:
+            if len(ids) and int(ids.min()) <= self.max_id:
+                # Out-of-order IDs may already be indexed, e.g. pulled in by refresh()
+                keep = ~self._contains_many(ids)
+                ids, lats, lons = ids[keep], lats[keep], lons[keep]
+            if not len(ids):
+                return
+            self._pending_ids.extend(ids.tolist())
+            self._pending_set.update(ids.tolist())
+            self._pending_lats.extend(lats.tolist())
+            self._pending_lons.extend(lons.tolist())
+            self.max_id = max(self.max_id, int(ids.max()))
+            if len(self._pending_ids) >= self.merge_threshold:
+                self._merge_pending()
+
+    def _merge_pending(self):
+        pending_ids = np.asarray(self._pending_ids, dtype=np.int64)
+        pending_lats = np.asarray(self._pending_lats, dtype=np.float64)
+        pending_lons = np.asarray(self._pending_lons, dtype=np.float64)
+        pending_keys = self._cell_keys(pending_lats, pending_lons)
+        order = np.argsort(pending_keys, kind="stable")
+        positions = np.searchsorted(self._keys, pending_keys[order], side="right")
+
+        self._keys = np.insert(self._keys, positions, pending_keys[order])
+        self._ids = np.insert(self._ids, positions, pending_ids[order])
+        self._lats = np.insert(self._lats, positions, pending_lats[order])
+        self._lons = np.insert(self._lons, positions, pending_lons[order])
+        self._pending_ids, self._pending_lats, self._pending_lons = [], [], []
+        self._pending_set = set()
+
+    def _contains_many(self, ids: np.ndarray) -> np.ndarray:
+        """Mask of the IDs already in the index."""
+        with self._lock:
+            low = int(ids.min())
+            known = self._ids[self._ids >= low]
+            pending = np.fromiter(self._pending_set, dtype=np.int64, count=len(self._pending_set))
+        return np.isin(ids, np.concatenate((known, pending)))
+
+    def _query_sorted(self, minx: float, miny: float, maxx: float, maxy: float) -> np.ndarray:
+        row_start, row_end = self._rows([miny, maxy])
+        col_start, col_end = self._cols([minx, maxx])
+        rows = np.arange(row_start, row_end + 1, dtype=np.int64)
+        starts = np.searchsorted(self._keys, rows * self.n_cols + col_start, side="left")
+        ends = np.searchsorted(self._keys, rows * self.n_cols + col_end, side="right")
+
+        lengths = ends - starts
+        total = int(lengths.sum())
+        if total == 0:
+            return np.empty(0, dtype=np.int64)
+
+        # Expand the per-row [start, end) slices into one candidate index array
+        offsets = np.repeat(starts - np.concatenate(([0], np.cumsum(lengths)[:-1])), lengths)
+        candidates = np.arange(total, dtype=np.int64) + offsets
+
+        lats = self._lats[candidates]
+        lons = self._lons[candidates]
+        mask = (lats >= miny) & (lats <= maxy) & (lons >= minx) & (lons <= maxx)
+        return self._ids[candidates[mask]]
+
+    def query_bbox(self, minx: float, miny: float, maxx: float, maxy: float) -> Optional[np.ndarray]:
+        """Return sorted IDs of points inside the box, or None when the index is cold.
+
+        ``minx``/``maxx`` are longitudes and ``miny``/``maxy`` latitudes. A box
+        with ``minx > maxx`` is treated as crossing the antimeridian.
+        """
+        if not self.warm:
+            self.misses += 1
+            return None
+
+        with self._lock:
+            if minx > maxx:
+                ids = np.concatenate((
+                    self._query_sorted(minx, miny, 180.0, maxy),
+                    self._query_sorted(-180.0, miny, maxx, maxy),
+                ))
+            else:
+                ids = self._query_sorted(minx, miny, maxx, maxy)
+
+            if self._pending_ids:
+                pending_lats = np.asarray(self._pending_lats)
+                pending_lons = np.asarray(self._pending_lons)
+                lon_mask = (
+                    (pending_lons >= minx) | (pending_lons <= maxx)
+                    if minx > maxx
+                    else (pending_lons >= minx) & (pending_lons <= maxx)
+                )
+                mask = (pending_lats >= miny) & (pending_lats <= maxy) & lon_mask
+                ids = np.concatenate((ids, np.asarray(self._pending_ids, dtype=np.int64)[mask]))
+
+        self.hits += 1
+        return np.sort(ids)
+
+    def snapshot(self):
+        """Return consistent copies of the (ids, lats, lons) arrays including pending points."""
+        with self._lock:
+            return (
+                np.concatenate((self._ids, np.asarray(self._pending_ids, dtype=np.int64))),
+                np.concatenate((self._lats, np.asarray(self._pending_lats, dtype=np.float64))),
+                np.concatenate((self._lons, np.asarray(self._pending_lons, dtype=np.float64))),
+            )
+
+    def stats(self) -> Dict[str, Any]:
+        """Index size and hit/miss counters."""
+        lookups = self.hits + self.misses
+        return {
+            "enabled": settings.spatial_index_enabled,
+            "warm": self.warm,
+            "points": len(self),
+            "pending_points": len(self._pending_ids),
+            "cell_size": self.cell_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+spatial_index = SpatialIndex()
+
+
+def load_spatial_index():
+    """Warm the shared index from the database; queries fall back to PostGIS until it finishes."""
+    db = ReadSessionLocal()
+    try:
+        spatial_index.load(db)
+    except Exception as e:
+        logger.error(f"Error loading spatial index: {e}")
+    finally:
+        db.close()
+
+
+def refresh_spatial_index():
+    """Catch the shared index up with rows written by other processes."""
+    db = SessionLocal()
+    try:
+        spatial_index.maybe_refresh(db)
+    except Exception as e:
+        logger.error(f"Error refreshing spatial index: {e}")
+    finally:
+        db.close()
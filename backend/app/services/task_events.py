@@ -0,0 +1,139 @@
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
+import json
+import logging
+from celery.result import AsyncResult
+from app.core.concurrency import run_sync
+from app.core.config import settings
+from app.services.cache import get_async_redis_client, get_redis_client
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATES = ("SUCCESS", "FAILURE", "REVOKED")
+
+
+def _channel(task_id: str) -> str:
+    return f"task_events:{task_id}"
+
+
+def _last_event_key(task_id: str) -> str:
+    return f"task_events:last:{task_id}"
+
+
+def _pages_key(task_id: str) -> str:
+    return f"task_result:{task_id}"
+
+
+def _dumps(value: Any) -> str:
+    return json.dumps(value, separators=(",", ":"), default=str)
+
+
+def task_status_payload(task_id: str, state: str, info: Any) -> Dict[str, Any]:
+    """Status of a task in the shape served by /tasks/task-status/ and the event streams."""
+    if state == 'PENDING':
+        return {'task_id': task_id, 'state': state, 'status': 'Task is pending...'}
+    if state == 'PROGRESS':
+        info = info if isinstance(info, dict) else {}
+        return {
+            'task_id': task_id,
+            'state': state,
+            'status': info.get('step', 'Processing...'),
+            'progress': info.get('current', 0),
+            'total': info.get('total', 100)
+        }
+    if state == 'SUCCESS':
+        return {'task_id': task_id, 'state': state, 'result': info}
+    if isinstance(info, dict) and 'error' in info:
+        info = info['error']
+    return {'task_id': task_id, 'state': state, 'error': str(info)}
+
+
+def backend_task_status(task_id: str) -> Dict[str, Any]:
+    """Status read from the Celery result backend."""
+    task_result = AsyncResult(task_id)
+    return task_status_payload(task_id, task_result.state, task_result.info)
+
+
+def publish_task_event(task_id: str, state: str, info: Any):
+    """Push a state change to subscribers and keep it as the task's last event."""
+    data = _dumps(task_status_payload(task_id, state, info))
+    try:
+        pipeline = get_redis_client().pipeline(transaction=False)
+        pipeline.set(_last_event_key(task_id), data, ex=settings.task_events_ttl)
+        pipeline.publish(_channel(task_id), data)
+        pipeline.execute()
+    except Exception as e:
+        logger.error(f"Error publishing event for task {task_id}: {e}")
+
+
+async def task_events(task_id: str) -> AsyncIterator[Optional[Dict[str, Any]]]:
+    """The task's current status, then each published event until it finishes.
+
+    Yields None after ``task_events_heartbeat`` seconds without an event so
+    callers can send keep-alives. Subscribing happens before the current
+    status is read, so no event is lost in between.
+    """
+    client = get_async_redis_client()
+    pubsub = client.pubsub(ignore_subscribe_messages=True)
+    await pubsub.subscribe(_channel(task_id))
+    try:
+        last = await client.get(_last_event_key(task_id))
+        event = json.loads(last) if last else await run_sync(backend_task_status, task_id)
+        yield event
+        if event['state'] in TERMINAL_STATES:
+            return
+
+        while True:
+            message = await pubsub.get_message(timeout=settings.task_events_heartbeat)
+            if message is None:
+                yield None
+                continue
+            event = json.loads(message['data'])
+            yield event
+            if event['state'] in TERMINAL_STATES:
+                return
+    finally:
+        await pubsub.unsubscribe()
+        await pubsub.aclose()
+
+
+def offload_result(task_id: str, result: Any) -> Any:
+    """Move the largest list of a large dict result into paged Redis storage.
+
+    Returns the result with that list replaced by a ``result_ref`` stub, so
+    the result backend and task-status responses stay small. Results whose
+    lists serialize to at most ``task_result_inline_max_bytes`` are returned
+    unchanged, and so is the whole result when Redis is unavailable.
+    """
+    if not isinstance(result, dict):
+        return result
+    sizes = {key: len(_dumps(value)) for key, value in result.items() if isinstance(value, list)}
+    if not sizes or sum(sizes.values()) <= settings.task_result_inline_max_bytes:
+        return result
+
+    key = max(sizes, key=sizes.get)
+    items = result[key]
+    size = settings.task_result_page_size
+    pages = [_dumps(items[start:start + size]) for start in range(0, len(items), size)]
+    try:
+        pipeline = get_redis_client().pipeline()
+        pipeline.delete(_pages_key(task_id))
+        if pages:
+            pipeline.rpush(_pages_key(task_id), *pages)
+        pipeline.expire(_pages_key(task_id), settings.task_result_ttl)
+        pipeline.execute()
+    except Exception as e:
+        logger.error(f"Error storing result pages for task {task_id}: {e}")
+        return result
+
+    stub = {name: value for name, value in result.items() if name != key}
+    stub["result_ref"] = {"key": key, "items": len(items), "pages": len(pages), "page_size": size}
+    return stub
+
+
+def get_result_page(task_id: str, page: int) -> Tuple[Optional[bytes], int]:
+    """One page of an offloaded result as raw JSON (None when missing) and the page count."""
+    pipeline = get_redis_client().pipeline(transaction=False)
+    pipeline.lindex(_pages_key(task_id), page)
+    pipeline.llen(_pages_key(task_id))
+    data, pages = pipeline.execute()
+    return data, int(pages)
@@ -0,0 +1,139 @@
+from typing import Any, Dict, List, Optional, Tuple
+import glob
+import logging
+import os
+import tempfile
+import numpy as np
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.crud import spatial
+from app.db.session import SessionLocal
+from app.services.cache import MAP_TILES_TAG, CacheService, map_tile_tag, map_zoom_tag
+from app.services.cells import CELL_KEY_ZOOM, lonlat_to_world
+from app.services.mvt import MvtLayer, encode_tile
+
+logger = logging.getLogger(__name__)
+
+MVT_MEDIA_TYPE = "application/vnd.mapbox-vector-tile"
+
+
+def _tile_pixels(lats: Any, lons: Any, z: int, x: int, y: int, extent: int) -> Tuple[List[int], List[int]]:
+    """Project coordinates into a tile's local integer grid (0..extent, y down)."""
+    n = 1 << z
+    world_x, world_y = lonlat_to_world(lats, lons)
+    pixel_x = np.clip(np.round((world_x * n - x) * extent), 0, extent).astype(np.int64)
+    pixel_y = np.clip(np.round((world_y * n - y) * extent), 0, extent).astype(np.int64)
+    return pixel_x.tolist(), pixel_y.tolist()
+
+
+def _point_properties(row: Any) -> Dict[str, Any]:
+    properties = {"name": row.name}
+    if isinstance(row.properties, dict):
+        for key, value in row.properties.items():
+            properties.setdefault(key, value)
+    return properties
+
+
+def render_tile(db: Session, z: int, x: int, y: int) -> bytes:
+    """Encode one z/x/y tile: raw points at high zoom, per-cell clusters below it or when too dense."""
+    extent = settings.tile_extent
+    if z >= settings.tile_points_min_zoom:
+        rows = spatial.get_tile_points(db, z, x, y, limit=settings.tile_max_features + 1)
+        if len(rows) <= settings.tile_max_features:
+            layer = MvtLayer("points", extent)
+            if rows:
+                pixel_x, pixel_y = _tile_pixels(
+                    [row.latitude for row in rows], [row.longitude for row in rows], z, x, y, extent
+                )
+                for row, px, py in zip(rows, pixel_x, pixel_y):
+                    layer.add_point(px, py, _point_properties(row), feature_id=row.id)
+            return encode_tile([layer])
+
+    depth = min(settings.tile_cluster_depth, CELL_KEY_ZOOM - z)
+    rows = spatial.get_tile_clusters(db, z, x, y, depth)
+    layer = MvtLayer("clusters", extent)
+    if rows:
+        counts = np.asarray([row.point_count for row in rows], dtype=np.float64)
+        centroid_lats = np.asarray([row.sum_latitude for row in rows], dtype=np.float64) / counts
+        centroid_lons = np.asarray([row.sum_longitude for row in rows], dtype=np.float64) / counts
+        pixel_x, pixel_y = _tile_pixels(centroid_lats, centroid_lons, z, x, y, extent)
+        for row, px, py in zip(rows, pixel_x, pixel_y):
+            layer.add_point(px, py, {"point_count": int(row.point_count)}, feature_id=int(row.tile_key))
+    return encode_tile([layer])
+
+
+class TileCache:
+    """Encoded tiles in Redis and an on-disk store, keyed by z/x/y and the tile's version.
+
+    The version combines the map_tiles dataset version (bumped by very large
+    writes), the zoom tag (bumped when a write touches too many tiles to tag
+    one by one) and the per-tile tag bumped when a write lands inside the
+    tile, so stale entries are never read and simply expire.
+    """
+
+    def __init__(self, cache: Optional[CacheService] = None, directory: Optional[str] = None):
+        self.cache = cache or CacheService()
+        self.directory = settings.tile_cache_dir if directory is None else directory
+        self.ttl = settings.tile_cache_ttl
+
+    def version(self, z: int, x: int, y: int) -> str:
+        versions = self.cache.get_tag_versions([MAP_TILES_TAG, map_zoom_tag(z), map_tile_tag(z, x, y)])
+        return ".".join(map(str, versions))
+
+    def _key(self, z: int, x: int, y: int, version: str) -> str:
+        return f"mvt:{version}:{z}/{x}/{y}"
+
+    def _path(self, z: int, x: int, y: int, version: str) -> str:
+        return os.path.join(self.directory, str(z), str(x), f"{y}.{version}.mvt")
+
+    def get(self, z: int, x: int, y: int, version: str) -> Optional[bytes]:
+        """Cached tile bytes from Redis, then disk (re-populating Redis), or None."""
+        data = self.cache.get_bytes(self._key(z, x, y, version), local=False)
+        if data is not None or not self.directory:
+            return data
+        try:
+            with open(self._path(z, x, y, version), "rb") as tile_file:
+                data = tile_file.read()
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            logger.error(f"Error reading tile {z}/{x}/{y} from disk: {e}")
+            return None
+        self.cache.set_bytes(self._key(z, x, y, version), data, ttl=self.ttl, local=False)
+        return data
+
+    def set(self, z: int, x: int, y: int, version: str, data: bytes):
+        """Store a tile in Redis and on disk, removing older disk versions of it."""
+        self.cache.set_bytes(self._key(z, x, y, version), data, ttl=self.ttl, local=False)
+        if not self.directory:
+            return
+        path = self._path(z, x, y, version)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            handle, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            with os.fdopen(handle, "wb") as tile_file:
+                tile_file.write(data)
+            os.replace(temp_path, path)
+            for stale in glob.glob(os.path.join(os.path.dirname(path), f"{y}.*.mvt")):
+                if stale != path:
+                    try:
+                        os.remove(stale)
+                    except FileNotFoundError:
+                        pass
+        except OSError as e:
+            logger.error(f"Error writing tile {z}/{x}/{y} to disk: {e}")
+
+
+def get_vector_tile(z: int, x: int, y: int, version: Optional[str] = None) -> Tuple[bytes, str]:
+    """Encoded tile and its version, served from the tile cache or rendered and stored."""
+    tile_cache = TileCache()
+    version = version or tile_cache.version(z, x, y)
+    data = tile_cache.get(z, x, y, version)
+    if data is None:
+        db = SessionLocal()
+        try:
+            data = render_tile(db, z, x, y)
+        finally:
+            db.close()
+        tile_cache.set(z, x, y, version, data)
+    return data, version
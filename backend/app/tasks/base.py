@@ -0,0 +1,24 @@
+from celery import Task
+from app.services.task_events import publish_task_event
+
+
+class EventTask(Task):
+    """Default task class: pushes every state change to the task's event channel.
+
+    Tasks whose return value only feeds another task (e.g. chord members) set
+    ``publish_result=False`` to leave it out of their SUCCESS event.
+    """
+
+    publish_result = True
+
+    def update_state(self, task_id=None, state=None, meta=None, **kwargs):
+        super().update_state(task_id=task_id, state=state, meta=meta, **kwargs)
+        task_id = task_id or self.request.id
+        if task_id:
+            publish_task_event(task_id, state, meta)
+
+    def on_success(self, retval, task_id, args, kwargs):
+        publish_task_event(task_id, 'SUCCESS', retval if self.publish_result else None)
+
+    def on_failure(self, exc, task_id, args, kwargs, einfo):
+        publish_task_event(task_id, 'FAILURE', exc)
@@ -1,105 +1,200 @@
-from celery import current_task
+from celery import chord, current_task, group
 from app.core.celery_app import celery_app
+from app.core.config import settings
 from app.services.analysis import GeospatialAnalyzer
 from app.db.session import SessionLocal
 from app.crud import spatial
-from typing import Dict, Any
+from app.services.cache import CacheService
+from app.services.export import spatial_row_to_dict
+from app.services import network_metrics, regions
+from app.services.network_analysis import NetworkAnalysisService
+from app.services.task_events import offload_result
+from typing import Dict, Any, List, Optional
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
 @celery_app.task(bind=True)
 def process_large_dataset(self, dataset_id: str) -> Dict[str, Any]:
-    """Process a large geospatial dataset asynchronously."""
+    """Process a large geospatial dataset as a chord of id-range chunk tasks.
+
+    The task replaces itself with the chord, so its id carries the reduced
+    result; chunk tasks report progress under it as they complete.
+    """
     try:
-        # Update task state
-        self.update_state(state='PROGRESS', meta={'current': 0, 'total': 100})
-        
-        analyzer = GeospatialAnalyzer()
-        
-        # Simulate processing steps
-        steps = ['Loading data', 'Analyzing patterns', 'Calculating metrics', 'Saving results']
-        
-        for i, step in enumerate(steps):
-            # Update progress
-            progress = int((i + 1) * 100 / len(steps))
-            self.update_state(
-                state='PROGRESS', 
-                meta={'current': progress, 'total': 100, 'step': step}
-            )
-            
-            # Simulate work
-            import time
-            time.sleep(1)
-        
-        result = analyzer.process_dataset(dataset_id)
-        
-        # Update final state
+        self.update_state(state='PROGRESS', meta={'current': 0, 'total': 100, 'step': 'Planning chunks'})
+        bounds = GeospatialAnalyzer().plan_dataset_chunks(dataset_id)
+    except Exception as e:
+        logger.error(f"Error processing dataset {dataset_id}: {e}")
+        self.update_state(state='FAILURE', meta={'error': str(e)})
+        raise
+
+    if not bounds:
+        return GeospatialAnalyzer().reduce_dataset_chunks(dataset_id, [], 0.0)
+
+    logger.info(f"Processing dataset {dataset_id} in {len(bounds)} chunks")
+    chunks = group(
+        process_dataset_chunk.s(dataset_id, first_id, last_id, self.request.id, len(bounds))
+        for first_id, last_id in bounds
+    )
+    return self.replace(chord(chunks, reduce_dataset_chunks.s(dataset_id, time.time())))
+
+@celery_app.task(
+    bind=True,
+    autoretry_for=(Exception,),
+    retry_backoff=True,
+    max_retries=settings.dataset_chunk_max_retries,
+    publish_result=False,
+)
+def process_dataset_chunk(
+    self,
+    dataset_id: str,
+    first_id: int,
+    last_id: int,
+    parent_id: str,
+    total_chunks: int,
+) -> Dict[str, Any]:
+    """Process one id range; a failure retries this chunk only."""
+    partial = GeospatialAnalyzer().process_dataset_chunk(dataset_id, first_id, last_id)
+    try:
+        progress_key = f"dataset_progress:{parent_id}"
+        redis_client = CacheService().redis_client
+        done = int(redis_client.incr(progress_key))
+        redis_client.expire(progress_key, settings.dataset_progress_ttl)
         self.update_state(
-            state='SUCCESS',
-            meta={'result': result, 'dataset_id': dataset_id}
+            task_id=parent_id,
+            state='PROGRESS',
+            meta={'current': int(done * 100 / total_chunks), 'total': 100, 'step': f'Processed {done}/{total_chunks} chunks'}
         )
-        
-        return result
-        
     except Exception as e:
-        logger.error(f"Error processing dataset {dataset_id}: {e}")
+        # Progress is best effort; retrying a finished chunk would double count it
+        logger.error(f"Error reporting progress for dataset {dataset_id}: {e}")
+    return partial
+
+@celery_app.task(bind=True)
+def reduce_dataset_chunks(self, partials: List[Dict[str, Any]], dataset_id: str, started_at: float) -> Dict[str, Any]:
+    """Merge the chunk partials of a dataset into its final result."""
+    try:
+        result = GeospatialAnalyzer().reduce_dataset_chunks(dataset_id, partials, time.time() - started_at)
+        return offload_result(self.request.id, result)
+    except Exception as e:
+        logger.error(f"Error reducing dataset {dataset_id}: {e}")
         self.update_state(state='FAILURE', meta={'error': str(e)})
         raise
 
 @celery_app.task(bind=True)
-def calculate_network_metrics(self, network_id: str) -> Dict[str, Any]:
+def calculate_network_metrics(self, network_id: str, incremental: bool = True) -> Dict[str, Any]:
     """Calculate network analysis metrics asynchronously."""
     try:
-        self.update_state(state='PROGRESS', meta={'current': 0, 'total': 100})
-        
-        # Simulate network analysis
-        steps = ['Loading network', 'Calculating centrality', 'Finding communities', 'Generating report']
-        
-        for i, step in enumerate(steps):
-            progress = int((i + 1) * 100 / len(steps))
+        def progress(percent: int, step: str):
             self.update_state(
                 state='PROGRESS',
-                meta={'current': progress, 'total': 100, 'step': step}
+                meta={'current': percent, 'total': 100, 'step': step}
             )
-            
-            import time
-            time.sleep(0.5)
-        
-        result = {
-            'network_id': network_id,
-            'centrality_scores': {'node1': 0.8, 'node2': 0.6, 'node3': 0.9},
-            'communities': [['node1', 'node2'], ['node3']],
-            'metrics': {'density': 0.75, 'clustering': 0.82}
-        }
-        
-        self.update_state(
-            state='SUCCESS',
-            meta={'result': result, 'network_id': network_id}
-        )
-        
-        return result
+
+        return network_metrics.calculate_network_metrics(network_id, incremental=incremental, progress=progress)
         
     except Exception as e:
         logger.error(f"Error calculating metrics for network {network_id}: {e}")
         self.update_state(state='FAILURE', meta={'error': str(e)})
         raise
 
+@celery_app.task(bind=True)
+def detect_hotspots_task(
+    self,
+    radius_km: float = 1.0,
+    min_points: Optional[int] = None,
+    max_hotspots: Optional[int] = None,
+) -> Dict[str, Any]:
+    """Detect spatial hotspots over the full table asynchronously."""
+    try:
+        self.update_state(state='PROGRESS', meta={'current': 0, 'total': 100, 'step': 'Scanning points'})
+        analyzer = GeospatialAnalyzer()
+        result = analyzer.detect_hotspots(radius_km, min_points=min_points, max_hotspots=max_hotspots)
+        if "error" in result:
+            raise RuntimeError(result["error"])
+        return offload_result(self.request.id, result)
+        
+    except Exception as e:
+        logger.error(f"Error detecting hotspots: {e}")
+        self.update_state(state='FAILURE', meta={'error': str(e)})
+        raise
+
+@celery_app.task(bind=True)
+def distance_matrix_task(
+    self,
+    sources: List[str],
+    targets: List[str],
+    network_id: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Compute an origin-destination matrix too large to stream from the API."""
+    try:
+        def progress(done: int, total: int):
+            self.update_state(
+                state='PROGRESS',
+                meta={'current': done, 'total': total, 'step': 'Computing distances'}
+            )
+
+        result = NetworkAnalysisService().distance_matrix(sources, targets, network_id, progress=progress)
+        return offload_result(self.request.id, result)
+
+    except Exception as e:
+        logger.error(f"Error computing distance matrix for network {network_id}: {e}")
+        self.update_state(state='FAILURE', meta={'error': str(e)})
+        raise
+
+@celery_app.task(bind=True)
+def tag_points_with_regions_task(
+    self,
+    layer: str,
+    property_key: Optional[str] = None,
+    predicate: str = "intersects",
+) -> Dict[str, Any]:
+    """Tag every spatial_data point with the region of a polygon layer it falls in."""
+    try:
+        def progress(done: int, total: int):
+            self.update_state(
+                state='PROGRESS',
+                meta={'current': int(done * 100 / total), 'total': 100, 'step': f'Tagged {done}/{total} points'}
+            )
+
+        result = regions.tag_points_with_regions(layer, property_key, predicate, progress=progress)
+        if "error" in result:
+            raise RuntimeError(result["error"])
+        return offload_result(self.request.id, result)
+
+    except Exception as e:
+        logger.error(f"Error tagging points with region layer {layer}: {e}")
+        self.update_state(state='FAILURE', meta={'error': str(e)})
+        raise
+
 @celery_app.task
+def refresh_spatial_statistics() -> Dict[str, Any]:
+    """Build the spatial statistics summary tables, or recount their distinct values."""
+    result = GeospatialAnalyzer().refresh_spatial_statistics()
+    if "error" in result:
+        logger.error(f"Error refreshing spatial statistics: {result['error']}")
+    return result
+
+@celery_app.task
+def backfill_cell_keys() -> Dict[str, Any]:
+    """Compute missing cell keys and rebuild the tile rollups."""
+    result = GeospatialAnalyzer().backfill_cell_keys()
+    if "error" in result:
+        logger.error(f"Error backfilling cell keys: {result['error']}")
+    return result
+
+@celery_app.task(bind=True)
 def cache_spatial_data(self, spatial_id: int) -> Dict[str, Any]:
     """Cache spatial data for faster retrieval."""
+    db = SessionLocal()
     try:
-        db = SessionLocal()
         spatial_data = spatial.get_spatial_data_by_id(db, spatial_id)
         
         if spatial_data:
-            # Cache the data (in a real app, you'd use Redis here)
-            cached_data = {
-                'id': spatial_data.id,
-                'name': spatial_data.name,
-                'coordinates': spatial_data.coordinates,
-                'properties': spatial_data.properties
-            }
+            cached_data = spatial_row_to_dict(spatial_data)
+            CacheService().cache_spatial_data(spatial_id, cached_data)
             
             logger.info(f"Cached spatial data for ID {spatial_id}")
             return {'status': 'cached', 'data': cached_data}
@@ -110,4 +205,4 @@ def cache_spatial_data(self, spatial_id: int) -> Dict[str, Any]:
         logger.error(f"Error caching spatial data {spatial_id}: {e}")
         return {'status': 'error', 'error': str(e)}
     finally:
-        db.close() 
\ No newline at end of file
+        db.close()
\ No newline at end of file
@@ -0,0 +1,186 @@
+from typing import Any, Dict, List, Optional
+import argparse
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+from datetime import datetime, timezone
+
+logger = logging.getLogger("benchmarks")
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _setup(args) -> Dict[str, Any]:
+    """Bind the services, returning their description for the result file."""
+    from benchmarks.environment import describe_services, use_local_services
+
+    if args.services == "local":
+        return use_local_services(args.workdir or tempfile.mkdtemp(prefix="octa-bench-"))
+    return describe_services()
+
+
+def _write_result(kind: str, args, services: Dict[str, Any], results: Dict[str, Any]) -> str:
+    parameters = {key: value for key, value in vars(args).items() if key not in ("command", "output", "func")}
+    document = {
+        "kind": kind,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "git_commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "parameters": parameters,
+        "services": services,
+        "results": results,
+    }
+    # Serialised first, so a failure cannot leave a truncated file to be compared later
+    data = json.dumps(document, indent=2, sort_keys=True)
+    os.makedirs(args.output, exist_ok=True)
+    path = os.path.join(args.output, f"{kind}-{datetime.now(timezone.utc):%Y%m%dT%H%M%SZ}.json")
+    with open(path, "w") as f:
+        f.write(data)
+    logger.info(f"Results written to {path}")
+    return path
+
+
+def _load_data(args, services: Dict[str, Any], needed: bool):
+    from benchmarks.data import generate_points, load_points
+
+    points = generate_points(args.points, seed=args.seed)
+    if needed and not args.skip_load:
+        load_points(points)
+    return points
+
+
+def run_micro_command(args) -> str:
+    from benchmarks.micro import BENCHMARKS, Context, needs_database, run_micro
+
+    unknown = [name for name in args.only if name not in BENCHMARKS]
+    if unknown:
+        raise SystemExit(f"Unknown benchmarks: {', '.join(unknown)}; choose from {', '.join(BENCHMARKS)}")
+    services = _setup(args)
+    points = _load_data(args, services, needs_database(args.only))
+    results = run_micro(Context(points, seed=args.seed, repeat=args.repeat), args.only)
+    for name, result in results.items():
+        if "error" in result:
+            print(f"{name:<28} error: {result['error']}")
+        else:
+            print(f"{name:<28} min {result['min_s'] * 1000:10.3f} ms  median {result['median_s'] * 1000:10.3f} ms")
+    return _write_result("micro", args, services, results)
+
+
+def run_load_command(args) -> str:
+    from benchmarks.load import run_load, serve_in_thread
+
+    server = None
+    if args.url:
+        # Only the request generator runs here; the ids and boxes come from the same seed as the loaded data
+        from benchmarks.data import generate_points
+        from benchmarks.environment import describe_services
+
+        services, points, url = {"url": args.url, **describe_services()}, generate_points(args.points, seed=args.seed), args.url
+    else:
+        services = _setup(args)
+        points = _load_data(args, services, True)
+        from app.services.neighbours import neighbour_index
+        from app.services.spatial_index import load_spatial_index
+
+        load_spatial_index()
+        neighbour_index.get()
+        server = serve_in_thread(port=args.port)
+        url = f"http://127.0.0.1:{args.port}"
+    try:
+        results = run_load(url, points, rps=args.rps, duration=args.duration, concurrency=args.concurrency, seed=args.seed)
+    finally:
+        if server is not None:
+            server.should_exit = True
+    overall = results["overall"]
+    print(
+        f"{overall['count']} requests at {results['achieved_rps']:.1f}/s (target {args.rps}), {overall['errors']} errors, "
+        f"p50 {overall['p50_s'] * 1000:.1f} ms, p99 {overall['p99_s'] * 1000:.1f} ms"
+    )
+    return _write_result("load", args, services, results)
+
+
+def _flatten(results: Dict[str, Any], prefix: str = "") -> Dict[str, float]:
+    values = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            values.update(_flatten(value, f"{name}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool) and name.endswith("_s"):
+            values[name] = float(value)
+    return values
+
+
+def compare_command(args):
+    """Print the timings of two result files side by side with the relative change."""
+    with open(args.old) as f:
+        old = _flatten(json.load(f)["results"])
+    with open(args.new) as f:
+        new = _flatten(json.load(f)["results"])
+    for name in sorted(set(old) | set(new)):
+        if args.metric and not name.endswith(f".{args.metric}"):
+            continue
+        before, after = old.get(name), new.get(name)
+        if before is None or after is None:
+            print(f"{name:<48} {before!s:>12} {after!s:>12}")
+            continue
+        change = (after - before) / before * 100 if before else 0.0
+        print(f"{name:<48} {before * 1000:10.3f}ms {after * 1000:10.3f}ms {change:+7.1f}%")
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Micro-benchmarks and HTTP load tests for the OCTA backend")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    def add_common(command):
+        command.add_argument("--points", type=int, default=100_000, help="Synthetic points to generate")
+        command.add_argument("--seed", type=int, default=0)
+        command.add_argument("--services", choices=("local", "env"), default="local",
+                             help="local: SQLite file and fakeredis; env: the configured DATABASE_URL and REDIS_URL")
+        command.add_argument("--workdir", help="Directory for the SQLite file (default: a temporary directory)")
+        command.add_argument("--skip-load", action="store_true", help="Reuse points already loaded with the same --points and --seed")
+        command.add_argument("--output", default=RESULTS_DIR, help="Directory for the JSON result files")
+
+    micro = commands.add_parser("micro", help="Time the analysis, hotspot, bbox and cache hot paths")
+    add_common(micro)
+    micro.add_argument("--only", nargs="*", default=[], help="Benchmark names to run (default: all)")
+    micro.add_argument("--repeat", type=int, default=5)
+    micro.set_defaults(func=run_micro_command)
+
+    load = commands.add_parser("load", help="Drive the /api/v1 endpoints at a target request rate")
+    add_common(load)
+    load.add_argument("--url", help="Base URL of a running server; without it the app is served in-process")
+    load.add_argument("--port", type=int, default=8765, help="Port for the in-process server")
+    load.add_argument("--rps", type=float, default=50.0)
+    load.add_argument("--duration", type=float, default=30.0, help="Seconds")
+    load.add_argument("--concurrency", type=int, default=32, help="Maximum requests in flight")
+    load.set_defaults(func=run_load_command)
+
+    compare = commands.add_parser("compare", help="Compare two result files")
+    compare.add_argument("old")
+    compare.add_argument("new")
+    compare.add_argument("--metric", help="Only show this statistic, e.g. min_s or p99_s")
+    compare.set_defaults(func=compare_command)
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s %(message)s")
+    args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
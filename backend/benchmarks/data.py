@@ -0,0 +1,86 @@
+from typing import Any, Dict, Iterator, List
+import logging
+import time
+import numpy as np
+from app.schemas.spatial import SpatialDataCreate
+
+logger = logging.getLogger(__name__)
+
+CATEGORIES = ("cafe", "shop", "park", "school", "hospital", "office", "station", "museum")
+DATASETS = 10
+
+
+def generate_points(n: int, seed: int = 0, clusters: int = 64, background: float = 0.2) -> Dict[str, np.ndarray]:
+    """Synthetic points as column arrays, identical for the same ``n`` and ``seed``.
+
+    Most points fall in ``clusters`` Gaussian blobs of 5-50 km around random
+    city centres, the ``background`` fraction is spread uniformly, so both
+    dense and sparse cells exist for the clustering and bbox paths. The
+    property columns feed ``record_properties``.
+    """
+    rng = np.random.default_rng(seed)
+    centre_lats = rng.uniform(-55.0, 65.0, clusters)
+    centre_lons = rng.uniform(-180.0, 180.0, clusters)
+    spreads = rng.uniform(0.05, 0.5, clusters)
+
+    clustered = rng.random(n) >= background
+    blob = rng.integers(0, clusters, n)
+    lats = np.where(clustered, centre_lats[blob] + rng.normal(0.0, 1.0, n) * spreads[blob], rng.uniform(-85.0, 85.0, n))
+    lons = np.where(clustered, centre_lons[blob] + rng.normal(0.0, 1.0, n) * spreads[blob], rng.uniform(-180.0, 180.0, n))
+    return {
+        "latitude": np.clip(lats, -89.9, 89.9),
+        "longitude": (lons + 180.0) % 360.0 - 180.0,
+        "category": rng.integers(0, len(CATEGORIES), n),
+        "rating": np.round(rng.uniform(1.0, 5.0, n), 1),
+        "population": rng.lognormal(8.0, 1.5, n).astype(np.int64),
+        "dataset": rng.integers(0, DATASETS, n),
+        "open_late": rng.random(n) < 0.3,
+        "centre_latitude": centre_lats,
+        "centre_longitude": centre_lons,
+    }
+
+
+def record_properties(points: Dict[str, np.ndarray], index: int) -> Dict[str, Any]:
+    properties = {
+        "category": CATEGORIES[points["category"][index]],
+        "rating": float(points["rating"][index]),
+        "population": int(points["population"][index]),
+        "dataset_id": f"bench-{points['dataset'][index]}",
+    }
+    # A sparse key, for existence filters
+    if points["open_late"][index]:
+        properties["open_late"] = True
+    return properties
+
+
+def iter_records(points: Dict[str, np.ndarray], chunk_size: int = 50000) -> Iterator[List[SpatialDataCreate]]:
+    """SpatialDataCreate batches for the generated points, skipping validation."""
+    lats, lons = points["latitude"].tolist(), points["longitude"].tolist()
+    for start in range(0, len(lats), chunk_size):
+        yield [
+            SpatialDataCreate.model_construct(
+                name=f"point-{index}",
+                latitude=lats[index],
+                longitude=lons[index],
+                properties=record_properties(points, index),
+            )
+            for index in range(start, min(start + chunk_size, len(lats)))
+        ]
+
+
+def load_points(points: Dict[str, np.ndarray], chunk_size: int = 50000) -> int:
+    """Insert the points through the bulk ingest path and rebuild the statistics tables."""
+    from app.crud import spatial, statistics
+    from app.db.session import SessionLocal
+
+    started = time.perf_counter()
+    inserted = 0
+    db = SessionLocal()
+    try:
+        for batch in iter_records(points, chunk_size):
+            inserted += spatial.bulk_create_spatial_data(db, batch)
+        statistics.rebuild_spatial_statistics(db)
+    finally:
+        db.close()
+    logger.info(f"Loaded {inserted} points in {time.perf_counter() - started:.1f}s")
+    return inserted
@@ -0,0 +1,72 @@
+from typing import Any, Dict, Optional
+import importlib.util
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# Local stand-ins for the backing services, so benchmarks run on a laptop or CI box:
+# a SQLite file replaces PostgreSQL and fakeredis replaces Redis. Both are bound
+# through the app's own session factories and connection pools, so every code
+# path under test is the production one. PostgreSQL-only paths (COPY, summary
+# upserts, JSONB operators) fall back to their portable branches.
+
+
+def use_local_services(workdir: str, fresh: bool = True) -> Dict[str, Any]:
+    """Point the app at a SQLite file in ``workdir`` and an in-process fake Redis."""
+    import fakeredis
+    import fakeredis.aioredis
+    import redis
+    import redis.asyncio
+    from sqlalchemy import create_engine
+    from sqlalchemy.dialects.postgresql import JSONB
+    from sqlalchemy.ext.asyncio import create_async_engine
+    from sqlalchemy.ext.compiler import compiles
+    from app.db import session
+    from app.db.base import Base
+    from app.services import cache
+    import app.models.spatial  # noqa: F401 - registers the tables
+
+    @compiles(JSONB, "sqlite")
+    def compile_jsonb_sqlite(type_, compiler, **kw):
+        return "JSON"
+
+    os.makedirs(workdir, exist_ok=True)
+    path = os.path.join(workdir, "benchmark.db")
+    if fresh and os.path.exists(path):
+        os.remove(path)
+    url = f"sqlite:///{path}"
+    engine = create_engine(url, **session.engine_options(url))
+    Base.metadata.create_all(bind=engine)
+    session.SessionLocal.configure(bind=engine)
+
+    async_url = None
+    if importlib.util.find_spec("aiosqlite") is not None:
+        async_url = session.to_async_database_url(url)
+        session.AsyncSessionLocal.configure(bind=create_async_engine(async_url, **session.engine_options(async_url)))
+    else:
+        logger.warning("aiosqlite is not installed; endpoints on the async session will fail")
+
+    server = fakeredis.FakeServer()
+    cache._redis_pool = redis.ConnectionPool(connection_class=fakeredis.FakeConnection, server=server)
+    cache._async_redis_pool = redis.asyncio.ConnectionPool(connection_class=fakeredis.aioredis.FakeConnection, server=server)
+    cache.local_cache.clear()
+    return {"database": url, "async_database": async_url, "redis": "fakeredis"}
+
+
+def describe_services(services: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Services a run used, for the result file; the configured ones unless stand-ins were set up."""
+    if services is not None:
+        return services
+    from app.core.config import settings
+    from app.db.session import async_database_url
+
+    def redact(url: str) -> str:
+        scheme, _, rest = url.partition("://")
+        return f"{scheme}://{rest.rpartition('@')[2]}"
+
+    return {
+        "database": redact(settings.database_url),
+        "async_database": redact(async_database_url),
+        "redis": redact(settings.redis_url),
+    }
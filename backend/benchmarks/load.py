@@ -0,0 +1,185 @@
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+import http.client
+import logging
+import random
+import threading
+import time
+import numpy as np
+from app.services.cells import lonlat_to_tile
+
+logger = logging.getLogger(__name__)
+
+# A scenario builds one request path from a random generator and the generated
+# points; weights are relative shares of the request mix.
+Scenario = Tuple[str, float, Callable[[random.Random, Dict[str, np.ndarray]], str]]
+
+
+def _random_point(rng: random.Random, points: Dict[str, np.ndarray]) -> Tuple[float, float]:
+    centre = rng.randrange(len(points["centre_latitude"]))
+    return (
+        float(points["centre_latitude"][centre]) + rng.uniform(-0.2, 0.2),
+        float(points["centre_longitude"][centre]) + rng.uniform(-0.2, 0.2),
+    )
+
+
+def _within(rng: random.Random, points: Dict[str, np.ndarray]) -> str:
+    lat, lon = _random_point(rng, points)
+    size = rng.choice((0.05, 0.2, 0.5))
+    return (
+        f"/api/v1/spatial/spatial-data/within/?minx={lon - size:.5f}&miny={lat - size:.5f}"
+        f"&maxx={lon + size:.5f}&maxy={lat + size:.5f}"
+    )
+
+
+def _nearest(rng: random.Random, points: Dict[str, np.ndarray]) -> str:
+    lat, lon = _random_point(rng, points)
+    return f"/api/v1/spatial/nearest/?latitude={lat:.5f}&longitude={lon:.5f}&k=10"
+
+
+def _tile(rng: random.Random, points: Dict[str, np.ndarray]) -> str:
+    lat, lon = _random_point(rng, points)
+    z = rng.choice((4, 8, 12))
+    x, y = lonlat_to_tile(np.array([lat]), np.array([lon]), z)
+    return f"/api/v1/spatial/tiles/{z}/{int(x[0])}/{int(y[0])}"
+
+
+def _by_id(rng: random.Random, points: Dict[str, np.ndarray]) -> str:
+    return f"/api/v1/spatial/spatial-data/{rng.randint(1, len(points['latitude']))}"
+
+
+def _listing(rng: random.Random, points: Dict[str, np.ndarray]) -> str:
+    return f"/api/v1/spatial/spatial-data/?skip={rng.randrange(0, 10000, 100)}&limit=100"
+
+
+SCENARIOS: List[Scenario] = [
+    ("within", 0.3, _within),
+    ("nearest", 0.2, _nearest),
+    ("by_id", 0.15, _by_id),
+    ("tile", 0.15, _tile),
+    ("listing", 0.1, _listing),
+    ("statistics", 0.05, lambda rng, points: "/api/v1/tasks/spatial-statistics/"),
+    ("hotspots", 0.05, lambda rng, points: "/api/v1/tasks/detect-hotspots/?radius_km=1.0&run_async=false"),
+]
+
+
+class _Connections(threading.local):
+    """One keep-alive connection per worker thread."""
+
+    def __init__(self, host: str, port: int, timeout: float):
+        self.connection = http.client.HTTPConnection(host, port, timeout=timeout)
+
+
+def run_load(
+    base_url: str,
+    points: Dict[str, np.ndarray],
+    rps: float = 50.0,
+    duration: float = 30.0,
+    concurrency: int = 32,
+    seed: int = 0,
+    timeout: float = 30.0,
+    scenarios: Optional[List[Scenario]] = None,
+) -> Dict[str, Any]:
+    """Drive ``base_url`` with an open-loop request schedule at ``rps`` for ``duration`` seconds.
+
+    Requests are issued on a fixed schedule whether or not earlier ones have
+    finished, and latency is measured from the scheduled start, so a stalled
+    server shows up as queueing delay instead of silently lowering the rate.
+    """
+    scenarios = scenarios or SCENARIOS
+    parts = urlsplit(base_url)
+    connections = _Connections(parts.hostname, parts.port or 80, timeout)
+    prefix = parts.path.rstrip("/")
+
+    rng = random.Random(seed)
+    names = [name for name, _, _ in scenarios]
+    weights = [weight for _, weight, _ in scenarios]
+    builders = {name: build for name, _, build in scenarios}
+    total = int(rps * duration)
+    plan = [(index / rps, name, builders[name](rng, points)) for index, name in enumerate(rng.choices(names, weights, k=total))]
+
+    latencies: Dict[str, List[float]] = {name: [] for name in names}
+    statuses: Dict[str, Dict[str, int]] = {name: {} for name in names}
+    lock = threading.Lock()
+
+    def request(scheduled: float, name: str, path: str):
+        status = "error"
+        for attempt in range(2):
+            connection = connections.connection
+            try:
+                connection.request("GET", prefix + path)
+                response = connection.getresponse()
+                response.read()
+                status = str(response.status)
+                break
+            except (http.client.HTTPException, OSError) as e:
+                # A dropped keep-alive connection is retried once on a fresh one
+                connection.close()
+                if attempt:
+                    logger.debug(f"Request {path} failed: {e}")
+        elapsed = time.perf_counter() - scheduled
+        with lock:
+            latencies[name].append(elapsed)
+            statuses[name][status] = statuses[name].get(status, 0) + 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for offset, name, path in plan:
+            scheduled = started + offset
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            executor.submit(request, scheduled, name, path)
+    elapsed = time.perf_counter() - started
+
+    results = {name: _summarise(latencies[name], statuses[name]) for name in names if latencies[name]}
+    every = [latency for name in names for latency in latencies[name]]
+    every_status: Dict[str, int] = {}
+    for name in names:
+        for status, count in statuses[name].items():
+            every_status[status] = every_status.get(status, 0) + count
+    return {
+        "target_rps": rps,
+        "achieved_rps": len(every) / elapsed if elapsed > 0 else None,
+        "duration_s": elapsed,
+        "overall": _summarise(every, every_status),
+        "scenarios": results,
+    }
+
+
+def _summarise(latencies: List[float], statuses: Dict[str, int]) -> Dict[str, Any]:
+    if not latencies:
+        return {"count": 0}
+    times = np.array(latencies)
+    errors = sum(count for status, count in statuses.items() if not status.startswith(("2", "3")))
+    return {
+        "count": len(latencies),
+        "errors": errors,
+        "statuses": dict(sorted(statuses.items())),
+        "p50_s": float(np.percentile(times, 50)),
+        "p90_s": float(np.percentile(times, 90)),
+        "p99_s": float(np.percentile(times, 99)),
+        "max_s": float(times.max()),
+        "mean_s": float(times.mean()),
+    }
+
+
+def serve_in_thread(host: str = "127.0.0.1", port: int = 8765):
+    """Start the app under uvicorn in a daemon thread; returns the server, ``should_exit`` stops it.
+
+    The lifespan is skipped: the caller has already bound the services and
+    loaded the data, and the startup jobs would only add background load.
+    """
+    import uvicorn
+    from app.main import app
+
+    server = uvicorn.Server(uvicorn.Config(app, host=host, port=port, lifespan="off", log_level="warning", access_log=False))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    deadline = time.monotonic() + 30
+    while not server.started:
+        if not thread.is_alive() or time.monotonic() > deadline:
+            raise RuntimeError(f"uvicorn did not start on {host}:{port}")
+        time.sleep(0.05)
+    return server
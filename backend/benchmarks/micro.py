@@ -0,0 +1,195 @@
+from typing import Any, Callable, Dict, List, Optional, Sequence
+import logging
+import time
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def measure(func: Callable[[], Any], repeat: int = 5, number: int = 1, warmup: int = 1) -> Dict[str, Any]:
+    """Wall-clock timings of ``repeat`` rounds of ``number`` calls, after ``warmup`` untimed rounds.
+
+    Per-call times are reported; ``min_s`` is the most stable figure for
+    comparing runs, the median and p95 show the spread.
+    """
+    for _ in range(warmup):
+        for _ in range(number):
+            func()
+    rounds = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(number):
+            func()
+        rounds.append((time.perf_counter() - started) / number)
+    times = np.array(rounds)
+    return {
+        "repeat": repeat,
+        "number": number,
+        "min_s": float(times.min()),
+        "median_s": float(np.median(times)),
+        "mean_s": float(times.mean()),
+        "p95_s": float(np.percentile(times, 95)),
+        "max_s": float(times.max()),
+        "ops_per_s": float(1.0 / times.min()) if times.min() > 0 else None,
+    }
+
+
+class Context:
+    """Generated points and the helpers shared by the benchmarks."""
+
+    def __init__(self, points: Dict[str, np.ndarray], seed: int = 0, repeat: int = 5):
+        self.points = points
+        self.count = len(points["latitude"])
+        self.rng = np.random.default_rng(seed)
+        self.repeat = repeat
+
+    def random_bboxes(self, count: int, size: float = 0.5) -> List[Sequence[float]]:
+        """Boxes of ``size`` degrees centred on random cluster centres, so they hit dense areas."""
+        centres = self.rng.integers(0, len(self.points["centre_latitude"]), count)
+        boxes = []
+        for centre in centres.tolist():
+            lat = float(self.points["centre_latitude"][centre])
+            lon = float(self.points["centre_longitude"][centre])
+            boxes.append((lon - size / 2, lat - size / 2, lon + size / 2, lat + size / 2))
+        return boxes
+
+
+def bench_analyze_spatial_patterns(context: Context) -> Dict[str, Any]:
+    from app.services.analysis import GeospatialAnalyzer
+
+    coordinates = np.column_stack((context.points["latitude"], context.points["longitude"]))
+    analyzer = GeospatialAnalyzer()
+    return measure(lambda: analyzer.analyze_spatial_patterns(coordinates), repeat=context.repeat)
+
+
+def bench_analyze_stored_patterns(context: Context) -> Dict[str, Any]:
+    from app.services.analysis import GeospatialAnalyzer
+
+    analyzer = GeospatialAnalyzer()
+    return measure(lambda: GeospatialAnalyzer.analyze_stored_patterns.uncached(analyzer), repeat=context.repeat)
+
+
+def bench_hotspots_in_memory(context: Context) -> Dict[str, Any]:
+    from app.core.config import settings
+    from app.services.hotspots import HotspotDetector
+
+    def detect():
+        detector = HotspotDetector(radius_km=1.0, min_points=settings.hotspot_min_points)
+        detector.add(context.points["latitude"], context.points["longitude"])
+        return detector.result(max_hotspots=settings.hotspot_max_results)
+
+    return measure(detect, repeat=context.repeat)
+
+
+def bench_detect_hotspots(context: Context) -> Dict[str, Any]:
+    from app.services.analysis import GeospatialAnalyzer
+
+    analyzer = GeospatialAnalyzer()
+    return measure(lambda: GeospatialAnalyzer.detect_hotspots.uncached(analyzer, radius_km=1.0), repeat=context.repeat)
+
+
+def bench_bbox_query(context: Context) -> Dict[str, Any]:
+    from app.crud import spatial
+    from app.db.session import SessionLocal
+
+    boxes = iter(context.random_bboxes(10000))
+    db = SessionLocal()
+    try:
+        return measure(lambda: spatial.get_spatial_data_within_bounds(db, *next(boxes)), repeat=context.repeat, number=20)
+    finally:
+        db.close()
+
+
+def bench_bbox_index(context: Context) -> Dict[str, Any]:
+    from app.services.spatial_index import SpatialIndex
+
+    index = SpatialIndex()
+    index.build(np.arange(1, context.count + 1), context.points["latitude"], context.points["longitude"])
+    boxes = iter(context.random_bboxes(100000))
+    return measure(lambda: index.query_bbox(*next(boxes)), repeat=context.repeat, number=200)
+
+
+def _cache_value(rows: int) -> Dict[str, Any]:
+    return {
+        "count": rows,
+        "id": list(range(rows)),
+        "latitude": [0.5] * rows,
+        "longitude": [0.25] * rows,
+        "name": [f"point-{row}" for row in range(rows)],
+    }
+
+
+def bench_cache_set(context: Context) -> Dict[str, Any]:
+    from app.services.cache import CacheService
+
+    cache, value = CacheService(), _cache_value(10)
+    keys = iter(range(10 ** 9))
+    return measure(lambda: cache.set(f"bench:set:{next(keys)}", value, ttl=60), repeat=context.repeat, number=1000)
+
+
+def bench_cache_get_local(context: Context) -> Dict[str, Any]:
+    from app.services.cache import CacheService
+
+    cache = CacheService()
+    cache.set("bench:get", _cache_value(10), ttl=600)
+    return measure(lambda: cache.get("bench:get"), repeat=context.repeat, number=1000)
+
+
+def bench_cache_get_redis(context: Context) -> Dict[str, Any]:
+    from app.services.cache import CacheService
+
+    cache = CacheService()
+    cache.local = None
+    cache.set("bench:get", _cache_value(10), ttl=600)
+    return measure(lambda: cache.get("bench:get"), repeat=context.repeat, number=1000)
+
+
+def bench_cache_set_large(context: Context) -> Dict[str, Any]:
+    from app.services.cache import CacheService
+
+    cache, value = CacheService(), _cache_value(5000)
+    return measure(lambda: cache.set("bench:large", value, ttl=60), repeat=context.repeat, number=20)
+
+
+def bench_cache_mget(context: Context) -> Dict[str, Any]:
+    from app.services.cache import CacheService
+
+    cache = CacheService()
+    cache.local = None
+    cache.mset({f"bench:mget:{key}": _cache_value(10) for key in range(100)}, ttl=600)
+    keys = [f"bench:mget:{key}" for key in range(100)]
+    return measure(lambda: cache.mget(keys), repeat=context.repeat, number=100)
+
+
+# Name -> (benchmark, needs the points loaded into the database)
+BENCHMARKS: Dict[str, Any] = {
+    "analyze_spatial_patterns": (bench_analyze_spatial_patterns, False),
+    "analyze_stored_patterns": (bench_analyze_stored_patterns, True),
+    "hotspots_in_memory": (bench_hotspots_in_memory, False),
+    "detect_hotspots": (bench_detect_hotspots, True),
+    "bbox_query": (bench_bbox_query, True),
+    "bbox_index": (bench_bbox_index, False),
+    "cache_set": (bench_cache_set, False),
+    "cache_get_local": (bench_cache_get_local, False),
+    "cache_get_redis": (bench_cache_get_redis, False),
+    "cache_set_large": (bench_cache_set_large, False),
+    "cache_mget": (bench_cache_mget, False),
+}
+
+
+def run_micro(context: Context, only: Optional[Sequence[str]] = None) -> Dict[str, Any]:
+    """Run the selected benchmarks; a failing benchmark is reported with its error."""
+    results = {}
+    for name in only or BENCHMARKS:
+        benchmark, _ = BENCHMARKS[name]
+        logger.info(f"Running {name}")
+        try:
+            results[name] = benchmark(context)
+        except Exception as e:
+            logger.error(f"Benchmark {name} failed: {e}")
+            results[name] = {"error": str(e)}
+    return results
+
+
+def needs_database(only: Optional[Sequence[str]] = None) -> bool:
+    return any(BENCHMARKS[name][1] for name in only or BENCHMARKS)
@@ -1,2 +1,71 @@
 -- Initialize Database Schema for Octa Project
--- This script sets up the basic database structure 
\ No newline at end of file
+-- This script sets up the basic database structure
+-- Safe to re-run against an existing database to apply later additions.
+
+CREATE TABLE IF NOT EXISTS spatial_data (
+    id SERIAL PRIMARY KEY,
+    name VARCHAR(255) NOT NULL,
+    latitude DOUBLE PRECISION NOT NULL,
+    longitude DOUBLE PRECISION NOT NULL,
+    cell_key BIGINT,
+    properties JSONB,
+    created_at TIMESTAMPTZ DEFAULT now()
+);
+
+-- Web Mercator quadtree cell key at zoom 30 (see app/services/cells.py).
+-- Rows written before the column existed are filled by the API at startup.
+ALTER TABLE spatial_data ADD COLUMN IF NOT EXISTS cell_key BIGINT;
+CREATE INDEX IF NOT EXISTS ix_spatial_data_cell_key ON spatial_data (cell_key);
+
+-- Property filters (@>, ?, @?) are served by a GIN index on properties. Range
+-- filters on hot keys use per-key expression indexes, which the API creates
+-- from PROPERTY_INDEX_KEYS, e.g.:
+--   CREATE INDEX CONCURRENTLY ix_spatial_data_prop_population ON spatial_data ((properties -> 'population'));
+CREATE INDEX IF NOT EXISTS ix_spatial_data_properties ON spatial_data USING GIN (properties);
+
+CREATE TABLE IF NOT EXISTS spatial_data_summary (
+    id INTEGER PRIMARY KEY,
+    total_points BIGINT NOT NULL DEFAULT 0,
+    min_latitude DOUBLE PRECISION,
+    max_latitude DOUBLE PRECISION,
+    min_longitude DOUBLE PRECISION,
+    max_longitude DOUBLE PRECISION,
+    sum_latitude DOUBLE PRECISION NOT NULL DEFAULT 0,
+    sum_longitude DOUBLE PRECISION NOT NULL DEFAULT 0,
+    rebuilt_at TIMESTAMPTZ,
+    updated_at TIMESTAMPTZ DEFAULT now()
+);
+
+CREATE TABLE IF NOT EXISTS spatial_property_key_stats (
+    key TEXT PRIMARY KEY,
+    point_count BIGINT NOT NULL DEFAULT 0,
+    distinct_values BIGINT,
+    updated_at TIMESTAMPTZ DEFAULT now()
+);
+
+-- Per-tile counts for each rollup zoom; tile_key is the cell key shifted down to that zoom
+CREATE TABLE IF NOT EXISTS spatial_tile_rollup (
+    zoom SMALLINT NOT NULL,
+    tile_key BIGINT NOT NULL,
+    point_count BIGINT NOT NULL DEFAULT 0,
+    sum_latitude DOUBLE PRECISION NOT NULL DEFAULT 0,
+    sum_longitude DOUBLE PRECISION NOT NULL DEFAULT 0,
+    updated_at TIMESTAMPTZ DEFAULT now(),
+    PRIMARY KEY (zoom, tile_key)
+);
+
+-- Polygon layers for tagging points by region; geometry is WKB in lon/lat (EPSG:4326)
+CREATE TABLE IF NOT EXISTS spatial_region (
+    id SERIAL PRIMARY KEY,
+    layer TEXT NOT NULL,
+    region_id TEXT NOT NULL,
+    name TEXT,
+    properties JSONB,
+    geometry BYTEA NOT NULL,
+    created_at TIMESTAMPTZ DEFAULT now(),
+    CONSTRAINT uq_spatial_region_layer_region_id UNIQUE (layer, region_id)
+);
+CREATE INDEX IF NOT EXISTS ix_spatial_region_layer ON spatial_region (layer);
+
+-- Drop the summary row so the next statistics read rebuilds it, including the tile rollups
+DELETE FROM spatial_data_summary WHERE NOT EXISTS (SELECT 1 FROM spatial_tile_rollup);
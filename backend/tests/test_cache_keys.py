@@ -0,0 +1,33 @@
+import subprocess
+import sys
+from app.services.cache import make_cache_key
+
+
+def test_key_ignores_dict_order():
+    first = make_cache_key("bbox", {"minx": 1, "maxx": 2, "filters": {"a": 1, "b": [1, 2]}})
+    second = make_cache_key("bbox", {"filters": {"b": [1, 2], "a": 1}, "maxx": 2, "minx": 1})
+    assert first == second
+
+
+def test_key_distinguishes_values_and_namespaces():
+    assert make_cache_key("bbox", {"limit": 1}) != make_cache_key("bbox", {"limit": 2})
+    assert make_cache_key("bbox", {"limit": 1}) != make_cache_key("tiles", {"limit": 1})
+    assert make_cache_key("bbox", [1, 2]) != make_cache_key("bbox", [2, 1])
+
+
+def test_version_is_embedded():
+    unversioned = make_cache_key("bbox", {"limit": 1})
+    versioned = make_cache_key("bbox", {"limit": 1}, version=7)
+    assert versioned.startswith("bbox:v7:")
+    assert versioned.split(":")[-1] == unversioned.split(":")[-1]
+    assert make_cache_key("bbox", {"limit": 1}, version=8) != versioned
+
+
+def test_key_is_stable_across_processes():
+    # hash() of str is salted per process; the key must not be
+    script = "from app.services.cache import make_cache_key; print(make_cache_key('bbox', {'name': 'x', 'ids': (1, 2)}))"
+    keys = {
+        subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True).stdout.strip()
+        for _ in range(2)
+    }
+    assert keys == {make_cache_key("bbox", {"name": "x", "ids": (1, 2)})}
@@ -0,0 +1,50 @@
+import numpy as np
+from app.services.cells import (
+    CELL_KEY_ZOOM,
+    MAX_LATITUDE,
+    cell_key,
+    cell_keys,
+    lonlat_to_tile,
+    parent_keys,
+    tile_key,
+    tile_key_range,
+    tile_xy,
+)
+
+
+def test_tile_key_round_trip():
+    rng = np.random.default_rng(3)
+    x = rng.integers(0, 1 << CELL_KEY_ZOOM, 1000, dtype=np.uint64)
+    y = rng.integers(0, 1 << CELL_KEY_ZOOM, 1000, dtype=np.uint64)
+    decoded_x, decoded_y = tile_xy(tile_key(x, y))
+    np.testing.assert_array_equal(decoded_x, x)
+    np.testing.assert_array_equal(decoded_y, y)
+
+
+def test_cell_keys_match_scalar_and_fit_bigint():
+    lats = np.array([0.0, 52.52, -33.86, 89.9, -89.9])
+    lons = np.array([0.0, 13.40, 151.21, 180.0, -180.0])
+    keys = cell_keys(lats, lons)
+    assert keys.dtype == np.int64
+    assert (keys >= 0).all()
+    assert keys.tolist() == [cell_key(lat, lon) for lat, lon in zip(lats, lons)]
+
+
+def test_polar_latitudes_clamp_to_edge_tiles():
+    assert cell_key(90.0, 10.0) == cell_key(MAX_LATITUDE, 10.0)
+    _, y = lonlat_to_tile([-90.0], [0.0], 4)
+    assert int(y[0]) == 15
+
+
+def test_cells_fall_inside_their_parent_tile_range():
+    keys = cell_keys([48.8566, -22.9], [2.3522, -43.2])
+    for zoom in (0, 5, 12, CELL_KEY_ZOOM):
+        for key, parent in zip(keys, parent_keys(keys, zoom)):
+            first, last = tile_key_range(int(parent), zoom)
+            assert first <= int(key) <= last
+
+
+def test_nearby_points_share_coarse_tiles():
+    keys = cell_keys([40.7128, 40.7129], [-74.0060, -74.0061])
+    assert keys[0] != keys[1]
+    assert parent_keys(keys[0], 16) == parent_keys(keys[1], 16)
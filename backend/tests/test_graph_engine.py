@@ -0,0 +1,116 @@
+import heapq
+import itertools
+import numpy as np
+import pytest
+from app.services.graph_engine import GraphSnapshot
+
+
+def _graph(node_count, edges, weights=None, coordinates=None):
+    if coordinates is None:
+        coordinates = [(np.nan, np.nan)] * node_count
+    sources, targets = zip(*edges) if edges else ((), ())
+    return GraphSnapshot.from_edges(
+        [f"n{i}" for i in range(node_count)],
+        [lat for lat, _ in coordinates],
+        [lon for _, lon in coordinates],
+        sources,
+        targets,
+        weights,
+    )
+
+
+def _dijkstra(node_count, edges, weights, source):
+    adjacency = [[] for _ in range(node_count)]
+    for (a, b), weight in zip(edges, weights):
+        adjacency[a].append((b, weight))
+        adjacency[b].append((a, weight))
+    best = [float("inf")] * node_count
+    best[source] = 0.0
+    queue = [(0.0, source)]
+    while queue:
+        cost, node = heapq.heappop(queue)
+        if cost > best[node]:
+            continue
+        for neighbour, weight in adjacency[node]:
+            if cost + weight < best[neighbour]:
+                best[neighbour] = cost + weight
+                heapq.heappush(queue, (cost + weight, neighbour))
+    return best
+
+
+def _random_graph(seed, node_count=60, edge_count=150):
+    rng = np.random.default_rng(seed)
+    edges = [tuple(int(v) for v in rng.integers(0, node_count, 2)) for _ in range(edge_count)]
+    coordinates = list(zip(rng.uniform(40, 41, node_count), rng.uniform(-74, -73, node_count)))
+    return edges, coordinates
+
+
+def test_csr_stores_each_edge_both_ways_and_drops_self_loops():
+    graph = _graph(4, [(0, 1), (1, 2), (2, 2)])
+    assert graph.edge_count == 2
+    assert graph.degree().tolist() == [1, 2, 1, 0]
+
+
+def test_bfs_distances():
+    graph = _graph(6, [(0, 1), (1, 2), (2, 3), (0, 3), (4, 5)])
+    assert graph.bfs_distances(0).tolist() == [0, 1, 2, 1, -1, -1]
+
+
+def test_bfs_path_is_shortest():
+    graph = _graph(5, [(0, 1), (1, 2), (2, 3), (0, 4), (4, 3)])
+    path, cost, algorithm = graph.shortest_path(0, 3)
+    assert algorithm == "bfs"
+    assert path == [0, 4, 3] and cost == 2.0
+    assert graph.shortest_path(0, 0)[0] == [0]
+
+
+def test_unreachable_target():
+    graph = _graph(3, [(0, 1)], weights=[2.0])
+    assert graph.shortest_path(0, 2, "dijkstra") == (None, None, "dijkstra")
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_weighted_searches_match_reference(seed):
+    edges, coordinates = _random_graph(seed)
+    rng = np.random.default_rng(seed + 100)
+    weights = rng.uniform(1.0, 50.0, len(edges))
+    graph = _graph(60, edges, weights, coordinates)
+    reference = _dijkstra(60, edges, weights, 0)
+
+    for target in range(1, 60):
+        for algorithm in ("dijkstra", "astar"):
+            path, cost, used = graph.shortest_path(0, target, algorithm)
+            assert used == algorithm
+            if reference[target] == float("inf"):
+                assert path is None
+                continue
+            assert cost == pytest.approx(reference[target])
+            assert path[0] == 0 and path[-1] == target
+    finite = np.isfinite(reference)
+    np.testing.assert_allclose(graph.distances_from(0, np.arange(60))[finite], np.asarray(reference)[finite])
+
+
+def test_betweenness_of_a_path_and_a_star():
+    path = _graph(5, [(0, 1), (1, 2), (2, 3), (3, 4)])
+    # Middle node of a 5-node path lies on 4 of the 6 pairs not involving it
+    np.testing.assert_allclose(path.betweenness(), [0.0, 0.5, 4 / 6, 0.5, 0.0])
+    star = _graph(5, [(0, 1), (0, 2), (0, 3), (0, 4)])
+    np.testing.assert_allclose(star.betweenness(), [1.0, 0.0, 0.0, 0.0, 0.0])
+
+
+def test_betweenness_splits_over_equal_paths():
+    square = _graph(4, [(0, 1), (1, 2), (2, 3), (3, 0)])
+    # Each node carries half of one opposite pair: 0.5 / (3 * 2 / 2)
+    np.testing.assert_allclose(square.betweenness(), [1 / 6] * 4)
+
+
+def test_closeness_on_a_path():
+    graph = _graph(3, [(0, 1), (1, 2)])
+    np.testing.assert_allclose(graph.closeness(), [2 / 3, 1.0, 2 / 3])
+
+
+def test_fingerprint_ignores_edge_order():
+    edges = [(0, 1), (1, 2), (2, 3), (3, 0)]
+    fingerprints = {_graph(4, list(order)).fingerprint() for order in itertools.permutations(edges)}
+    assert len(fingerprints) == 1
+    assert _graph(4, edges[:3]).fingerprint() not in fingerprints
@@ -0,0 +1,53 @@
+import json
+import numpy as np
+from app.services.hotspots import HotspotDetector
+
+
+def _clustered_points(seed: int = 11):
+    rng = np.random.default_rng(seed)
+    centres = [(52.52, 13.40), (48.85, 2.35)]
+    lats = np.concatenate([rng.normal(lat, 0.003, 400) for lat, _ in centres] + [rng.uniform(-60, 60, 200)])
+    lons = np.concatenate([rng.normal(lon, 0.003, 400) for _, lon in centres] + [rng.uniform(-170, 170, 200)])
+    return lats, lons
+
+
+def test_finds_dense_clusters():
+    lats, lons = _clustered_points()
+    detector = HotspotDetector(radius_km=1.0, min_points=20)
+    detector.add(lats, lons)
+    result = detector.result()
+    assert result["points_scanned"] == len(lats)
+    assert result["total_hotspots"] == 2
+    centres = sorted(hotspot["center"] for hotspot in result["hotspots"])
+    assert abs(centres[0][0] - 48.85) < 0.01 and abs(centres[1][0] - 52.52) < 0.01
+    assert all(hotspot["point_count"] > 300 for hotspot in result["hotspots"])
+
+
+def test_merged_chunks_match_single_pass():
+    lats, lons = _clustered_points()
+    whole = HotspotDetector(radius_km=1.0, min_points=20)
+    whole.add(lats, lons)
+
+    merged = HotspotDetector(radius_km=1.0, min_points=20)
+    for start in range(0, len(lats), 137):
+        part = HotspotDetector(radius_km=1.0, min_points=20)
+        part.add(lats[start:start + 137], lons[start:start + 137])
+        merged.merge(part)
+    assert merged.result() == whole.result()
+
+
+def test_dict_round_trip_survives_json():
+    lats, lons = _clustered_points()
+    detector = HotspotDetector(radius_km=0.5, min_points=5)
+    detector.add(lats, lons)
+    state = json.loads(json.dumps(detector.to_dict()))
+    restored = HotspotDetector.from_dict(state)
+    assert restored.result() == detector.result()
+
+
+def test_sparse_points_are_noise():
+    detector = HotspotDetector(radius_km=1.0, min_points=10)
+    detector.add(np.array([0.0, 10.0, 20.0]), np.array([0.0, 10.0, 20.0]))
+    result = detector.result()
+    assert result["total_hotspots"] == 0
+    assert result["noise_points"] == 3
@@ -0,0 +1,124 @@
+import asyncio
+import json
+import pytest
+from app.core.config import settings
+from app.services.ingest import (
+    detect_format,
+    feature_to_record,
+    iter_csv_records,
+    iter_geojson_records,
+    iter_lines,
+    iter_ndjson_records,
+)
+
+
+def _stream(body: bytes, chunk_size: int):
+    async def chunks():
+        for start in range(0, len(body), chunk_size):
+            yield body[start:start + chunk_size]
+    return chunks()
+
+
+def _collect(reader, body: bytes, chunk_size: int = 7):
+    async def run():
+        return [item async for item in reader(_stream(body, chunk_size))]
+    return asyncio.run(run())
+
+
+def _feature(name, longitude, latitude, **properties):
+    return {
+        "type": "Feature",
+        "geometry": {"type": "Point", "coordinates": [longitude, latitude]},
+        "properties": {"name": name, **properties},
+    }
+
+
+def test_detect_format_ignores_parameters_and_case():
+    assert detect_format("application/x-ndjson; charset=utf-8") == "ndjson"
+    assert detect_format("TEXT/CSV") == "csv"
+    assert detect_format("application/xml") is None
+    assert detect_format(None) is None
+
+
+def test_feature_to_record_flattens_points():
+    record = feature_to_record(_feature("cafe", 13.4, 52.5, kind="food"))
+    assert record == {"name": "cafe", "longitude": 13.4, "latitude": 52.5, "properties": {"kind": "food"}}
+
+
+def test_feature_to_record_rejects_other_geometries():
+    with pytest.raises(ValueError):
+        feature_to_record({"type": "Feature", "geometry": {"type": "LineString", "coordinates": []}})
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 64, 4096])
+def test_iter_lines_splits_across_chunks(chunk_size):
+    body = "first\r\nsecond\n\nthird ünïcode".encode()
+    assert _collect(iter_lines, body, chunk_size) == [
+        ("first", None), ("second", None), ("", None), ("third ünïcode", None),
+    ]
+
+
+def test_iter_lines_skips_overlong_lines(monkeypatch):
+    monkeypatch.setattr(settings, "ingest_max_record_bytes", 10)
+    lines = _collect(iter_lines, b"short\n" + b"x" * 50 + b"\nafter\n", chunk_size=4)
+    assert lines[0] == ("short", None)
+    assert lines[1][0] is None and "exceeds 10 bytes" in lines[1][1]
+    assert lines[2:] == [("after", None)]
+
+
+def test_iter_lines_reports_invalid_utf8():
+    lines = _collect(iter_lines, b"ok\n\xff\xfe\nnext\n")
+    assert lines[0] == ("ok", None)
+    assert lines[1][0] is None and "Invalid UTF-8" in lines[1][1]
+    assert lines[2] == ("next", None)
+
+
+def test_ndjson_reports_bad_lines_and_continues():
+    body = b'{"name": "a", "latitude": 1, "longitude": 2}\nnot json\n\n' + json.dumps(_feature("b", 3, 4)).encode()
+    records = _collect(iter_ndjson_records, body)
+    assert records[0] == ({"name": "a", "latitude": 1, "longitude": 2}, None)
+    assert records[1][0] is None and records[1][1]
+    assert records[2][0]["name"] == "b" and records[2][0]["latitude"] == 4
+
+
+def test_csv_joins_quoted_multiline_fields():
+    body = (
+        b'name,latitude,longitude,properties,city\n'
+        b'"two\nlines",1.5,2.5,"{""kind"": ""bar""}",Berlin\n'
+        b'plain,3,4,,Paris\n'
+    )
+    records = _collect(iter_csv_records, body, chunk_size=5)
+    assert records == [
+        ({"name": "two\nlines", "latitude": "1.5", "longitude": "2.5", "properties": {"kind": "bar", "city": "Berlin"}}, None),
+        ({"name": "plain", "latitude": "3", "longitude": "4", "properties": {"city": "Paris"}}, None),
+    ]
+
+
+def test_csv_reports_column_mismatch_and_unterminated_quote():
+    records = _collect(iter_csv_records, b'name,latitude,longitude\na,1\nb,1,2\n"open,1,2\n')
+    assert records[0][0] is None and "Expected 3 columns" in records[0][1]
+    assert records[1][0]["name"] == "b"
+    assert records[2] == (None, "Unterminated quoted field at end of input")
+
+
+@pytest.mark.parametrize("chunk_size", [1, 5, 4096])
+def test_geojson_streams_features(chunk_size):
+    collection = {
+        "type": "FeatureCollection",
+        "features": [_feature("café", 1.0, 2.0), _feature("b", 3.0, 4.0, tags=["x", "]"])],
+    }
+    records = _collect(iter_geojson_records, json.dumps(collection, ensure_ascii=False).encode(), chunk_size)
+    assert [record["name"] for record, error in records] == ["café", "b"]
+    assert records[1][0]["properties"] == {"tags": ["x", "]"]}
+
+
+def test_geojson_skips_malformed_feature():
+    body = b'{"type": "FeatureCollection", "features": [{"type": "Feature", bad}, ' + json.dumps(_feature("ok", 1, 2)).encode() + b"]}"
+    records = _collect(iter_geojson_records, body, chunk_size=4096)
+    assert records[0][0] is None and "Invalid feature JSON" in records[0][1]
+    assert records[1][0]["name"] == "ok"
+
+
+def test_geojson_reports_truncated_collection():
+    records = _collect(iter_geojson_records, b'{"type": "FeatureCollection", "features": [')
+    assert records == [(None, "Unexpected end of FeatureCollection")]
@@ -0,0 +1,56 @@
+import pytest
+from app.core.config import settings
+from app.services.property_filters import parse_property_filters
+
+
+def test_parses_scalar_values_as_json():
+    assert parse_property_filters(["rating:gte:4", 'code:eq:"5"', "open:eq:true", "kind:eq:cafe"]) == [
+        (["rating"], "gte", 4),
+        (["code"], "eq", "5"),
+        (["open"], "eq", True),
+        (["kind"], "eq", "cafe"),
+    ]
+
+
+def test_dotted_keys_and_in_lists():
+    assert parse_property_filters(["address.city:in:Berlin,Paris,3"]) == [(["address", "city"], "in", ["Berlin", "Paris", 3])]
+
+
+def test_value_may_contain_colons():
+    assert parse_property_filters(["opens:eq:08:30"]) == [(["opens"], "eq", "08:30")]
+
+
+def test_existence_operators_take_no_value():
+    assert parse_property_filters(["phone:exists", "fax:missing"]) == [(["phone"], "exists", None), (["fax"], "missing", None)]
+    with pytest.raises(ValueError):
+        parse_property_filters(["phone:exists:1"])
+
+
+@pytest.mark.parametrize("expression", [
+    "kind",
+    "kind:like:caf",
+    "kind:eq",
+    "bad key:eq:1",
+    "a..b:eq:1",
+    "rating:gt:true",
+    "rating:eq:NaN",
+    "rating:gte:Infinity",
+    "rating:lt:1e999",
+    "rating:in:1,NaN",
+])
+def test_rejects_malformed_expressions(expression):
+    with pytest.raises(ValueError):
+        parse_property_filters([expression])
+
+
+def test_limits_terms_and_in_values(monkeypatch):
+    monkeypatch.setattr(settings, "property_filter_max_terms", 2)
+    monkeypatch.setattr(settings, "property_filter_max_values", 3)
+    with pytest.raises(ValueError):
+        parse_property_filters(["a:exists", "b:exists", "c:exists"])
+    with pytest.raises(ValueError):
+        parse_property_filters(["a:in:1,2,3,4"])
+
+
+def test_non_scalar_json_is_kept_as_text():
+    assert parse_property_filters(["tags:gt:[1]"]) == [(["tags"], "gt", "[1]")]
@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+from app.services.spatial_index import SpatialIndex
+
+
+def _brute_force(ids, lats, lons, minx, miny, maxx, maxy):
+    lon_mask = (lons >= minx) | (lons <= maxx) if minx > maxx else (lons >= minx) & (lons <= maxx)
+    return np.sort(ids[(lats >= miny) & (lats <= maxy) & lon_mask])
+
+
+@pytest.fixture
+def points():
+    rng = np.random.default_rng(7)
+    count = 5000
+    ids = np.arange(1, count + 1)
+    lats = rng.uniform(-90, 90, count)
+    lons = rng.uniform(-180, 180, count)
+    # Points exactly on the box edges and the antimeridian
+    lats[:4] = [10.0, 20.0, 0.0, 0.0]
+    lons[:4] = [30.0, 40.0, 180.0, -180.0]
+    return ids, lats, lons
+
+
+def test_cold_index_returns_none():
+    index = SpatialIndex(cell_size=1.0)
+    assert index.query_bbox(0, 0, 1, 1) is None
+    assert index.misses == 1
+
+
+@pytest.mark.parametrize("bbox", [
+    (30.0, 10.0, 40.0, 20.0),
+    (-180.0, -90.0, 180.0, 90.0),
+    (-0.5, -0.5, 0.5, 0.5),
+    (170.0, -10.0, -170.0, 10.0),
+    (179.5, -1.0, -179.5, 1.0),
+])
+def test_query_matches_brute_force(points, bbox):
+    ids, lats, lons = points
+    index = SpatialIndex(cell_size=0.7)
+    index.build(ids, lats, lons)
+    np.testing.assert_array_equal(index.query_bbox(*bbox), _brute_force(ids, lats, lons, *bbox))
+
+
+def test_antimeridian_box_includes_both_edges(points):
+    ids, lats, lons = points
+    index = SpatialIndex(cell_size=1.0)
+    index.build(ids, lats, lons)
+    found = index.query_bbox(179.0, -1.0, -179.0, 1.0)
+    assert {3, 4} <= set(found.tolist())
+
+
+def test_pending_points_are_queried_before_and_after_merge(points):
+    ids, lats, lons = points
+    index = SpatialIndex(cell_size=1.0, merge_threshold=3)
+    index.build(ids, lats, lons)
+    index.add_many([9001, 9002], [5.0, 5.0], [179.9, -179.9])
+    assert {9001, 9002} <= set(index.query_bbox(179.0, 4.0, -179.0, 6.0).tolist())
+
+    index.add_many([9003, 9004], [5.0, 5.0], [0.0, 0.1])
+    all_ids = np.concatenate((ids, [9001, 9002, 9003, 9004]))
+    all_lats = np.concatenate((lats, [5.0] * 4))
+    all_lons = np.concatenate((lons, [179.9, -179.9, 0.0, 0.1]))
+    for bbox in [(179.0, 4.0, -179.0, 6.0), (-1.0, 4.0, 1.0, 6.0)]:
+        np.testing.assert_array_equal(index.query_bbox(*bbox), _brute_force(all_ids, all_lats, all_lons, *bbox))
+    assert len(index) == len(all_ids)
+
+
+def test_add_many_skips_known_ids(points):
+    ids, lats, lons = points
+    index = SpatialIndex(cell_size=1.0)
+    index.build(ids, lats, lons)
+    index.add_many([1, 2], [0.0, 0.0], [0.0, 0.0])
+    assert len(index) == len(ids)